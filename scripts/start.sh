@@ -26,9 +26,15 @@ source "$VENV_PATH/bin/activate"
 # Export PYTHONPATH to include our project root and site-packages
 export PYTHONPATH="$PROJECT_ROOT:$VENV_PATH/lib/python3.11/site-packages:$PYTHONPATH"
 
+# An in-memory database lives inside a single process
+if [ "${DB_IN_MEMORY:-0}" = "1" ] && [ "${API_WORKERS:-1}" -gt 1 ]; then
+    echo "DB_IN_MEMORY=1 cannot be combined with API_WORKERS > 1"
+    exit 1
+fi
+
 # Start Python server using uvicorn directly
 echo "Starting FastAPI server..."
-python -m uvicorn src.main.api:app --host 127.0.0.1 --port 8000 &
+python -m uvicorn src.main.api:app --host 127.0.0.1 --port 8000 --workers "${API_WORKERS:-1}" &
 PYTHON_PID=$!
 
 # Wait for Python server to start
@@ -0,0 +1,82 @@
+import os
+import threading
+from pathlib import Path
+
+
+class Archiver:
+    """Background thread that keeps the hot tasks table small.
+
+    Every `interval` seconds it moves soft-deleted and orphaned tasks into
+    tasks_archive and, when a retention period is configured, purges archived
+    rows that have expired. Succeeded and dead job_queue rows are deleted
+    `job_retention_days` after they finished, together with their logs in
+    `job_log_dir`. Each pass is split into short batches bounded by
+    `time_budget` so it never holds the write lock for long.
+    """
+
+    def __init__(self, database, interval=None, batch_size=None, time_budget=None,
+                 grace_seconds=None, retention_days=None, job_retention_days=None,
+                 job_log_dir=None):
+        self.database = database
+        self.interval = float(interval if interval is not None
+                              else os.getenv('ARCHIVE_INTERVAL', 300))
+        self.batch_size = int(batch_size or os.getenv('ARCHIVE_BATCH_SIZE', 500))
+        self.time_budget = float(time_budget or os.getenv('ARCHIVE_TIME_BUDGET', 0.5))
+        self.grace_seconds = int(grace_seconds if grace_seconds is not None
+                                 else os.getenv('ARCHIVE_GRACE_SECONDS', 86400))
+        retention_days = retention_days or os.getenv('ARCHIVE_RETENTION_DAYS')
+        self.retention_days = int(retention_days) if retention_days else None
+        self.job_retention_days = float(job_retention_days if job_retention_days is not None
+                                        else os.getenv('JOB_QUEUE_RETENTION_DAYS', 7))
+        self.job_log_dir = Path(job_log_dir or os.getenv('JOB_LOG_DIR') or os.path.join(
+            os.getenv('APP_LOG_DIR', os.path.expanduser('~/ReportManager/logs')), 'jobs'
+        ))
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        """Run a single archive (and purge) pass and return what it did."""
+        archived = self.database.archive_tasks(
+            grace_seconds=self.grace_seconds,
+            batch_size=self.batch_size,
+            time_budget=self.time_budget
+        )
+        purged = 0
+        if self.retention_days is not None:
+            purged = self.database.purge_archive(
+                self.retention_days,
+                batch_size=self.batch_size,
+                time_budget=self.time_budget
+            )
+        purged_jobs = 0
+        if self.job_retention_days > 0:
+            purged_jobs = self.database.purge_job_queue(
+                self.job_retention_days,
+                batch_size=self.batch_size,
+                time_budget=self.time_budget,
+                log_dir=self.job_log_dir
+            )
+        return {'archived': archived, 'purged': purged, 'purged_jobs': purged_jobs}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                result = self.run_once()
+                if any(result.values()):
+                    self.database.log(f"Archiver: {result}")
+            except Exception as error:
+                print(f"Archiver pass failed: {error}")
@@ -0,0 +1,244 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+def _restore_marker(db_path):
+    return f"{db_path}.restore"
+
+
+def restore_pending_backup(db_path):
+    """Replace the database file with a backup scheduled for restore.
+
+    A restore is requested by writing the backup path into `<db_path>.restore`
+    (see BackupManager.schedule_restore). It has to happen before any
+    connection is opened, so Database.initialize calls this first. Returns the
+    restored backup path or None.
+
+    A backup that is missing or fails its integrity check is not restored:
+    the marker is moved to `<db_path>.restore.failed` and the existing
+    database file is kept, so the next start does not fail the same way.
+    """
+    marker = _restore_marker(db_path)
+    if not os.path.exists(marker):
+        return None
+
+    with open(marker) as f:
+        source = f.read().strip()
+    staging = f"{db_path}.restoring"
+    try:
+        _stage_backup(source, staging)
+    except Exception as error:
+        print(f"Restore skipped, keeping the current database: {error}")
+        if os.path.exists(staging):
+            os.remove(staging)
+        os.replace(marker, f"{marker}.failed")
+        return None
+
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(staging, db_path)
+    if os.path.exists(marker):
+        os.remove(marker)
+
+    print(f"Database restored from backup: {source}")
+    return source
+
+
+def _stage_backup(source, staging):
+    """Copy (and decompress) a backup to staging and check it"""
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Backup to restore not found: {source}")
+
+    opener = gzip.open if source.endswith('.gz') else open
+    with opener(source, 'rb') as src, open(staging, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    check = sqlite3.connect(staging)
+    try:
+        result = check.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        check.close()
+    if result != 'ok':
+        raise sqlite3.DatabaseError(f"Backup {source} failed integrity check: {result}")
+
+
+class BackupManager:
+    """Online backups with VACUUM INTO.
+
+    The copy is written by Database.copy_to inside a single read
+    transaction, so it is a consistent snapshot and, in WAL mode, the API's
+    writers keep committing while it runs; unlike the stepped backup API it
+    never has to restart when they do. Backups can be gzip-compressed and
+    only the newest `keep` are retained. With `interval` > 0, start() takes a backup
+    on that schedule in a background thread.
+    """
+
+    def __init__(self, database, backup_dir=None, keep=None, compress=None, interval=None):
+        self.database = database
+        self.backup_dir = backup_dir or os.getenv('BACKUP_DIR')
+        self.keep = int(keep or os.getenv('BACKUP_KEEP', 7))
+        self.compress = (compress if compress is not None
+                         else os.getenv('BACKUP_COMPRESS', '1') == '1')
+        self.interval = float(interval if interval is not None
+                              else os.getenv('BACKUP_INTERVAL', 0))
+
+        self._backup_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_backup_dir(self):
+        backup_dir = self.backup_dir or os.path.join(
+            os.path.dirname(self.database.db_path), 'backups'
+        )
+        os.makedirs(backup_dir, exist_ok=True)
+        return backup_dir
+
+    def is_running(self):
+        return self._backup_lock.locked()
+
+    def backup(self, compress=None):
+        """Take a backup and return its metadata.
+
+        Raises RuntimeError when another backup is already in progress.
+        """
+        if not self._backup_lock.acquire(blocking=False):
+            raise RuntimeError("A backup is already in progress")
+
+        try:
+            compress = self.compress if compress is None else compress
+            backup_dir = self.get_backup_dir()
+            name = f"database-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.sqlite"
+            path = os.path.join(backup_dir, name)
+            partial = f"{path}.partial"
+            started = time.monotonic()
+
+            self.database.copy_to(partial)
+
+            if compress:
+                with open(partial, 'rb') as src, gzip.open(f"{path}.gz.partial", 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.remove(partial)
+                partial, path = f"{path}.gz.partial", f"{path}.gz"
+            os.replace(partial, path)
+
+            self.rotate()
+            return {
+                **self._describe(path),
+                'duration': round(time.monotonic() - started, 3)
+            }
+        finally:
+            self._backup_lock.release()
+
+    def list_backups(self):
+        backup_dir = self.get_backup_dir()
+        backups = [
+            self._describe(os.path.join(backup_dir, name))
+            for name in os.listdir(backup_dir)
+            if name.endswith(('.sqlite', '.sqlite.gz'))
+        ]
+        return sorted(backups, key=lambda b: b['name'], reverse=True)
+
+    def rotate(self):
+        """Delete all but the newest `keep` backups and return what was removed"""
+        removed = []
+        for backup in self.list_backups()[self.keep:]:
+            os.remove(backup['path'])
+            removed.append(backup['name'])
+        return removed
+
+    def schedule_restore(self, name):
+        """Restore the named backup the next time the database is initialized"""
+        path = os.path.join(self.get_backup_dir(), os.path.basename(name))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Backup not found: {name}")
+        with open(_restore_marker(self.database.db_path), 'w') as f:
+            f.write(path)
+        return self._describe(path)
+
+    def start(self):
+        if self.interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='backup', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _describe(self, path):
+        stats = os.stat(path)
+        return {
+            'name': os.path.basename(path),
+            'path': path,
+            'size': stats.st_size,
+            'compressed': path.endswith('.gz'),
+            'created_at': datetime.fromtimestamp(stats.st_mtime)
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                backup = self.backup()
+                self.database.log(f"Scheduled backup written to {backup['path']}")
+            except Exception as error:
+                print(f"Scheduled backup failed: {error}")
+
+
+class SnapshotScheduler:
+    """Background thread that persists an in-memory database.
+
+    Every `interval` seconds (DB_SNAPSHOT_INTERVAL, default 60, 0 disables
+    it) the in-memory database is written to its file with
+    Database.snapshot, unless nothing was written since the last snapshot.
+    Database.close takes a final one. Anything written after the latest
+    snapshot is lost if the process dies, which is the price of never
+    waiting on the disk for a commit.
+    """
+
+    def __init__(self, database, interval=None):
+        self.database = database
+        self.interval = float(interval if interval is not None
+                              else os.getenv('DB_SNAPSHOT_INTERVAL', 60))
+        self._last_changes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread or not self.database.in_memory:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='db-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self, force=False):
+        """Take a snapshot if anything changed (or force) and return it, else None"""
+        changes = self.database.db.total_changes
+        if not force and changes == self._last_changes:
+            return None
+        snapshot = self.database.snapshot()
+        self._last_changes = changes
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                snapshot = self.run_once()
+                if snapshot:
+                    self.database.log(f"Snapshot written to {snapshot['path']}")
+            except Exception as error:
+                print(f"Scheduled snapshot failed: {error}")
@@ -5,50 +5,364 @@ from datetime import datetime
 from pathlib import Path
 from contextlib import contextmanager
 import threading
+import time
+import uuid
+
+from .backup import restore_pending_backup
+from .writer import WriteQueue
+
+TASK_COLUMNS = [
+    'id', 'name', 'type', 'report_id', 'schedule', 'is_active', 'meta',
+    'created_at', 'updated_at', 'next_run_at'
+]
+
+# Generated integer mirrors of the task timestamp columns (see MIGRATIONS)
+TASK_TIME_COLUMNS = ['created_at_ms', 'updated_at_ms', 'next_run_at_ms']
+
+
+def epoch_ms(expression):
+    """SQL for the epoch milliseconds of a UTC datetime text expression"""
+    return f"CAST(ROUND((julianday({expression}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+NOW_MS = epoch_ms("'now'")
+
+# Time range filters for list queries: *_after is inclusive, *_before exclusive
+TIME_FILTERS = {
+    'created_after': 'created_at_ms >= ?',
+    'created_before': 'created_at_ms < ?',
+    'updated_after': 'updated_at_ms >= ?',
+    'updated_before': 'updated_at_ms < ?'
+}
+
+# Schema changes applied in order after _create_tables; PRAGMA user_version
+# records how many of them a database file has had
+MIGRATIONS = [
+    # 1: integer epoch-millisecond columns for indexed time range queries. They
+    # are generated from the text columns, so every write path keeps them in sync
+    "\n".join(
+        f"ALTER TABLE {table} ADD COLUMN {column}_ms INTEGER "
+        f"GENERATED ALWAYS AS ({epoch_ms(column)}) VIRTUAL;"
+        for table, columns in (
+            ('reports', ['created_at', 'updated_at']),
+            ('tasks', ['created_at', 'updated_at', 'next_run_at']),
+            ('tasks_archive', ['created_at', 'updated_at', 'next_run_at'])
+        )
+        for column in columns
+    ) + """
+    CREATE INDEX idx_reports_created_at_ms ON reports(created_at_ms);
+    CREATE INDEX idx_reports_updated_at_ms ON reports(updated_at_ms);
+    CREATE INDEX idx_tasks_created_at_ms ON tasks(created_at_ms);
+    CREATE INDEX idx_tasks_updated_at_ms ON tasks(updated_at_ms);
+    CREATE INDEX idx_tasks_due ON tasks(next_run_at_ms)
+        WHERE is_active = 1 AND schedule IS NOT NULL;
+    DROP INDEX IF EXISTS idx_tasks_inactive;
+    CREATE INDEX idx_tasks_inactive ON tasks(updated_at_ms) WHERE is_active = 0;
+    """,
+    # 2: durable job queue shared by worker processes (see src/jobs/worker.py)
+    """
+    CREATE TABLE job_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER,
+        job TEXT NOT NULL,
+        params TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        available_at_ms INTEGER NOT NULL,
+        lease_owner TEXT,
+        lease_token INTEGER NOT NULL DEFAULT 0,
+        lease_expires_at_ms INTEGER,
+        heartbeat_at_ms INTEGER,
+        result TEXT,
+        error TEXT,
+        created_at_ms INTEGER NOT NULL,
+        updated_at_ms INTEGER NOT NULL,
+        finished_at_ms INTEGER
+    );
+    CREATE INDEX idx_job_queue_ready ON job_queue(priority DESC, available_at_ms)
+        WHERE status = 'queued';
+    CREATE INDEX idx_job_queue_leases ON job_queue(lease_expires_at_ms)
+        WHERE status = 'running';
+    """,
+    # 3: task dependency graph; a task runs after every task it depends on
+    """
+    CREATE TABLE task_dependencies (
+        task_id INTEGER NOT NULL,
+        depends_on INTEGER NOT NULL,
+        PRIMARY KEY (task_id, depends_on),
+        CHECK (task_id != depends_on)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_task_dependencies_depends_on ON task_dependencies(depends_on);
+    """,
+    # 4: finished job_queue rows are purged by age; the index also covers
+    # the per-status counts in get_job_queue_stats
+    """
+    CREATE INDEX idx_job_queue_status ON job_queue(status, finished_at_ms);
+    """
+]
+
+JOB_QUEUE_STATUSES = ('queued', 'running', 'succeeded', 'dead')
+
+AUTO_VACUUM_MODES = ('none', 'full', 'incremental')
+
+
+def fsync_directory(path):
+    """Make renames and deletions in a directory durable (a no-op where unsupported)"""
+    try:
+        fd = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def time_range_clause(filters):
+    """SQL conditions and parameters for the non-empty TIME_FILTERS (epoch ms)"""
+    conditions, params = [], []
+    for name, value in filters.items():
+        if value is not None:
+            conditions.append(TIME_FILTERS[name])
+            params.append(int(value))
+    return conditions, params
+
+# Tables that can be exported and imported, with their JSON encoded columns
+TRANSFER_TABLES = {
+    'reports': ['meta', 'recipients'],
+    'tasks': ['meta']
+}
 
 class Database:
     _lock = threading.Lock()
+    # Threads blocked in get_connection waiting for _lock
+    _lock_waiters = 0
+    _waiters_lock = threading.Lock()
     
     @contextmanager
     def get_connection(self):
         """Thread-safe database connection context manager"""
-        with self._lock:
-            try:
-                yield self.db
-            except Exception as e:
-                self.db.rollback()
-                raise
-            else:
-                self.db.commit()
+        with Database._waiters_lock:
+            Database._lock_waiters += 1
+        try:
+            self._lock.acquire()
+        finally:
+            with Database._waiters_lock:
+                Database._lock_waiters -= 1
+        try:
+            yield self.db
+        except Exception as e:
+            self.db.rollback()
+            raise
+        else:
+            self.db.commit()
+        finally:
+            self._lock.release()
+
+    def lock_waiters(self):
+        """Number of threads currently waiting for the connection lock"""
+        return Database._lock_waiters
+
+    def _write(self, operation):
+        """Run operation(conn) as a write and return its result.
+
+        With the write queue enabled the operation is handed to the writer
+        thread and committed together with other pending writes; otherwise it
+        runs and commits on its own.
+        """
+        if self.write_queue:
+            return self.write_queue.submit(operation)
+        with self.get_connection() as conn:
+            return operation(conn)
 
     def __init__(self):
         self.db = None
         self.db_path = None
+        self.in_memory = False
+        self.memory_uri = None
+        self.last_snapshot = None
+        self.last_activity = time.monotonic()
+        self._untracked = threading.local()
+        self.write_queue = None
 
     def log(self, message):
         if os.getenv('ENVIRONMENT') != 'test':
             print(message)
 
-    def initialize(self):
+    def resolve_path(self):
+        """The database file; in memory mode, the file loaded at startup and snapshotted to"""
+        return os.getenv('TEST_DB_PATH') or os.path.join(os.getcwd(), 'data', 'database.sqlite')
+
+    def initialize(self, primary=True, in_memory=None):
+        """Open the database.
+
+        Only the primary process (the leader when several API workers share
+        the file) restores pending backups and creates or converts the schema;
+        other processes just connect.
+
+        With in_memory (default: DB_IN_MEMORY=1) the data lives in a
+        shared-cache in-memory database, loaded from the database file if it
+        exists and written back only by snapshot(). It is private to this
+        process, so it cannot be combined with other processes sharing the file.
+        """
         try:
-            data_dir = os.getenv('TEST_DB_PATH') or os.path.join(os.getcwd(), 'data', 'database.sqlite')
+            data_dir = self.resolve_path()
             os.makedirs(os.path.dirname(data_dir), exist_ok=True)
             
             self.db_path = data_dir
-            self.db = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,
-                detect_types=sqlite3.PARSE_DECLTYPES
-            )
-            self.db.row_factory = sqlite3.Row
+            self.in_memory = (in_memory if in_memory is not None
+                              else os.getenv('DB_IN_MEMORY') == '1')
+            if self.in_memory and not primary:
+                raise RuntimeError("An in-memory database cannot be shared with other processes")
+            if primary:
+                restore_pending_backup(self.db_path)
+
+            if self.in_memory:
+                # A fresh name per initialize, so a re-initialized instance starts clean
+                self.memory_uri = f"file:memdb-{uuid.uuid4().hex}?mode=memory&cache=shared"
+                self.db = None
+                self.db = self.open_connection()
+                # Lets maintenance hand freed pages back; a loaded file brings its own setting
+                self.db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                self._load_snapshot()
+            else:
+                self.db = self.open_connection()
+                if primary:
+                    self._configure()
             
-            print(f"Database initialized successfully at: {self.db_path}")
-            self._create_tables()
+            print(f"Database initialized successfully at: {self.memory_uri if self.in_memory else self.db_path}")
+            if primary:
+                self.ensure_schema()
+            if os.getenv('WRITE_QUEUE') == '1':
+                self.enable_write_queue()
             return True
         except Exception as error:
             print(f"Error initializing database: {error}")
             raise
 
+    def _touch(self, statement):
+        if not getattr(self._untracked, 'active', False):
+            self.last_activity = time.monotonic()
+
+    @contextmanager
+    def untracked(self):
+        """Statements run by this thread inside the block do not count as activity"""
+        self._untracked.active = True
+        try:
+            yield
+        finally:
+            self._untracked.active = False
+
+    def ensure_schema(self):
+        """Create missing tables and apply pending migrations; safe to repeat"""
+        self._create_tables()
+        self._migrate()
+
+    def close(self):
+        self.disable_write_queue()
+        if self.db:
+            if self.in_memory and os.getenv('DB_SNAPSHOT_ON_CLOSE', '1') == '1':
+                try:
+                    self.snapshot()
+                except Exception as error:
+                    print(f"Final snapshot failed: {error}")
+            self.db.close()
+
+    def snapshot(self, path=None):
+        """Write the in-memory database to path (the database file by default).
+
+        The copy is made into a temporary file with the backup API while
+        writes are held off, then moved over the old file, so the file always
+        holds a complete snapshot. Returns {"path", "size", "duration"}.
+        """
+        if not self.in_memory:
+            raise RuntimeError("Snapshots are only taken of in-memory databases")
+        path = path or self.db_path
+        partial = f"{path}.partial"
+        started = time.monotonic()
+        target = sqlite3.connect(partial)
+        try:
+            with self._lock:
+                self.db.backup(target)
+        finally:
+            target.close()
+        os.replace(partial, path)
+        # WAL files left from running on the file would be replayed over the snapshot
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        fsync_directory(os.path.dirname(path))
+
+        self.last_snapshot = {
+            'path': path,
+            'size': os.path.getsize(path),
+            'duration': round(time.monotonic() - started, 3),
+            'taken_at': datetime.now()
+        }
+        return self.last_snapshot
+
+    def copy_to(self, path):
+        """Write a compacted copy of the database to path with VACUUM INTO.
+
+        The copy is made in one read transaction, so it is consistent. For a
+        database file that happens on a separate connection and, in WAL mode,
+        writers keep committing meanwhile. An in-memory database is copied on
+        the main connection with writes held off, since readers on other
+        connections would lock its tables and make writes fail.
+        """
+        if self.in_memory:
+            with self._lock:
+                self.db.execute('VACUUM INTO ?', (path,))
+            return
+        connection = self.open_connection()
+        try:
+            connection.execute('VACUUM INTO ?', (path,))
+        finally:
+            connection.close()
+
+    def _load_snapshot(self):
+        """Copy the database file, if there is one, into the in-memory database"""
+        if not os.path.exists(self.db_path):
+            return
+        source = sqlite3.connect(self.db_path)
+        try:
+            source.backup(self.db)
+        finally:
+            source.close()
+        self.log(f"Loaded {self.db_path} into memory")
+
+    def enable_write_queue(self, window=None, max_batch=None):
+        """Route writes through a group-commit writer thread"""
+        if not self.write_queue:
+            self.write_queue = WriteQueue(self, window=window, max_batch=max_batch)
+            self.write_queue.start()
+        return self.write_queue
+
+    def disable_write_queue(self):
+        """Flush pending writes and go back to committing each write"""
+        if self.write_queue:
+            write_queue, self.write_queue = self.write_queue, None
+            write_queue.stop()
+
+    def open_connection(self):
+        """Open an additional connection to the same database file (or in-memory database)"""
+        connection = sqlite3.connect(
+            self.memory_uri if self.in_memory else self.db_path,
+            # Other processes may hold the write lock; wait for it instead of failing
+            timeout=float(os.getenv('DB_BUSY_TIMEOUT', 30)),
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            uri=self.in_memory
+        )
+        connection.row_factory = sqlite3.Row
+        # Reads count as activity as well as writes, so idle maintenance waits for them
+        connection.set_trace_callback(self._touch)
+        return connection
+
     def check_connection(self):
         if not self.db:
             raise Exception("Database not initialized")
@@ -73,21 +387,132 @@ class Database:
             """)
             tables = cursor.fetchall()
             
-            stats = os.stat(self.db_path)
+            wal_path = f"{self.db_path}-wal"
+            maintenance = self.db.execute(
+                'SELECT task, last_run_at FROM maintenance_runs'
+            ).fetchall()
+            page_size = self.db.execute('PRAGMA page_size').fetchone()[0]
+            page_count = self.db.execute('PRAGMA page_count').fetchone()[0]
+            if self.in_memory:
+                size, last_modified = page_size * page_count, None
+            else:
+                stats = os.stat(self.db_path)
+                size, last_modified = stats.st_size, stats.st_mtime_ns
             
             return {
                 'path': self.db_path,
-                'size': stats.st_size,
+                'in_memory': self.in_memory,
+                'last_snapshot': self.last_snapshot,
+                'size': size,
                 'tables': [t['name'] for t in tables],
-                'last_modified': datetime.fromtimestamp(stats.st_mtime)
+                'last_modified': datetime.fromtimestamp(last_modified / 1e9) if last_modified else None,
+                'last_modified_ms': last_modified // 1_000_000 if last_modified else None,
+                'schema_version': self.db.execute('PRAGMA user_version').fetchone()[0],
+                'page_size': page_size,
+                'page_count': page_count,
+                'freelist_count': self.db.execute('PRAGMA freelist_count').fetchone()[0],
+                'journal_mode': self.db.execute('PRAGMA journal_mode').fetchone()[0],
+                'auto_vacuum': AUTO_VACUUM_MODES[self.db.execute('PRAGMA auto_vacuum').fetchone()[0]],
+                'wal_size': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                'last_maintenance': {m['task']: m['last_run_at'] for m in maintenance}
             }
         except Exception as error:
             print(f"Failed to get database info: {error}")
             raise
 
+    # Maintenance Operations
+    def optimize(self, analyze=False, analysis_limit=1000):
+        """Refresh query planner statistics.
+
+        PRAGMA optimize only re-analyzes tables whose statistics look stale;
+        analyze=True forces a full ANALYZE. analysis_limit bounds how many rows
+        ANALYZE samples per index so the pass stays cheap on large tables.
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+                if analyze:
+                    conn.execute('ANALYZE')
+                conn.execute('PRAGMA optimize')
+            self._record_maintenance('analyze' if analyze else 'optimize')
+            return True
+        except Exception as error:
+            print(f"Error optimizing database: {error}")
+            raise
+
+    def incremental_vacuum(self, pages_per_step=64, time_budget=0.2):
+        """Return free pages to the filesystem a few pages at a time.
+
+        The lock is released between steps and the pass stops once time_budget
+        seconds have elapsed. Returns the number of pages reclaimed.
+        """
+        reclaimed = 0
+        deadline = time.monotonic() + time_budget
+        try:
+            while time.monotonic() < deadline:
+                with self.get_connection() as conn:
+                    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                    if not before:
+                        break
+                    conn.execute(f'PRAGMA incremental_vacuum({int(pages_per_step)})').fetchall()
+                    freed = before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if freed <= 0:
+                    break
+                reclaimed += freed
+                time.sleep(0)
+            self._record_maintenance('incremental_vacuum')
+            return reclaimed
+        except Exception as error:
+            print(f"Error running incremental vacuum: {error}")
+            raise
+
+    def vacuum(self):
+        """Rebuild the file with a full VACUUM, switching it to incremental auto-vacuum.
+
+        Holds off every reader and writer until it finishes and needs free disk
+        space about the size of the database, so it only runs on request.
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+                mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            return {'auto_vacuum': AUTO_VACUUM_MODES[mode]}
+        except Exception as error:
+            print(f"Error vacuuming database: {error}")
+            raise
+
+    def checkpoint(self, mode='PASSIVE'):
+        """Copy WAL frames back into the database file.
+
+        PASSIVE never waits on readers or writers; TRUNCATE additionally
+        resets the WAL file to zero bytes once every frame has been copied.
+        Returns (busy, wal_frames, checkpointed_frames).
+        """
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Invalid checkpoint mode: {mode}")
+
+        try:
+            with self.get_connection() as conn:
+                result = tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+            self._record_maintenance('checkpoint')
+            return result
+        except Exception as error:
+            print(f"Error checkpointing database: {error}")
+            raise
+
+    def _record_maintenance(self, task):
+        with self.get_connection() as conn:
+            conn.execute(
+                """INSERT INTO maintenance_runs (task, last_run_at)
+                   VALUES (?, datetime('now'))
+                   ON CONFLICT(task) DO UPDATE SET last_run_at = excluded.last_run_at""",
+                [task]
+            )
+
     # Report CRUD Operations
     def create_report(self, name, created_by, meta=None, template='', recipients=None):
-        with self.get_connection() as conn:
+        def write(conn):
             cursor = conn.execute(
                 """INSERT INTO reports 
                    (name, created_by, meta, template, recipients, created_at, updated_at)
@@ -96,11 +521,12 @@ class Database:
                  template, json.dumps(recipients or [])]
             )
             return cursor.lastrowid
+        return self._write(write)
 
     def get_report(self, id):
         try:
-            cursor = self.db.execute('SELECT * FROM reports WHERE id = ?', [id])
-            report = cursor.fetchone()
+            with self.get_connection() as conn:
+                report = conn.execute('SELECT * FROM reports WHERE id = ?', [id]).fetchone()
             if report:
                 # Convert JSON strings back to Python objects
                 report = dict(report)
@@ -113,7 +539,7 @@ class Database:
 
     def update_report(self, report_id, updates):
         try:
-            with self.get_connection() as conn:
+            def write(conn):
                 # Convert lists and dicts to JSON strings
                 if 'recipients' in updates:
                     updates['recipients'] = json.dumps(updates['recipients'])
@@ -130,33 +556,78 @@ class Database:
                     [*values, report_id]
                 )
                 return cursor.rowcount > 0
+            return self._write(write)
         except Exception as error:
             print(f"Error updating report: {error}")
             raise
 
-    def duplicate_report(self, id):
+    def duplicate_report(self, id, include_tasks=False):
         try:
-            original = self.get_report(id)
-            if not original:
-                return None
+            new_ids = self.duplicate_reports([id], include_tasks=include_tasks)
+            return new_ids[0] if new_ids else None
+        except Exception as error:
+            print(f"Error duplicating report: {error}")
+            raise
 
-            copy = {
-                'name': f"{original['name']} (Copy)",
-                'created_by': original['created_by'],
-                'meta': original['meta'],
-                'template': original['template'],
-                'recipients': original['recipients']
-            }
+    def duplicate_reports(self, ids, include_tasks=False, copies=1):
+        """Clone reports (and optionally their active tasks) in one transaction.
+
+        Rows are copied server-side with INSERT ... SELECT, so nothing is decoded
+        or re-encoded in Python. Returns the new report ids in input order;
+        ids that do not exist are skipped.
+        """
+        if copies < 1:
+            return []
+
+        try:
+            def write(conn):
+                new_ids = []
+                for id in ids:
+                    cursor = conn.execute(
+                        """INSERT INTO reports
+                           (name, created_by, meta, template, recipients, created_at, updated_at)
+                           WITH RECURSIVE copies(n) AS (
+                               SELECT 1 UNION ALL SELECT n + 1 FROM copies WHERE n < ?
+                           )
+                           SELECT name || ' (Copy)', created_by, COALESCE(meta, '{}'), template,
+                                  COALESCE(recipients, '[]'), datetime('now'), datetime('now')
+                           FROM reports, copies WHERE id = ?""",
+                        [copies, id]
+                    )
+                    if cursor.rowcount <= 0:
+                        continue
+
+                    # Rows from a single INSERT get consecutive AUTOINCREMENT ids
+                    last_id = cursor.lastrowid
+                    first_id = last_id - cursor.rowcount + 1
 
-            return self.create_report(**copy)
+                    if include_tasks:
+                        conn.execute(
+                            """INSERT INTO tasks
+                               (name, type, report_id, schedule, is_active, meta, created_at, updated_at)
+                               WITH RECURSIVE targets(report_id) AS (
+                                   SELECT ? UNION ALL
+                                   SELECT report_id + 1 FROM targets WHERE report_id < ?
+                               )
+                               SELECT t.name, t.type, targets.report_id, t.schedule, t.is_active,
+                                      t.meta, datetime('now'), datetime('now')
+                               FROM tasks t, targets
+                               WHERE t.report_id = ? AND t.is_active = 1
+                               ORDER BY targets.report_id, t.id""",
+                            [first_id, last_id, id]
+                        )
+
+                    new_ids.extend(range(first_id, last_id + 1))
+                return new_ids
+            return self._write(write)
         except Exception as error:
-            print(f"Error duplicating report: {error}")
+            print(f"Error duplicating reports: {error}")
             raise
 
     # Task Operations
     def create_task(self, name, type, report_id=None, schedule=None, is_active=1, meta=None):
         try:
-            with self.get_connection() as conn:
+            def write(conn):
                 cursor = conn.execute(
                     """INSERT INTO tasks 
                        (name, type, report_id, schedule, is_active, meta, created_at, updated_at)
@@ -165,11 +636,12 @@ class Database:
                      json.dumps(meta) if meta else '{}']
                 )
                 return cursor.lastrowid
+            return self._write(write)
         except Exception as error:
             print(f"Error creating task: {error}")
             raise
 
-    def get_task(self, task_id):
+    def get_task(self, task_id, include_archived=False):
         try:
             with self.get_connection() as conn:
                 cursor = conn.execute(
@@ -177,6 +649,12 @@ class Database:
                     [task_id]
                 )
                 row = cursor.fetchone()
+                if not row and include_archived:
+                    cursor = conn.execute(
+                        'SELECT * FROM tasks_archive WHERE id = ?',
+                        [task_id]
+                    )
+                    row = cursor.fetchone()
                 if not row:
                     return None
                 
@@ -190,13 +668,24 @@ class Database:
             print(f"Error getting task: {error}")
             raise
 
-    def get_tasks_by_report_id(self, report_id):
+    def get_tasks_by_report_id(self, report_id, include_archived=False):
         try:
             with self.get_connection() as conn:
-                cursor = conn.execute(
-                    'SELECT * FROM tasks WHERE report_id = ? AND is_active = 1', 
-                    [report_id]
-                )
+                if include_archived:
+                    columns = ', '.join(TASK_COLUMNS + TASK_TIME_COLUMNS)
+                    cursor = conn.execute(
+                        f"""SELECT {columns}, NULL AS archived_at FROM tasks
+                            WHERE report_id = ? AND is_active = 1
+                            UNION ALL
+                            SELECT {columns}, archived_at FROM tasks_archive
+                            WHERE report_id = ?""",
+                        [report_id, report_id]
+                    )
+                else:
+                    cursor = conn.execute(
+                        'SELECT * FROM tasks WHERE report_id = ? AND is_active = 1', 
+                        [report_id]
+                    )
                 tasks = []
                 columns = [col[0] for col in cursor.description]
                 for row in cursor.fetchall():
@@ -210,7 +699,7 @@ class Database:
 
     def update_task(self, task_id, updates):
         try:
-            with self.get_connection() as conn:
+            def write(conn):
                 # Convert any JSON fields
                 if 'meta' in updates:
                     updates['meta'] = json.dumps(updates['meta'])
@@ -225,23 +714,123 @@ class Database:
                     [*values, task_id]
                 )
                 return cursor.rowcount > 0
+            return self._write(write)
         except Exception as error:
             print(f"Error updating task: {error}")
             raise
 
     def delete_task(self, task_id):
         try:
-            with self.get_connection() as conn:
+            def write(conn):
                 # Soft delete by deactivating
                 cursor = conn.execute(
-                    'UPDATE tasks SET is_active = 0 WHERE id = ?',
+                    "UPDATE tasks SET is_active = 0, updated_at = datetime('now') WHERE id = ?",
                     [task_id]
                 )
                 return cursor.rowcount > 0
+            return self._write(write)
         except Exception as error:
             print(f"Error deleting task: {error}")
             raise
 
+    def set_task_dependencies(self, task_id, depends_on):
+        """Replace the tasks that task_id depends on.
+
+        Raises ValueError for unknown or inactive tasks and for dependencies
+        that would create a cycle; the graph is left unchanged then.
+        """
+        depends_on = sorted(set(depends_on))
+
+        def write(conn):
+            if task_id in depends_on:
+                raise ValueError("A task cannot depend on itself")
+            ids = [task_id, *depends_on]
+            placeholders = ', '.join('?' * len(ids))
+            found = {row[0] for row in conn.execute(
+                f'SELECT id FROM tasks WHERE is_active = 1 AND id IN ({placeholders})', ids
+            )}
+            missing = [id for id in ids if id not in found]
+            if missing:
+                raise ValueError(f"Unknown tasks: {', '.join(map(str, missing))}")
+
+            conn.execute('DELETE FROM task_dependencies WHERE task_id = ?', [task_id])
+            conn.executemany(
+                'INSERT INTO task_dependencies (task_id, depends_on) VALUES (?, ?)',
+                [(task_id, parent) for parent in depends_on]
+            )
+            # A cycle exists if task_id is now among its own ancestors
+            cycle = conn.execute(
+                """WITH RECURSIVE ancestors(id) AS (
+                       SELECT depends_on FROM task_dependencies WHERE task_id = ?
+                       UNION
+                       SELECT d.depends_on FROM task_dependencies d JOIN ancestors a ON d.task_id = a.id
+                   )
+                   SELECT 1 FROM ancestors WHERE id = ?""",
+                [task_id, task_id]
+            ).fetchone()
+            if cycle:
+                raise ValueError("Dependencies would create a cycle")
+            return depends_on
+        try:
+            return self._write(write)
+        except Exception as error:
+            print(f"Error setting task dependencies: {error}")
+            raise
+
+    def get_task_dependencies(self, task_id):
+        """{"depends_on": [...], "dependents": [...]} task ids of the direct neighbours"""
+        depends_on = self.db.execute(
+            'SELECT depends_on FROM task_dependencies WHERE task_id = ? ORDER BY depends_on',
+            [task_id]
+        ).fetchall()
+        dependents = self.db.execute(
+            'SELECT task_id FROM task_dependencies WHERE depends_on = ? ORDER BY task_id',
+            [task_id]
+        ).fetchall()
+        return {
+            'depends_on': [row[0] for row in depends_on],
+            'dependents': [row[0] for row in dependents]
+        }
+
+    def get_task_graph(self, task_ids):
+        """The given tasks plus everything they depend on, directly or not.
+
+        Returns (tasks by id, [(task_id, depends_on), ...]) of the active
+        tasks. Raises ValueError when one of them depends on a task that has
+        been deleted, since running it without that input would be wrong.
+        """
+        try:
+            placeholders = ', '.join('?' * len(task_ids))
+            graph = f"""WITH RECURSIVE graph(id) AS (
+                            SELECT id FROM tasks WHERE id IN ({placeholders})
+                            UNION
+                            SELECT d.depends_on FROM task_dependencies d JOIN graph g ON d.task_id = g.id
+                        )"""
+            with self.get_connection() as conn:
+                tasks = {}
+                for row in conn.execute(
+                    f"{graph} SELECT * FROM tasks WHERE is_active = 1 AND id IN (SELECT id FROM graph)",
+                    list(task_ids)
+                ):
+                    task = dict(row)
+                    task['meta'] = json.loads(task['meta']) if task['meta'] else {}
+                    tasks[task['id']] = task
+                edges = [
+                    (row[0], row[1]) for row in conn.execute(
+                        f"""{graph} SELECT task_id, depends_on FROM task_dependencies
+                            WHERE task_id IN (SELECT id FROM graph)""",
+                        list(task_ids)
+                    )
+                    if row[0] in tasks
+                ]
+            deleted = sorted({depends_on for _, depends_on in edges if depends_on not in tasks})
+            if deleted:
+                raise ValueError(f"Pipeline depends on deleted tasks: {', '.join(map(str, deleted))}")
+            return tasks, edges
+        except Exception as error:
+            print(f"Error getting task graph: {error}")
+            raise
+
     def get_tasks_for_scheduling(self):
         try:
             cursor = self.db.execute("""
@@ -254,30 +843,108 @@ class Database:
             print(f"Error getting tasks for scheduling: {error}")
             raise
 
-    def deactivate_task(self, id):
+    def get_due_tasks(self, limit=100):
+        """Active scheduled tasks whose next run is due or not yet computed"""
         try:
             cursor = self.db.execute(
-                'UPDATE tasks SET is_active = 0 WHERE id = ?', 
-                [id]
+                f"""SELECT * FROM tasks
+                   WHERE is_active = 1 AND schedule IS NOT NULL
+                   AND (next_run_at_ms IS NULL OR next_run_at_ms <= {NOW_MS})
+                   ORDER BY next_run_at_ms
+                   LIMIT ?""",
+                [limit]
+            )
+            tasks = []
+            for row in cursor.fetchall():
+                task = dict(row)
+                task['meta'] = json.loads(task['meta']) if task['meta'] else {}
+                tasks.append(task)
+            return tasks
+        except Exception as error:
+            print(f"Error getting due tasks: {error}")
+            raise
+
+    def set_task_next_run(self, task_id, next_run_at):
+        """Record when a task should run next (a UTC 'YYYY-MM-DD HH:MM:SS' string)"""
+        def write(conn):
+            cursor = conn.execute(
+                'UPDATE tasks SET next_run_at = ? WHERE id = ?',
+                [next_run_at, task_id]
             )
-            self.db.commit()
             return cursor.rowcount > 0
+        return self._write(write)
+
+    def deactivate_task(self, id):
+        try:
+            def write(conn):
+                cursor = conn.execute(
+                    "UPDATE tasks SET is_active = 0, updated_at = datetime('now') WHERE id = ?",
+                    [id]
+                )
+                return cursor.rowcount > 0
+            return self._write(write)
         except Exception as error:
             print(f"Error deactivating task: {error}")
             raise
 
     # List Operations
-    def list_reports(self):
+    def list_reports(self, columns=None, **time_filters):
+        """List reports, newest first, optionally within TIME_FILTERS ranges.
+
+        columns limits which columns are read (all of them by default).
+        """
         try:
-            cursor = self.db.execute(
-                'SELECT * FROM reports ORDER BY created_at DESC, id DESC'
-            )
-            reports = cursor.fetchall()
+            conditions, params = time_range_clause(time_filters)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            selected = self._select_columns('reports', columns)
+            with self.get_connection() as conn:
+                reports = conn.execute(
+                    f'SELECT {selected} FROM reports {where} ORDER BY created_at_ms DESC, id DESC',
+                    params
+                ).fetchall()
             return [dict(report) for report in reports]
         except Exception as error:
             print(f"Error listing reports: {error}")
             raise
 
+    def list_tasks(self, columns=None, **time_filters):
+        """List active tasks, newest first, optionally within TIME_FILTERS ranges.
+
+        columns limits which columns are read (all of them by default).
+        """
+        try:
+            conditions, params = time_range_clause(time_filters)
+            selected = self._select_columns('tasks', columns)
+            with self.get_connection() as conn:
+                rows = conn.execute(
+                    f"""SELECT {selected} FROM tasks
+                        WHERE {' AND '.join(['is_active = 1', *conditions])}
+                        ORDER BY created_at_ms DESC, id DESC""",
+                    params
+                ).fetchall()
+            tasks = []
+            for row in rows:
+                task = dict(row)
+                if 'meta' in task:
+                    task['meta'] = json.loads(task['meta']) if task['meta'] else {}
+                tasks.append(task)
+            return tasks
+        except Exception as error:
+            print(f"Error listing tasks: {error}")
+            raise
+
+    def _select_columns(self, table, columns):
+        """SELECT list for the given columns, rejecting names the table lacks"""
+        if columns is None:
+            return '*'
+        if not columns:
+            raise ValueError(f"No columns selected from {table}")
+        available = self.get_table_columns(table, include_generated=True)
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+        return ', '.join(columns)
+
     def get_task_by_report_id(self, report_id):
         try:
             with self.get_connection() as conn:
@@ -296,19 +963,443 @@ class Database:
             print(f"Error getting task by report ID: {error}")
             raise
 
+    # Bulk Transfer Operations
+    def iter_rows(self, table, batch_size=1000):
+        """Yield rows of a table as dicts, fetching batch_size rows at a time.
+
+        Uses its own connection, so a long export only holds a read snapshot
+        and never blocks writers. An in-memory database is read on the main
+        connection instead, one batch per turn of the lock, since readers on
+        other connections would lock its tables and make writes fail.
+        """
+        if table not in TRANSFER_TABLES:
+            raise ValueError(f"Unsupported table: {table}")
+
+        if self.in_memory:
+            last_id = float('-inf')
+            while True:
+                with self.get_connection() as conn:
+                    rows = conn.execute(
+                        f'SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?',
+                        [last_id, batch_size]
+                    ).fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
+                last_id = rows[-1]['id']
+
+        connection = self.open_connection()
+        try:
+            cursor = connection.execute(f'SELECT * FROM {table} ORDER BY id')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            connection.close()
+
+    def get_table_columns(self, table, include_generated=False):
+        """Return {column name: declared type} for a table, in table order.
+
+        Generated columns (hidden 2 and 3 in table_xinfo) cannot be written, so
+        they are left out unless include_generated is set.
+        """
+        with self.get_connection() as conn:
+            rows = conn.execute(f'PRAGMA table_xinfo({table})').fetchall()
+        return {row['name']: row['type'] for row in rows
+                if include_generated or row['hidden'] not in (2, 3)}
+
+    def import_rows(self, table, rows):
+        """Insert or replace a batch of rows in a single transaction.
+
+        Rows keep their id when one is given, so exported data can be loaded
+        back without remapping report_id references. Unknown keys are ignored.
+        Returns the number of rows written.
+        """
+        if table not in TRANSFER_TABLES:
+            raise ValueError(f"Unsupported table: {table}")
+
+        columns = self.get_table_columns(table)
+        try:
+            def write(conn):
+                for row in rows:
+                    values = {key: value for key, value in row.items() if key in columns}
+                    for key in TRANSFER_TABLES[table]:
+                        if key in values and not isinstance(values[key], (str, type(None))):
+                            values[key] = json.dumps(values[key])
+
+                    keys = list(values.keys())
+                    conn.execute(
+                        f"""INSERT OR REPLACE INTO {table} ({', '.join(keys)})
+                            VALUES ({', '.join('?' * len(keys))})""",
+                        [values[key] for key in keys]
+                    )
+                return len(rows)
+            return self._write(write)
+        except Exception as error:
+            print(f"Error importing {table}: {error}")
+            raise
+
+    def save_import_progress(self, progress):
+        """Store import progress so any API worker process can report it"""
+        with self.get_connection() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO import_runs
+                   (id, status, imported, error, started_at, finished_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [progress['id'], progress['status'], json.dumps(progress['imported']),
+                 progress['error'], progress['started_at'], progress['finished_at']]
+            )
+
+    def get_import_progress(self, import_id):
+        row = self.db.execute('SELECT * FROM import_runs WHERE id = ?', [import_id]).fetchone()
+        if not row:
+            return None
+        progress = dict(row)
+        progress['imported'] = json.loads(progress['imported']) if progress['imported'] else {}
+        return progress
+
+    # Job Queue Operations
+    def enqueue_job(self, job, params=None, task_id=None, priority=0, max_attempts=3, delay=0):
+        """Add a job to the durable queue, runnable after `delay` seconds; returns its id"""
+        def write(conn):
+            return self._insert_queued_job(conn, job, params, task_id, priority, max_attempts, delay)
+        try:
+            return self._write(write)
+        except Exception as error:
+            print(f"Error enqueueing job: {error}")
+            raise
+
+    def enqueue_due_task(self, task, job, params, next_run_at, priority=0, max_attempts=3):
+        """Queue a run of a scheduled task and advance its next_run_at in one transaction"""
+        def write(conn):
+            job_id = self._insert_queued_job(conn, job, params, task['id'], priority, max_attempts, 0)
+            conn.execute('UPDATE tasks SET next_run_at = ? WHERE id = ?', [next_run_at, task['id']])
+            return job_id
+        try:
+            return self._write(write)
+        except Exception as error:
+            print(f"Error enqueueing task {task['id']}: {error}")
+            raise
+
+    def _insert_queued_job(self, conn, job, params, task_id, priority, max_attempts, delay):
+        cursor = conn.execute(
+            f"""INSERT INTO job_queue
+                (task_id, job, params, priority, max_attempts, available_at_ms,
+                 created_at_ms, updated_at_ms)
+                VALUES (?, ?, ?, ?, ?, {NOW_MS} + ?, {NOW_MS}, {NOW_MS})""",
+            [task_id, job, json.dumps(params or {}), priority, max_attempts, int(delay * 1000)]
+        )
+        return cursor.lastrowid
+
+    def claim_jobs(self, owner, limit=1, lease_seconds=60, retry_delay=5, retry_delay_max=300):
+        """Lease up to `limit` runnable jobs to `owner` and return them.
+
+        Expired leases are recovered first: their jobs are queued again with
+        the same exponential backoff workers use for failures (`retry_delay`
+        seconds doubling per attempt, at most `retry_delay_max`), or
+        dead-lettered once out of attempts. Both
+        steps start with a write, so the transaction holds SQLite's write lock
+        throughout and concurrent workers in any process never receive the
+        same job. Every claim increments lease_token, the fencing token that
+        heartbeats and completions must present.
+        """
+        lease_ms = int(lease_seconds * 1000)
+
+        def write(conn):
+            conn.execute(
+                f"""UPDATE job_queue
+                    SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                        error = 'Lease expired (worker ' || lease_owner || ' stopped responding)',
+                        available_at_ms = {NOW_MS} + MIN(? << MIN(MAX(attempts - 1, 0), 30), ?),
+                        finished_at_ms = CASE WHEN attempts >= max_attempts THEN {NOW_MS} END,
+                        lease_owner = NULL,
+                        lease_expires_at_ms = NULL,
+                        updated_at_ms = {NOW_MS}
+                    WHERE status = 'running' AND lease_expires_at_ms < {NOW_MS}""",
+                [int(retry_delay * 1000), int(retry_delay_max * 1000)]
+            )
+            rows = conn.execute(
+                f"""UPDATE job_queue
+                    SET status = 'running',
+                        attempts = attempts + 1,
+                        lease_owner = ?,
+                        lease_token = lease_token + 1,
+                        lease_expires_at_ms = {NOW_MS} + ?,
+                        heartbeat_at_ms = {NOW_MS},
+                        updated_at_ms = {NOW_MS}
+                    WHERE id IN (
+                        SELECT id FROM job_queue
+                        WHERE status = 'queued' AND available_at_ms <= {NOW_MS}
+                        ORDER BY priority DESC, available_at_ms, id
+                        LIMIT ?
+                    )
+                    RETURNING *""",
+                [owner, lease_ms, limit]
+            ).fetchall()
+            # RETURNING gives no ordering guarantee
+            jobs = sorted(rows, key=lambda row: (-row['priority'], row['available_at_ms'], row['id']))
+            return [self._decode_queued_job(row) for row in jobs]
+        try:
+            return self._write(write)
+        except Exception as error:
+            print(f"Error claiming jobs: {error}")
+            raise
+
+    def heartbeat_job(self, job_id, lease_token, lease_seconds=60):
+        """Extend a lease; False means it was lost and the job must be abandoned"""
+        def write(conn):
+            cursor = conn.execute(
+                f"""UPDATE job_queue
+                    SET lease_expires_at_ms = {NOW_MS} + ?, heartbeat_at_ms = {NOW_MS}
+                    WHERE id = ? AND lease_token = ? AND status = 'running'""",
+                [int(lease_seconds * 1000), job_id, lease_token]
+            )
+            return cursor.rowcount > 0
+        return self._write(write)
+
+    def complete_job(self, job_id, lease_token, result=None):
+        """Record success; ignored (returns False) unless the lease is still held"""
+        def write(conn):
+            cursor = conn.execute(
+                f"""UPDATE job_queue
+                    SET status = 'succeeded', result = ?, error = NULL, lease_owner = NULL,
+                        lease_expires_at_ms = NULL, finished_at_ms = {NOW_MS}, updated_at_ms = {NOW_MS}
+                    WHERE id = ? AND lease_token = ? AND status = 'running'""",
+                [json.dumps(result, default=str), job_id, lease_token]
+            )
+            return cursor.rowcount > 0
+        return self._write(write)
+
+    def fail_job(self, job_id, lease_token, error, retry_delay=5):
+        """Record a failed attempt: retry after retry_delay seconds or dead-letter the job.
+
+        Like complete_job, does nothing unless the lease is still held.
+        """
+        def write(conn):
+            cursor = conn.execute(
+                f"""UPDATE job_queue
+                    SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                        error = ?,
+                        available_at_ms = {NOW_MS} + ?,
+                        finished_at_ms = CASE WHEN attempts >= max_attempts THEN {NOW_MS} END,
+                        lease_owner = NULL,
+                        lease_expires_at_ms = NULL,
+                        updated_at_ms = {NOW_MS}
+                    WHERE id = ? AND lease_token = ? AND status = 'running'""",
+                [str(error), int(retry_delay * 1000), job_id, lease_token]
+            )
+            return cursor.rowcount > 0
+        return self._write(write)
+
+    def retry_dead_job(self, job_id):
+        """Queue a dead-lettered job again with a fresh set of attempts"""
+        def write(conn):
+            cursor = conn.execute(
+                f"""UPDATE job_queue
+                    SET status = 'queued', attempts = 0, available_at_ms = {NOW_MS},
+                        finished_at_ms = NULL, updated_at_ms = {NOW_MS}
+                    WHERE id = ? AND status = 'dead'""",
+                [job_id]
+            )
+            return cursor.rowcount > 0
+        return self._write(write)
+
+    def get_queued_job(self, job_id):
+        row = self.db.execute('SELECT * FROM job_queue WHERE id = ?', [job_id]).fetchone()
+        return self._decode_queued_job(row) if row else None
+
+    def list_queued_jobs(self, status=None, limit=100):
+        if status is not None and status not in JOB_QUEUE_STATUSES:
+            raise ValueError(f"Invalid job status: {status}")
+        cursor = self.db.execute(
+            f"""SELECT * FROM job_queue {'WHERE status = ?' if status else ''}
+                ORDER BY id DESC LIMIT ?""",
+            [status, limit] if status else [limit]
+        )
+        return [self._decode_queued_job(row) for row in cursor.fetchall()]
+
+    def get_job_queue_stats(self):
+        counts = dict(self.db.execute(
+            'SELECT status, COUNT(*) FROM job_queue GROUP BY status'
+        ).fetchall())
+        workers = self.db.execute(
+            """SELECT lease_owner, COUNT(*) AS running FROM job_queue
+               WHERE status = 'running' GROUP BY lease_owner"""
+        ).fetchall()
+        return {
+            **{status: counts.get(status, 0) for status in JOB_QUEUE_STATUSES},
+            'workers': {row['lease_owner']: row['running'] for row in workers}
+        }
+
+    def purge_job_queue(self, retention_days, batch_size=500, time_budget=0.5, log_dir=None):
+        """Delete succeeded and dead queued jobs finished more than retention_days ago, in batches.
+
+        With log_dir, the purged jobs' logs (queue-<id>.log) are deleted too.
+        """
+        purged = 0
+        deadline = time.monotonic() + time_budget
+        try:
+            while True:
+                with self.get_connection() as conn:
+                    ids = [row['id'] for row in conn.execute(
+                        f"""DELETE FROM job_queue WHERE id IN (
+                               SELECT id FROM job_queue
+                               WHERE status IN ('succeeded', 'dead')
+                                 AND finished_at_ms <= {NOW_MS} - ?
+                               LIMIT ?
+                           )
+                           RETURNING id""",
+                        [int(retention_days * 86400000), batch_size]
+                    ).fetchall()]
+                    purged += len(ids)
+
+                if log_dir:
+                    for job_id in ids:
+                        try:
+                            (Path(log_dir) / f'queue-{job_id}.log').unlink(missing_ok=True)
+                        except OSError as error:
+                            print(f"Could not remove log of queued job {job_id}: {error}")
+
+                if len(ids) < batch_size or time.monotonic() >= deadline:
+                    break
+                time.sleep(0)
+            return purged
+        except Exception as error:
+            print(f"Error purging job queue: {error}")
+            raise
+
+    def _decode_queued_job(self, row):
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
     # Delete Operations
     def delete_report(self, id):
         try:
-            with self.get_connection() as conn:
+            def write(conn):
                 # First, deactivate any associated tasks
-                conn.execute('UPDATE tasks SET is_active = 0 WHERE report_id = ?', [id])
+                conn.execute(
+                    "UPDATE tasks SET is_active = 0, updated_at = datetime('now') WHERE report_id = ?",
+                    [id]
+                )
                 # Then delete the report
                 cursor = conn.execute('DELETE FROM reports WHERE id = ?', [id])
                 return cursor.rowcount > 0
+            return self._write(write)
         except Exception as error:
             print(f"Error deleting report: {error}")
             raise
 
+    # Archival Operations
+    def archive_tasks(self, grace_seconds=86400, batch_size=500, time_budget=0.5):
+        """Move inactive and orphaned tasks into tasks_archive in small batches.
+
+        Inactive tasks go once they have been inactive for grace_seconds.
+        Tasks of a deleted report go on the next pass: delete_report
+        deactivates them, so only the (small) set of inactive tasks is checked
+        for a missing report, and an active task is never archived. Each batch is its own short transaction so writers are never held up
+        for long; the pass stops once time_budget seconds have elapsed.
+        Returns the number of tasks archived.
+        """
+        columns = ', '.join(TASK_COLUMNS)
+        archived = 0
+        deadline = time.monotonic() + time_budget
+        try:
+            while True:
+                with self.get_connection() as conn:
+                    ids = [row[0] for row in conn.execute(
+                        # UNION rather than OR, so each half can use the partial index
+                        f"""SELECT id FROM tasks
+                           WHERE is_active = 0 AND updated_at_ms <= {NOW_MS} - ?
+                           UNION
+                           SELECT id FROM tasks INDEXED BY idx_tasks_inactive
+                           WHERE is_active = 0 AND report_id IS NOT NULL AND NOT EXISTS
+                               (SELECT 1 FROM reports WHERE reports.id = tasks.report_id)
+                           LIMIT ?""",
+                        [int(grace_seconds * 1000), batch_size]
+                    )]
+                    if not ids:
+                        break
+
+                    placeholders = ', '.join('?' * len(ids))
+                    conn.execute(
+                        f"""INSERT OR REPLACE INTO tasks_archive ({columns}, archived_at)
+                            SELECT {columns}, datetime('now') FROM tasks
+                            WHERE id IN ({placeholders})""",
+                        ids
+                    )
+                    conn.execute(f'DELETE FROM tasks WHERE id IN ({placeholders})', ids)
+                    # Edges into archived tasks stay, so their dependents keep
+                    # failing get_task_graph until their dependencies are replaced
+                    conn.execute(
+                        f'DELETE FROM task_dependencies WHERE task_id IN ({placeholders})', ids
+                    )
+                    archived += len(ids)
+
+                if len(ids) < batch_size or time.monotonic() >= deadline:
+                    break
+                # Give waiting requests a chance at the lock between batches
+                time.sleep(0)
+            return archived
+        except Exception as error:
+            print(f"Error archiving tasks: {error}")
+            raise
+
+    def purge_archive(self, retention_days, batch_size=500, time_budget=0.5):
+        """Permanently delete archived tasks older than retention_days, in batches."""
+        purged = 0
+        deadline = time.monotonic() + time_budget
+        try:
+            while True:
+                with self.get_connection() as conn:
+                    cursor = conn.execute(
+                        """DELETE FROM tasks_archive WHERE id IN (
+                               SELECT id FROM tasks_archive
+                               WHERE archived_at <= datetime('now', ?)
+                               LIMIT ?
+                           )""",
+                        [f'-{int(retention_days)} days', batch_size]
+                    )
+                    purged += cursor.rowcount
+
+                if cursor.rowcount < batch_size or time.monotonic() >= deadline:
+                    break
+                time.sleep(0)
+            return purged
+        except Exception as error:
+            print(f"Error purging task archive: {error}")
+            raise
+
+    def _configure(self):
+        """Apply connection and file level settings"""
+        auto_vacuum = self.db.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if auto_vacuum != 2:
+            if self.db.execute('PRAGMA page_count').fetchone()[0] == 0:
+                self.db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            else:
+                # Converting takes a full VACUUM, too slow to run during startup
+                self.log("Database does not use incremental auto-vacuum; "
+                         "POST /api/database/vacuum converts it")
+        self.db.execute('PRAGMA journal_mode = WAL')
+
+    def _migrate(self):
+        """Apply the MIGRATIONS this database file has not had yet"""
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            self.log(f"Migrating database to schema version {number}...")
+            try:
+                self.db.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+            except Exception as error:
+                if self.db.in_transaction:
+                    self.db.rollback()
+                print(f"Error applying migration {number}: {error}")
+                raise
+
     def _create_tables(self):
         """Create the necessary database tables if they don't exist"""
         try:
@@ -337,6 +1428,42 @@ class Database:
                     next_run_at TIMESTAMP,
                     FOREIGN KEY (report_id) REFERENCES reports(id)
                 );
+
+                -- Used by report lookups and the archiver's orphan check
+                CREATE INDEX IF NOT EXISTS idx_tasks_report_id ON tasks(report_id);
+
+                CREATE TABLE IF NOT EXISTS tasks_archive (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    report_id INTEGER,
+                    schedule TEXT,
+                    is_active INTEGER,
+                    meta TEXT,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    next_run_at TIMESTAMP,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_tasks_archive_report_id
+                    ON tasks_archive(report_id);
+                CREATE INDEX IF NOT EXISTS idx_tasks_archive_archived_at
+                    ON tasks_archive(archived_at);
+
+                CREATE TABLE IF NOT EXISTS maintenance_runs (
+                    task TEXT PRIMARY KEY,
+                    last_run_at TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS import_runs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    imported TEXT,
+                    error TEXT,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                );
             """)
             self.db.commit()
             return True
@@ -0,0 +1,115 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared by every process on the host.
+
+    The lock is released automatically by the OS if the holding process dies,
+    which makes it suitable for electing a leader among API workers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def locked(self):
+        return self._file is not None
+
+    def acquire(self, blocking=True):
+        if self._file:
+            return True
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if fcntl:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(lock_file.fileno(), flags)
+            else:
+                lock_file.seek(0)
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                msvcrt.locking(lock_file.fileno(), mode, 1)
+        except OSError:
+            lock_file.close()
+            if blocking:
+                raise
+            return False
+
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if not self._file:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class LeaderElection:
+    """Elects one process (per database file) to run background work.
+
+    The first process to take the leader lock becomes leader. Followers call
+    start() to keep retrying every `interval` seconds, and whichever takes
+    over after the leader exits calls `on_elected`.
+    """
+
+    def __init__(self, lock_path, on_elected, interval=None):
+        self.lock = FileLock(lock_path)
+        self.on_elected = on_elected
+        self.interval = float(interval or os.getenv('LEADER_RETRY_INTERVAL', 5))
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self.lock.locked
+
+    def try_acquire(self):
+        """Try to become leader without waiting; returns True if this process leads"""
+        return self.lock.acquire(blocking=False)
+
+    def start(self):
+        """Keep retrying in the background until this process becomes leader"""
+        if self.is_leader or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.lock.release()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.try_acquire():
+                    self.on_elected()
+                    return
+            except Exception as error:
+                print(f"Leader election failed: {error}")
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+
+class MaintenanceScheduler:
+    """Background thread that keeps the SQLite file healthy.
+
+    Work only starts once the database has been idle for `idle_seconds`, and
+    every step is bounded so a pass never blocks requests for long:
+
+    - PRAGMA optimize every `optimize_interval` seconds, and a full (sampled)
+      ANALYZE every `analyze_interval` seconds
+    - incremental vacuum every `vacuum_interval` seconds, limited to
+      `time_budget` seconds per pass
+    - a PASSIVE WAL checkpoint every `checkpoint_interval` seconds, upgraded to
+      TRUNCATE when the WAL has grown past `wal_truncate_bytes`
+    """
+
+    def __init__(self, database, interval=None, idle_seconds=None, time_budget=None,
+                 optimize_interval=None, analyze_interval=None,
+                 vacuum_interval=None, checkpoint_interval=None,
+                 wal_truncate_bytes=None):
+        self.database = database
+        self.interval = float(interval if interval is not None
+                              else os.getenv('MAINTENANCE_INTERVAL', 30))
+        self.idle_seconds = float(idle_seconds if idle_seconds is not None
+                                  else os.getenv('MAINTENANCE_IDLE_SECONDS', 5))
+        self.time_budget = float(time_budget or os.getenv('MAINTENANCE_TIME_BUDGET', 0.2))
+        self.intervals = {
+            'optimize': float(optimize_interval or os.getenv('MAINTENANCE_OPTIMIZE_INTERVAL', 3600)),
+            'analyze': float(analyze_interval or os.getenv('MAINTENANCE_ANALYZE_INTERVAL', 86400)),
+            'incremental_vacuum': float(vacuum_interval or os.getenv('MAINTENANCE_VACUUM_INTERVAL', 600)),
+            'checkpoint': float(checkpoint_interval or os.getenv('MAINTENANCE_CHECKPOINT_INTERVAL', 60)),
+        }
+        self.wal_truncate_bytes = int(wal_truncate_bytes or
+                                      os.getenv('MAINTENANCE_WAL_TRUNCATE_BYTES', 64 * 1024 * 1024))
+
+        self._last_run = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def is_idle(self):
+        return time.monotonic() - self.database.last_activity >= self.idle_seconds
+
+    def run_once(self, force=False):
+        """Run every maintenance task that is due and return what ran.
+
+        With force=True all tasks run immediately, idle or not.
+        """
+        results = {}
+        for task in self.intervals:
+            if not force:
+                if not self.is_idle():
+                    break
+                if time.monotonic() - self._last_run.get(task, float('-inf')) < self.intervals[task]:
+                    continue
+
+            # Maintenance's own statements must not make the database look busy
+            with self.database.untracked():
+                results[task] = self._run_task(task)
+            self._last_run[task] = time.monotonic()
+        return results
+
+    def _run_task(self, task):
+        if task == 'optimize':
+            return self.database.optimize()
+        if task == 'analyze':
+            return self.database.optimize(analyze=True)
+        if task == 'incremental_vacuum':
+            return self.database.incremental_vacuum(time_budget=self.time_budget)
+
+        mode = 'PASSIVE'
+        wal_path = f"{self.database.db_path}-wal"
+        if os.path.exists(wal_path) and os.path.getsize(wal_path) > self.wal_truncate_bytes:
+            mode = 'TRUNCATE'
+        return self.database.checkpoint(mode)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as error:
+                print(f"Database maintenance failed: {error}")
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteQueue:
+    """Group-commit writer for a Database.
+
+    Callers submit write operations (functions taking the connection) and
+    block until their result is ready. A single writer thread collects
+    operations for up to `window` seconds or `max_batch` operations, runs them
+    in one transaction and commits once, so concurrent writers share a single
+    fsync. Every operation runs inside its own savepoint: one failing
+    operation is rolled back and its caller gets the exception, while the rest
+    of the batch still commits.
+    """
+
+    def __init__(self, database, window=None, max_batch=None):
+        self.database = database
+        self.window = float(window if window is not None
+                            else int(os.getenv('WRITE_QUEUE_WINDOW_MS', 2)) / 1000)
+        self.max_batch = int(max_batch or os.getenv('WRITE_QUEUE_MAX_BATCH', 256))
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batches = 0
+        self.operations = 0
+
+    def start(self):
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Commit everything already submitted, then stop the writer thread"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, operation):
+        future = Future()
+        self._queue.put((operation, future))
+        return future.result()
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'batches': self.batches,
+            'operations': self.operations,
+            'window': self.window,
+            'max_batch': self.max_batch
+        }
+
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        with self.database.get_connection() as conn:
+            try:
+                # Take the write lock up front so other processes cannot interleave
+                conn.execute('BEGIN IMMEDIATE')
+                for operation, future in batch:
+                    conn.execute('SAVEPOINT write_op')
+                    try:
+                        results.append((future, operation(conn), None))
+                    except Exception as error:
+                        conn.execute('ROLLBACK TO write_op')
+                        results.append((future, None, error))
+                    conn.execute('RELEASE write_op')
+                conn.commit()
+            except Exception as error:
+                conn.rollback()
+                for _, future in batch:
+                    future.set_exception(error)
+                return
+
+        self.batches += 1
+        self.operations += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -27,11 +27,14 @@ if (!fs.existsSync(paths.logs)) {
 }
 
 // Set up logging
+// One append stream for the app's lifetime; writes are buffered instead of
+// blocking the main process with a synchronous open/write/close per message
+const logStream = fs.createWriteStream(path.join(paths.logs, 'app.log'), { flags: 'a' });
+
 function log(message) {
     const timestamp = new Date().toISOString();
     const logMessage = `${timestamp}: ${message}\n`;
-    const logFile = path.join(paths.logs, 'app.log');
-    fs.appendFileSync(logFile, logMessage);
+    logStream.write(logMessage);
     console.log(message);
 }
 
@@ -307,4 +310,8 @@ app.on('activate', () => {
     }
 });
 
-app.on('before-quit', cleanup);
\ No newline at end of file
+app.on('before-quit', cleanup);
+
+app.on('will-quit', () => {
+    logStream.end();
+});
\ No newline at end of file
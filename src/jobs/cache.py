@@ -0,0 +1,184 @@
+# src/jobs/cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.jobs.runner import get_job_path
+
+
+def get_cache_options(task):
+    """Return the task's cache settings, or None when caching is off.
+
+    Caching is opt-in per task through meta["cache"]: either true, or an
+    object with an optional "ttl" (seconds) and "inputs" (file paths whose
+    size and modification time become part of the key).
+    """
+    options = (task.get('meta') or {}).get('cache')
+    if options is True:
+        return {}
+    if isinstance(options, dict):
+        return options
+    return None
+
+
+def fingerprint_file(path):
+    try:
+        stats = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    return f"{stats.st_size}:{stats.st_mtime_ns}"
+
+
+class ResultCache:
+    """Disk-backed cache of job results.
+
+    Keys hash the job module's source, the canonical JSON of its params and
+    the fingerprints of any declared input files, so editing the job or
+    touching an input invalidates earlier results. Entries expire after their
+    TTL, and once the cache grows past `max_bytes` the least recently used
+    entries (by file mtime, refreshed on every hit) are evicted.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, ttl=None):
+        self.directory = Path(directory or os.getenv(
+            'RESULT_CACHE_DIR', os.path.expanduser('~/ReportManager/cache/results')
+        ))
+        self.max_bytes = int(max_bytes or os.getenv('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.ttl = float(ttl or os.getenv('RESULT_CACHE_TTL', 3600))
+
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def job_version(self, job):
+        """Hash of the job module source, recomputed only when the file changes"""
+        path = get_job_path(job)
+        stats = path.stat()
+        signature = (stats.st_size, stats.st_mtime_ns)
+        cached = self._versions.get(job)
+        if not cached or cached[0] != signature:
+            cached = (signature, hashlib.sha256(path.read_bytes()).hexdigest())
+            self._versions[job] = cached
+        return cached[1]
+
+    def make_key(self, job, params, inputs=None):
+        payload = {
+            'job': job,
+            'version': self.job_version(job),
+            'params': params or {},
+            'inputs': {path: fingerprint_file(path) for path in sorted(inputs or [])}
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+
+        if time.time() - entry['created_at'] > entry['ttl']:
+            self._discard(path)
+            self.misses += 1
+            return None
+
+        # Refresh the mtime so eviction treats this entry as recently used
+        os.utime(path)
+        self.hits += 1
+        return entry['result']
+
+    def put(self, key, result, ttl=None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({
+            'created_at': time.time(),
+            'ttl': float(ttl or self.ttl),
+            'result': result
+        }, default=str).encode('utf-8')
+
+        partial = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        partial.write_bytes(data)
+
+        with self._lock:
+            # An overwritten entry no longer counts towards the size
+            replaced = self._file_size(path)
+            os.replace(partial, path)
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        for path in self.directory.glob('*/*.json'):
+            self._remove(path)
+        with self._lock:
+            self._size = 0
+
+    def stats(self):
+        return {
+            'directory': str(self.directory),
+            'size': self._size if self._size is not None else self._scan_size(),
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def _file_size(self, path):
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _discard(self, path):
+        """Remove an entry and take it off the tracked size"""
+        with self._lock:
+            size = self._file_size(path)
+            self._remove(path)
+            if self._size is not None:
+                self._size = max(self._size - size, 0)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _scan_size(self):
+        return sum(path.stat().st_size for path in self.directory.glob('*/*.json'))
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is at 90% of max_bytes"""
+        entries = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                stats = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stats.st_mtime, stats.st_size, path))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            self._remove(path)
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
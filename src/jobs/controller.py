@@ -0,0 +1,384 @@
+# src/jobs/controller.py
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+
+from src.jobs.cache import get_cache_options
+from src.jobs.runner import resolve_job, run_job
+
+OVERFLOW_POLICIES = ('reject', 'coalesce', 'defer')
+
+RUN_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+# Durable queue jobs (src.jobs.worker) log to queue-<job id>.log in the same directory
+QUEUE_LOG_PATTERN = re.compile(r'queue-[0-9]+')
+
+
+class QueueFullError(Exception):
+    """Raised when a run is rejected because the queue is full."""
+
+
+def parse_type_limits(value):
+    """Parse "report=2,export=1" into {"report": 2, "export": 1}"""
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            task_type, limit = item.split('=', 1)
+            limits[task_type.strip()] = int(limit)
+    return limits
+
+
+class JobRun:
+    """A single execution of a task, from submission to completion."""
+
+    def __init__(self, task, priority=0):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.task_id = task.get('id')
+        self.type = task['type']
+        self.job, self.params = resolve_job(task)
+        self.cache_options = get_cache_options(task)
+        self.cache_key = None
+        self.cached = False
+        self.profile = None
+        self.log_path = None
+        self.priority = priority
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    @property
+    def wait_time(self):
+        if self.started_at is None:
+            return time.time() - self.submitted_at
+        return self.started_at - self.submitted_at
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Call callback(run) once the run has finished, right away if it already has"""
+        with self._callback_lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self):
+        with self._callback_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as error:
+                print(f"Callback for run {self.id} failed: {error}")
+
+    def to_dict(self):
+        timestamp = lambda t: datetime.fromtimestamp(t) if t else None
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'type': self.type,
+            'job': self.job,
+            'priority': self.priority,
+            'status': self.status,
+            'cached': self.cached,
+            'profile': self.profile[1].name if self.profile else None,
+            'log': self.id if self.log_path else None,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': timestamp(self.submitted_at),
+            'started_at': timestamp(self.started_at),
+            'finished_at': timestamp(self.finished_at),
+            'wait_time': round(self.wait_time, 3)
+        }
+
+
+class ExecutionController:
+    """Priority queue in front of job execution.
+
+    Runs start in priority order (higher first, FIFO within a priority) as
+    long as fewer than `max_concurrency` runs are active overall and fewer
+    than `type_limits[type]` runs of that task type are active. At most
+    `max_queue` runs wait; when the queue is full the overflow policy decides:
+
+    - reject: raise QueueFullError
+    - coalesce: reuse a queued run of the same task if there is one,
+      otherwise reject
+    - defer: park the run outside the queue (at most `max_deferred` of them,
+      rejecting beyond that) and enqueue it once space frees up, highest
+      priority first
+
+    With a ResultCache, runs of tasks that opt into caching are answered from
+    the cache when possible, without taking a queue slot or running the job.
+    With a Profiler, runs of tasks it has armed bypass the cache and execute
+    under the profiler. Each executed run's output goes to `<log_dir>/<run id>.log`,
+    which is deleted when the run drops out of the last `history` finished runs;
+    prune_logs removes logs left behind by earlier processes.
+
+    All of this state lives in the process: with several API workers each has
+    its own controller, so the concurrency, type and queue limits apply per
+    worker, not across them.
+    """
+
+    def __init__(self, execute=None, max_concurrency=None, type_limits=None,
+                 max_queue=None, max_deferred=None, overflow_policy=None, history=1000, cache=None,
+                 profiler=None, log_dir=None, log_retention_days=None):
+        self.execute = execute or (lambda run: run_job(run.job, run.params, profile=run.profile,
+                                                       log_path=run.log_path))
+        self.cache = cache
+        self.profiler = profiler
+        self.log_dir = Path(log_dir or os.getenv('JOB_LOG_DIR') or os.path.join(
+            os.getenv('APP_LOG_DIR', os.path.expanduser('~/ReportManager/logs')), 'jobs'
+        ))
+        self.log_retention_days = float(log_retention_days if log_retention_days is not None
+                                        else os.getenv('JOB_LOG_RETENTION_DAYS', 7))
+        self.max_concurrency = int(max_concurrency or os.getenv('JOB_MAX_CONCURRENCY', os.cpu_count() or 1))
+        self.type_limits = (type_limits if type_limits is not None
+                            else parse_type_limits(os.getenv('JOB_TYPE_LIMITS')))
+        self.max_queue = int(max_queue or os.getenv('JOB_MAX_QUEUE', 100))
+        self.max_deferred = int(max_deferred or os.getenv('JOB_MAX_DEFERRED', 1000))
+        self.overflow_policy = overflow_policy or os.getenv('JOB_OVERFLOW_POLICY', 'reject')
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy: {self.overflow_policy}")
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._deferred = []
+        self._sequence = itertools.count()
+        self._running = {}
+        self._runs = OrderedDict()
+        self._history = history
+        self._wait_times = deque(maxlen=1000)
+        self.counters = {
+            'submitted': 0, 'rejected': 0, 'coalesced': 0, 'deferred': 0,
+            'succeeded': 0, 'failed': 0, 'cached': 0
+        }
+
+    def submit(self, task, priority=0, coalesce=True):
+        """Queue a run of the task and return its JobRun.
+
+        With coalesce=False the run is never merged into a queued run of the
+        same task, for callers whose runs differ in more than the task itself.
+        """
+        run = JobRun(task, priority)
+        # The capture is only claimed once the run is accepted, so a rejected
+        # run does not use up a profile session
+        profiled = bool(self.profiler) and self.profiler.is_task_armed(run.task_id)
+        if not profiled and self._complete_from_cache(run):
+            return run
+
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == 'defer' and len(self._deferred) < self.max_deferred:
+                    self._track(run)
+                    self._claim_profile(run, profiled)
+                    run.status = 'deferred'
+                    heapq.heappush(self._deferred, (-run.priority, next(self._sequence), run))
+                    self.counters['deferred'] += 1
+                    return run
+
+                if self.overflow_policy == 'coalesce' and coalesce:
+                    for _, _, queued in self._queue:
+                        if queued.task_id is not None and queued.task_id == run.task_id:
+                            self.counters['coalesced'] += 1
+                            return queued
+
+                self.counters['rejected'] += 1
+                raise QueueFullError(f"Job queue is full ({self.max_queue} runs waiting"
+                                     + (f", {len(self._deferred)} deferred)" if self._deferred else ")"))
+
+            self._track(run)
+            self._claim_profile(run, profiled)
+            self._enqueue(run)
+            self.counters['submitted'] += 1
+            self._dispatch()
+            return run
+
+    def get_run(self, run_id):
+        run = self._runs.get(run_id)
+        return run.to_dict() if run else None
+
+    def stats(self):
+        with self._lock:
+            queued_by_type = {}
+            for _, _, run in self._queue:
+                queued_by_type[run.type] = queued_by_type.get(run.type, 0) + 1
+            running_by_type = {}
+            for run in self._running.values():
+                running_by_type[run.type] = running_by_type.get(run.type, 0) + 1
+            wait_times = sorted(self._wait_times)
+            oldest = max((run.wait_time for _, _, run in self._queue), default=0)
+
+            return {
+                'queue_depth': len(self._queue),
+                'deferred': len(self._deferred),
+                'running': len(self._running),
+                'queued_by_type': queued_by_type,
+                'running_by_type': running_by_type,
+                'max_concurrency': self.max_concurrency,
+                'type_limits': self.type_limits,
+                'max_queue': self.max_queue,
+                'max_deferred': self.max_deferred,
+                'overflow_policy': self.overflow_policy,
+                'wait_time': {
+                    'oldest_queued': round(oldest, 3),
+                    'mean': round(sum(wait_times) / len(wait_times), 3) if wait_times else 0,
+                    'p95': round(wait_times[int(len(wait_times) * 0.95)], 3) if wait_times else 0
+                },
+                **self.counters
+            }
+
+    def _claim_profile(self, run, profiled):
+        if profiled:
+            run.profile = self.profiler.claim_task(run.task_id)
+
+    def _complete_from_cache(self, run):
+        """Finish the run with a cached result if there is one"""
+        if not self.cache or run.cache_options is None:
+            return False
+        try:
+            run.cache_key = self.cache.make_key(run.job, run.params, run.cache_options.get('inputs'))
+            result = self.cache.get(run.cache_key)
+        except Exception as error:
+            print(f"Result cache lookup failed for {run.job}: {error}")
+            run.cache_key = None
+            return False
+        if result is None:
+            return False
+
+        run.result = result
+        run.cached = True
+        run.status = 'succeeded'
+        run.started_at = run.finished_at = time.time()
+        with self._lock:
+            self._track(run)
+            self.counters['cached'] += 1
+        run._finish()
+        return True
+
+    def _store_in_cache(self, run):
+        """Cache a successful result; a cache failure never fails the run"""
+        try:
+            self.cache.put(run.cache_key, run.result, ttl=run.cache_options.get('ttl'))
+        except Exception as error:
+            print(f"Result cache store failed for {run.job}: {error}")
+
+    def prune_logs(self):
+        """Delete run and queue job logs older than log_retention_days that no tracked run owns"""
+        if self.log_retention_days <= 0 or not self.log_dir.is_dir():
+            return 0
+        cutoff = time.time() - self.log_retention_days * 86400
+        removed = 0
+        for path in self.log_dir.glob('*.log'):
+            if path.stem in self._runs or not (RUN_ID_PATTERN.fullmatch(path.stem)
+                                               or QUEUE_LOG_PATTERN.fullmatch(path.stem)):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _track(self, run):
+        """Remember the run, forgetting the oldest finished runs beyond `history`.
+
+        Queued, deferred and running runs are always kept, so their status
+        can be looked up however many of them there are.
+        """
+        self._runs[run.id] = run
+        excess = len(self._runs) - self._history
+        if excess > 0:
+            evicted = []
+            for tracked in self._runs.values():
+                if len(evicted) >= excess:
+                    break
+                if tracked.finished_at is not None:
+                    evicted.append(tracked)
+            for tracked in evicted:
+                del self._runs[tracked.id]
+                self._remove_log(tracked)
+        return run
+
+    def _remove_log(self, run):
+        if run.log_path:
+            try:
+                run.log_path.unlink(missing_ok=True)
+            except OSError as error:
+                print(f"Could not remove log of run {run.id}: {error}")
+
+    def _enqueue(self, run):
+        run.status = 'queued'
+        heapq.heappush(self._queue, (-run.priority, next(self._sequence), run))
+
+    def _can_start(self, run, running_by_type):
+        limit = self.type_limits.get(run.type)
+        return limit is None or running_by_type.get(run.type, 0) < limit
+
+    def _dispatch(self):
+        """Start every queued run that fits the limits; caller holds the lock"""
+        while self._deferred and len(self._queue) < self.max_queue:
+            self._enqueue(heapq.heappop(self._deferred)[2])
+
+        if len(self._running) >= self.max_concurrency:
+            return
+
+        running_by_type = {}
+        for run in self._running.values():
+            running_by_type[run.type] = running_by_type.get(run.type, 0) + 1
+
+        startable = []
+        for entry in sorted(self._queue):
+            if len(self._running) + len(startable) >= self.max_concurrency:
+                break
+            run = entry[2]
+            if self._can_start(run, running_by_type):
+                startable.append(entry)
+                running_by_type[run.type] = running_by_type.get(run.type, 0) + 1
+
+        if not startable:
+            return
+        for entry in startable:
+            self._queue.remove(entry)
+        heapq.heapify(self._queue)
+
+        for _, _, run in startable:
+            run.status = 'running'
+            run.started_at = time.time()
+            self._wait_times.append(run.wait_time)
+            self._running[run.id] = run
+            threading.Thread(target=self._execute, args=(run,), name=f'job-{run.id[:8]}',
+                             daemon=True).start()
+
+    def _execute(self, run):
+        run.log_path = self.log_dir / f'{run.id}.log'
+        try:
+            run.result = self.execute(run)
+            run.status = 'succeeded'
+            if run.cache_key and isinstance(run.result, dict) and run.result.get('status') != 'error':
+                self._store_in_cache(run)
+        except Exception as error:
+            run.error = str(error)
+            run.status = 'failed'
+        finally:
+            run.finished_at = time.time()
+            with self._lock:
+                self._running.pop(run.id, None)
+                self.counters[run.status] += 1
+                self._dispatch()
+            run._finish()
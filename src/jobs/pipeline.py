@@ -0,0 +1,206 @@
+# src/jobs/pipeline.py
+import copy
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from src.jobs.controller import QueueFullError
+
+FINISHED = ('succeeded', 'failed', 'skipped')
+
+
+class PipelineRun:
+    """One execution of a task dependency graph."""
+
+    def __init__(self, tasks, edges, max_parallel, priority=0):
+        self.id = uuid.uuid4().hex
+        self.tasks = tasks
+        self.max_parallel = max_parallel
+        self.priority = priority
+        self.parents = {task_id: set() for task_id in tasks}
+        self.children = {task_id: set() for task_id in tasks}
+        for task_id, depends_on in edges:
+            self.parents[task_id].add(depends_on)
+            self.children[depends_on].add(task_id)
+        self.order = self._topological_order()
+        self.remaining_path = self._remaining_path()
+
+        self.nodes = {task_id: {'status': 'pending', 'run_id': None, 'result': None,
+                                'error': None, 'started_at': None, 'finished_at': None}
+                      for task_id in tasks}
+        self.status = 'running'
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._lock = threading.RLock()
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def running(self):
+        return sum(node['status'] == 'running' for node in self.nodes.values())
+
+    def ready(self):
+        """Pending tasks whose parents all succeeded, longest remaining chain first"""
+        ready = [task_id for task_id in self.order
+                 if self.nodes[task_id]['status'] == 'pending'
+                 and all(self.nodes[parent]['status'] == 'succeeded' for parent in self.parents[task_id])]
+        return sorted(ready, key=lambda task_id: -self.remaining_path[task_id])
+
+    def critical_path(self):
+        """Seconds along the slowest chain of finished tasks"""
+        longest = {}
+        for task_id in self.order:
+            node = self.nodes[task_id]
+            duration = (node['finished_at'] - node['started_at']
+                        if node['started_at'] and node['finished_at'] else 0)
+            longest[task_id] = duration + max((longest[parent] for parent in self.parents[task_id]),
+                                              default=0)
+        return max(longest.values(), default=0)
+
+    def to_dict(self):
+        timestamp = lambda t: datetime.fromtimestamp(t) if t else None
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'max_parallel': self.max_parallel,
+                'tasks': [{
+                    'task_id': task_id,
+                    'name': self.tasks[task_id]['name'],
+                    'depends_on': sorted(self.parents[task_id]),
+                    **node,
+                    'started_at': timestamp(node['started_at']),
+                    'finished_at': timestamp(node['finished_at'])
+                } for task_id, node in ((task_id, self.nodes[task_id]) for task_id in self.order)],
+                'submitted_at': timestamp(self.submitted_at),
+                'finished_at': timestamp(self.finished_at),
+                'elapsed': round((self.finished_at or time.time()) - self.submitted_at, 3),
+                'critical_path': round(self.critical_path(), 3)
+            }
+
+    def _topological_order(self):
+        pending = {task_id: len(parents) for task_id, parents in self.parents.items()}
+        order = [task_id for task_id in sorted(pending) if pending[task_id] == 0]
+        for task_id in order:
+            for child in sorted(self.children[task_id]):
+                pending[child] -= 1
+                if pending[child] == 0:
+                    order.append(child)
+        if len(order) != len(self.tasks):
+            raise ValueError("Task dependencies contain a cycle")
+        return order
+
+    def _remaining_path(self):
+        """Number of tasks on the longest chain starting at each task"""
+        length = {}
+        for task_id in reversed(self.order):
+            length[task_id] = 1 + max((length[child] for child in self.children[task_id]), default=0)
+        return length
+
+
+class PipelineExecutor:
+    """Runs task dependency graphs on an ExecutionController.
+
+    A task is submitted as soon as every task it depends on has succeeded,
+    with at most `max_parallel` tasks of a pipeline running at once (the
+    controller's own limits still apply). Among ready tasks, those heading the
+    longest remaining chain go first. Each task receives its parents' results
+    as params["upstream"], keyed by parent task id. When a task fails, the
+    tasks downstream of it are skipped while independent branches carry on.
+    """
+
+    def __init__(self, controller, max_parallel=None, history=100):
+        self.controller = controller
+        self.max_parallel = int(max_parallel or os.getenv('PIPELINE_MAX_PARALLEL', 0)
+                                or controller.max_concurrency)
+        self._pipelines = OrderedDict()
+        self._history = history
+
+    def start(self, tasks, edges, max_parallel=None, priority=0):
+        """Start running the graph from Database.get_task_graph and return its PipelineRun"""
+        if not tasks:
+            raise ValueError("Pipeline has no tasks")
+        pipeline = PipelineRun(tasks, edges, max_parallel or self.max_parallel, priority)
+        self._pipelines[pipeline.id] = pipeline
+        self._evict()
+        with pipeline._lock:
+            self._schedule(pipeline)
+        return pipeline
+
+    def _evict(self):
+        """Forget the oldest finished pipelines beyond `history`; running ones are kept"""
+        excess = len(self._pipelines) - self._history
+        for pipeline_id, pipeline in list(self._pipelines.items()):
+            if excess <= 0:
+                break
+            if pipeline.status != 'running':
+                del self._pipelines[pipeline_id]
+                excess -= 1
+
+    def get(self, pipeline_id):
+        pipeline = self._pipelines.get(pipeline_id)
+        return pipeline.to_dict() if pipeline else None
+
+    def _schedule(self, pipeline):
+        """Submit ready tasks while there is room; caller holds the pipeline lock"""
+        for task_id in pipeline.ready():
+            if pipeline.running() >= pipeline.max_parallel:
+                break
+            node = pipeline.nodes[task_id]
+            if node['status'] != 'pending':
+                continue  # already started by a nested call for a cached run
+            node['status'] = 'running'
+            node['started_at'] = time.time()
+            try:
+                # Each run carries this pipeline's upstream results, so it must
+                # not be merged into another queued run of the same task
+                run = self.controller.submit(self._with_upstream(pipeline, task_id), pipeline.priority,
+                                             coalesce=False)
+            except QueueFullError as error:
+                self._finish_task(pipeline, task_id, 'failed', error=str(error))
+                continue
+            node['run_id'] = run.id
+            # Runs answered from the cache complete (and call back) right here
+            run.add_done_callback(lambda run, task_id=task_id: self._on_done(pipeline, task_id, run))
+        self._check_finished(pipeline)
+
+    def _with_upstream(self, pipeline, task_id):
+        task = copy.deepcopy(pipeline.tasks[task_id])
+        meta = task.setdefault('meta', {})
+        meta['params'] = {
+            **meta.get('params', {}),
+            'upstream': {str(parent): pipeline.nodes[parent]['result']
+                         for parent in sorted(pipeline.parents[task_id])}
+        }
+        return task
+
+    def _on_done(self, pipeline, task_id, run):
+        with pipeline._lock:
+            self._finish_task(pipeline, task_id, run.status, run.result, run.error)
+            self._schedule(pipeline)
+
+    def _finish_task(self, pipeline, task_id, status, result=None, error=None):
+        node = pipeline.nodes[task_id]
+        node.update(status=status, result=result, error=error, finished_at=time.time())
+        if status != 'succeeded':
+            self._skip_downstream(pipeline, task_id)
+
+    def _skip_downstream(self, pipeline, task_id):
+        for child in pipeline.children[task_id]:
+            node = pipeline.nodes[child]
+            if node['status'] == 'pending':
+                node.update(status='skipped', error=f"Upstream task {task_id} did not succeed")
+                self._skip_downstream(pipeline, child)
+
+    def _check_finished(self, pipeline):
+        if pipeline.status != 'running':
+            return
+        if all(node['status'] in FINISHED for node in pipeline.nodes.values()):
+            pipeline.finished_at = time.time()
+            pipeline.status = ('succeeded' if all(node['status'] == 'succeeded'
+                                                  for node in pipeline.nodes.values()) else 'failed')
+            pipeline._done.set()
@@ -0,0 +1,108 @@
+# src/jobs/runner.py
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from src.jobs.utils.job_utils import tail_lines
+
+JOBS_DIR = Path(__file__).parent
+PROJECT_ROOT = JOBS_DIR.parent.parent
+
+# Modules of the job system itself; running one as a job would, for example,
+# start a queue worker that never exits
+INFRASTRUCTURE_MODULES = frozenset({
+    '__init__', 'cache', 'controller', 'pipeline', 'runner', 'scheduler', 'worker'
+})
+
+
+class JobError(Exception):
+    """Raised when a job cannot be started or exits with an error."""
+
+
+def resolve_job(task):
+    """Return (job name, params) for a task.
+
+    The job module defaults to the task type and can be overridden with
+    meta["job"]; meta["params"] is passed to the job as its JSON argument.
+    """
+    meta = task.get('meta') or {}
+    return meta.get('job', task['type']), meta.get('params', {})
+
+
+def get_job_path(job):
+    if (not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', job) or job in INFRASTRUCTURE_MODULES
+            or not (JOBS_DIR / f'{job}.py').exists()):
+        raise JobError(f"Unknown job: {job}")
+    return JOBS_DIR / f'{job}.py'
+
+
+def parse_result(output):
+    """Return the last JSON object a job printed that is not a progress line"""
+    for line in reversed(output.splitlines()):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get('type') != 'progress':
+            return data
+    return None
+
+
+def run_job(job, params=None, timeout=None, profile=None, log_path=None):
+    """Run src/jobs/<job>.py in a subprocess and return its JSON result.
+
+    profile is an optional (mode, output path) pair; the job then runs under
+    src.main.profiling, which writes a pstats or collapsed-stack file.
+    With log_path, stdout and stderr are written to that file as the job runs
+    (unbuffered, so the log can be followed live) and the result is read from
+    its last lines. A job still running after `timeout` seconds (default
+    JOB_TIMEOUT, 3600; 0 for no limit) is killed and raises JobError.
+    """
+    get_job_path(job)
+    if timeout is None:
+        timeout = float(os.getenv('JOB_TIMEOUT', 3600))
+    timeout = timeout or None
+    command = [sys.executable, '-m', f'src.jobs.{job}', json.dumps(params or {})]
+    if profile:
+        mode, output = profile
+        command[1:2] = ['-m', 'src.main.profiling', mode, str(output)]
+
+    if log_path:
+        Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'wb') as log:
+            try:
+                completed = subprocess.run(
+                    command,
+                    cwd=PROJECT_ROOT,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    env={**os.environ, 'PYTHONUNBUFFERED': '1'},
+                    timeout=timeout
+                )
+            except subprocess.TimeoutExpired:
+                raise JobError(f"Job {job} timed out after {timeout:g}s, see {log_path}")
+        output = '\n'.join(tail_lines(log_path, 50)[0])
+        if completed.returncode != 0:
+            error = parse_result(output) or {}
+            raise JobError(error.get('error')
+                           or f"Job {job} exited with code {completed.returncode}, see {log_path}")
+        return parse_result(output)
+
+    try:
+        completed = subprocess.run(
+            command,
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise JobError(f"Job {job} timed out after {timeout:g}s")
+    if completed.returncode != 0:
+        error = parse_result(completed.stderr) or {}
+        raise JobError(error.get('error') or completed.stderr.strip()
+                       or f"Job {job} exited with code {completed.returncode}")
+    return parse_result(completed.stdout)
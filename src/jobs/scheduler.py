@@ -0,0 +1,86 @@
+# src/jobs/scheduler.py
+import os
+import threading
+from datetime import datetime, timezone
+
+from apscheduler.triggers.cron import CronTrigger
+
+from src.jobs.controller import QueueFullError
+from src.jobs.runner import resolve_job
+
+
+def next_fire_time(schedule, now=None):
+    """Next UTC run time for a crontab expression, formatted like datetime('now')"""
+    now = now or datetime.now(timezone.utc)
+    trigger = CronTrigger.from_crontab(schedule, timezone=timezone.utc)
+    fire_time = trigger.get_next_fire_time(None, now)
+    return fire_time.strftime('%Y-%m-%d %H:%M:%S') if fire_time else None
+
+
+class TaskScheduler:
+    """Submits due scheduled tasks to the ExecutionController.
+
+    Every `interval` seconds it picks up active tasks whose next_run_at has
+    passed, submits them and advances next_run_at to the following cron fire
+    time. Tasks without a next_run_at are only given one, not run, so newly
+    created tasks wait for their first slot. The controller's limits decide
+    when submitted runs actually start.
+
+    With use_queue, runs go to the durable job queue instead, for workers
+    (src/jobs/worker.py) to pick up; the run is queued and next_run_at
+    advanced in one transaction, so a crash cannot lose or repeat a slot.
+    """
+
+    def __init__(self, database, controller, interval=None, batch_size=100, use_queue=None):
+        self.database = database
+        self.controller = controller
+        self.interval = float(interval if interval is not None
+                              else os.getenv('SCHEDULER_INTERVAL', 10))
+        self.use_queue = (use_queue if use_queue is not None
+                          else os.getenv('SCHEDULER_USE_QUEUE') == '1')
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='task-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        """Submit every due task once and return the runs (or queued job ids) created"""
+        runs = []
+        for task in self.database.get_due_tasks(limit=self.batch_size):
+            try:
+                next_run_at = next_fire_time(task['schedule'])
+            except ValueError as error:
+                print(f"Invalid schedule for task {task['id']}: {error}")
+                self.database.set_task_next_run(task['id'], None)
+                continue
+
+            if task['next_run_at'] is not None and self.use_queue:
+                job, params = resolve_job(task)
+                runs.append(self.database.enqueue_due_task(task, job, params, next_run_at))
+                continue
+            if task['next_run_at'] is not None:
+                try:
+                    runs.append(self.controller.submit(task))
+                except QueueFullError as error:
+                    print(f"Skipping run of task {task['id']}: {error}")
+            self.database.set_task_next_run(task['id'], next_run_at)
+        return runs
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as error:
+                print(f"Task scheduler pass failed: {error}")
@@ -1,6 +1,13 @@
 # src/jobs/utils/job_utils.py
 import json
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
 
 def log_progress(percentage: float):
     """Log job progress in a structured format."""
@@ -21,4 +28,152 @@ def format_result(data: dict) -> dict:
         "data": data,
         "timestamp": datetime.now().isoformat(),
         "version": "1.0"
-    }
\ No newline at end of file
+    }
+
+class ProgressTracker:
+    """Calls log_progress as work advances, at most once per `interval` seconds."""
+
+    def __init__(self, total: float, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self._last_logged = 0.0
+
+    def advance(self, amount: float = 1):
+        self.done += amount
+        now = time.monotonic()
+        if self.total and (now - self._last_logged >= self.interval or self.done >= self.total):
+            self._last_logged = now
+            log_progress(min(self.done / self.total * 100, 100))
+
+def track_progress(iterable: Iterable, total: Optional[int] = None, interval: float = 1.0) -> Iterator:
+    """Yield items from iterable, logging progress against total (or len(iterable))."""
+    if total is None and hasattr(iterable, '__len__'):
+        total = len(iterable)
+    tracker = ProgressTracker(total or 0, interval)
+    for item in iterable:
+        yield item
+        tracker.advance()
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to size items, holding only one batch in memory."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def read_chunks(path: str, chunk_size: int = 1024 * 1024, progress: bool = True) -> Iterator[bytes]:
+    """Read a file in fixed-size binary chunks, logging progress by bytes read."""
+    tracker = ProgressTracker(os.path.getsize(path)) if progress else None
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+            if tracker:
+                tracker.advance(len(chunk))
+
+def mmap_lines(path: str, start: int = 0, end: Optional[int] = None,
+               progress: bool = True) -> Iterator[bytes]:
+    """Yield lines (without line endings) from a memory-mapped file.
+
+    The OS pages the file in on demand, so even multi-GB files are scanned
+    without being loaded into memory. start/end restrict reading to a byte
+    range, e.g. one produced by split_file.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        end = len(mapped) if end is None else end
+        tracker = ProgressTracker(end - start) if progress else None
+        position = start
+        while position < end:
+            newline = mapped.find(b'\n', position, end)
+            line_end = end if newline == -1 else newline
+            yield mapped[position:line_end].rstrip(b'\r')
+            if tracker:
+                tracker.advance(line_end + 1 - position)
+            position = line_end + 1
+
+def tail_lines(path: str, count: int = 100, block_size: int = 64 * 1024) -> Tuple[List[str], int]:
+    """Return (last `count` lines, file size) by reading blocks backwards from the end.
+
+    Only the blocks holding those lines are read, however large the file is.
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        # A trailing newline terminates the last line rather than starting a new one
+        if size:
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                end -= 1
+
+        position = end
+        data = b''
+        while position > 0 and data.count(b'\n') < count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+        lines = data.split(b'\n') if end else []
+        if position > 0:
+            lines = lines[1:]  # the first line may be partial
+        return [line.decode('utf-8', 'replace') for line in lines[-count:]] if count else [], size
+
+def split_file(path: str, parts: Optional[int] = None) -> List[Tuple[str, int, int]]:
+    """Split a file into (path, start, end) byte ranges that end on line boundaries.
+
+    Pair with parallel_map and mmap_lines to process one large file on every core.
+    """
+    size = os.path.getsize(path)
+    parts = max(1, min(parts or os.cpu_count() or 1, size or 1))
+    ranges = []
+    with open(path, 'rb') as f:
+        start = 0
+        for part in range(1, parts + 1):
+            if start >= size:
+                break
+            end = size
+            if part < parts:
+                f.seek(max(size * part // parts, start))
+                f.readline()
+                end = min(f.tell(), size)
+            if end > start:
+                ranges.append((path, start, end))
+            start = end
+    return ranges
+
+def parallel_map(func: Callable[[Any], Any], iterable: Iterable, workers: Optional[int] = None,
+                 ordered: bool = True, max_pending: Optional[int] = None,
+                 total: Optional[int] = None, progress: bool = True) -> Iterator:
+    """Apply func to every item in a process pool and yield the results.
+
+    At most max_pending items (default: twice the worker count) are in flight,
+    so input is consumed lazily and memory stays bounded. With ordered=False
+    results are yielded as soon as they finish. func must be picklable (a
+    module-level function). Combine with batched to amortise per-item overhead.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    if total is None and hasattr(iterable, '__len__'):
+        total = len(iterable)
+    tracker = ProgressTracker(total) if progress and total else None
+
+    iterator = iter(iterable)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(func, item) for item in islice(iterator, max_pending))
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in finished]
+                for future in done:
+                    pending.remove(future)
+
+            for future in done:
+                result = future.result()
+                for item in islice(iterator, 1):
+                    pending.append(executor.submit(func, item))
+                if tracker:
+                    tracker.advance()
+                yield result
@@ -0,0 +1,194 @@
+# src/jobs/worker.py
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+from src.jobs.runner import run_job
+
+
+class Worker:
+    """Runs jobs from the durable job queue (the job_queue table).
+
+    Any number of workers, usually started with `python -m src.jobs.worker`,
+    can share one database file on the same host. Each claims up
+    to `concurrency` jobs at a time under a lease of `lease_seconds` and
+    renews it from a heartbeat thread while the job runs. If a worker dies,
+    its leases expire and the jobs are claimed again by another worker, so a
+    job runs at least once; results and failures are only recorded while the
+    lease is still held. Failed attempts are retried after an exponential
+    backoff (`retry_backoff` seconds doubling up to `retry_backoff_max`) until
+    the job's max_attempts are used up, after which it is marked dead.
+    """
+
+    def __init__(self, database, concurrency=None, lease_seconds=None, poll_interval=None,
+                 retry_backoff=None, retry_backoff_max=None, execute=None, owner=None,
+                 log_dir=None):
+        self.database = database
+        self.concurrency = int(concurrency or os.getenv('WORKER_CONCURRENCY', os.cpu_count() or 1))
+        self.lease_seconds = float(lease_seconds or os.getenv('JOB_LEASE_SECONDS', 60))
+        self.poll_interval = float(poll_interval or os.getenv('WORKER_POLL_INTERVAL', 1))
+        self.retry_backoff = float(retry_backoff if retry_backoff is not None
+                                   else os.getenv('JOB_RETRY_BACKOFF', 5))
+        self.retry_backoff_max = float(retry_backoff_max or os.getenv('JOB_RETRY_BACKOFF_MAX', 300))
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.log_dir = Path(log_dir or os.getenv('JOB_LOG_DIR') or os.path.join(
+            os.getenv('APP_LOG_DIR', os.path.expanduser('~/ReportManager/logs')), 'jobs'
+        ))
+        self.execute = execute or (lambda job: run_job(
+            job['job'], job['params'], log_path=self.log_dir / f"queue-{job['id']}.log"
+        ))
+
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {'claimed': 0, 'succeeded': 0, 'failed': 0, 'lost': 0}
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='job-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop claiming jobs and wait for the running ones to finish"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for thread in list(self._active.values()):
+            thread.join(timeout)
+
+    def run_once(self):
+        """Claim as many jobs as there are free slots, run them and return them"""
+        threads = [self._start(job) for job in self._claim()]
+        for thread in threads:
+            thread.join()
+        return [thread.job for thread in threads]
+
+    def backoff(self, attempts):
+        return min(self.retry_backoff * 2 ** max(attempts - 1, 0), self.retry_backoff_max)
+
+    def stats(self):
+        with self._lock:
+            active = len(self._active)
+        return {
+            'owner': self.owner,
+            'concurrency': self.concurrency,
+            'active': active,
+            'lease_seconds': self.lease_seconds,
+            **self.counters
+        }
+
+    def _claim(self):
+        with self._lock:
+            free = self.concurrency - len(self._active)
+        if free <= 0:
+            return []
+        jobs = self.database.claim_jobs(self.owner, limit=free, lease_seconds=self.lease_seconds,
+                                        retry_delay=self.retry_backoff,
+                                        retry_delay_max=self.retry_backoff_max)
+        self.counters['claimed'] += len(jobs)
+        return jobs
+
+    def _start(self, job):
+        thread = threading.Thread(target=self._process, args=(job,),
+                                  name=f"queue-job-{job['id']}", daemon=True)
+        thread.job = job
+        with self._lock:
+            self._active[job['id']] = thread
+        thread.start()
+        return thread
+
+    def _process(self, job):
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done),
+                                     name=f"queue-heartbeat-{job['id']}", daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                result = self.execute(job)
+            except Exception as error:
+                done.set()
+                job['error'] = str(error)
+                recorded = self.database.fail_job(job['id'], job['lease_token'], error,
+                                                  retry_delay=self.backoff(job['attempts']))
+                outcome = 'failed'
+            else:
+                done.set()
+                job['result'] = result
+                recorded = self.database.complete_job(job['id'], job['lease_token'], result)
+                outcome = 'succeeded'
+            self.counters[outcome if recorded else 'lost'] += 1
+            if not recorded:
+                print(f"Lease on queued job {job['id']} was lost; its outcome was not recorded")
+        except Exception as error:
+            print(f"Error finishing queued job {job['id']}: {error}")
+        finally:
+            done.set()
+            heartbeat.join()
+            with self._lock:
+                self._active.pop(job['id'], None)
+            self._wake.set()
+
+    def _heartbeat(self, job, done):
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.database.heartbeat_job(job['id'], job['lease_token'], self.lease_seconds):
+                    return
+            except Exception as error:
+                print(f"Heartbeat for queued job {job['id']} failed: {error}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                for job in self._claim():
+                    self._start(job)
+            except Exception as error:
+                print(f"Job worker pass failed: {error}")
+            self._wake.wait(self.poll_interval)
+
+
+def main():
+    """python -m src.jobs.worker
+
+    Runs a standalone worker against the API's database file (TEST_DB_PATH or
+    ./data/database.sqlite) until SIGINT or SIGTERM, then lets the running
+    jobs finish.
+    """
+    from src.database import db
+    from src.database.locking import FileLock
+
+    if os.getenv('DB_IN_MEMORY') == '1':
+        print("Workers need the database file; DB_IN_MEMORY=1 keeps it inside the API process")
+        return 1
+    db_path = db.resolve_path()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    with FileLock(f"{db_path}.init.lock"):
+        db.initialize(primary=False)
+        db.ensure_schema()
+
+    worker = Worker(db)
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    worker.start()
+    print(f"Job worker {worker.owner} running {worker.concurrency} jobs at a time")
+    stopping.wait()
+    print("Stopping job worker; waiting for running jobs")
+    worker.stop()
+    db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# src/main/admission.py
+import asyncio
+import os
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from src.jobs.controller import parse_type_limits
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+
+class RouteGate:
+    """Concurrency limit for one route with a short FIFO queue of waiters."""
+
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.latencies = deque(maxlen=1000)
+
+    async def acquire(self, timeout):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+        elif len(self.waiters) >= self.max_queue:
+            raise Overloaded(f"queue full ({self.max_queue} waiting)")
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                # release() hands its slot straight to the waiter, so active is already counted
+                await asyncio.wait_for(waiter, timeout)
+            except BaseException as error:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as this request gave up; pass it on
+                    self.release()
+                if isinstance(error, asyncio.TimeoutError):
+                    raise Overloaded(f"no slot within {timeout:g}s")
+                raise
+        self.admitted += 1
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        percentile = lambda p: round(latencies[int(len(latencies) * p)], 4) if latencies else 0
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'queued': len(self.waiters),
+            'admitted': self.admitted,
+            'shed': self.shed,
+            'latency': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)}
+        }
+
+
+class AdmissionController:
+    """Admission control for API requests.
+
+    Each route (method plus path template) may run at most `route_limit`
+    requests at once, or the limit configured for it in `route_limits`
+    ("POST /api/import=1,/api/export=2"). Up to `max_queue` more wait in line
+    for at most `queue_timeout` seconds. Requests beyond that, requests over
+    the overall `max_in_flight`, and writes while more than `max_db_queue`
+    operations wait on the database (in the write queue or for the
+    connection lock) are rejected straight away with 503 and Retry-After, so
+    latency stays bounded instead of requests piling up behind the database
+    lock. Exempt paths (health and metrics) are never
+    limited.
+    """
+
+    def __init__(self, database=None, route_limit=None, route_limits=None, max_queue=None,
+                 queue_timeout=None, max_in_flight=None, max_db_queue=None,
+                 retry_after=None, exempt=None):
+        self.database = database
+        self.route_limit = int(route_limit or os.getenv('ADMISSION_ROUTE_LIMIT', 8))
+        self.route_limits = (route_limits if route_limits is not None
+                             else parse_type_limits(os.getenv('ADMISSION_ROUTE_LIMITS')))
+        self.max_queue = int(max_queue if max_queue is not None
+                             else os.getenv('ADMISSION_MAX_QUEUE', 16))
+        self.queue_timeout = float(queue_timeout or os.getenv('ADMISSION_QUEUE_TIMEOUT', 2))
+        self.max_in_flight = int(max_in_flight or os.getenv('ADMISSION_MAX_IN_FLIGHT', 64))
+        self.max_db_queue = int(max_db_queue or os.getenv('ADMISSION_MAX_DB_QUEUE', 500))
+        self.retry_after = int(retry_after or os.getenv('ADMISSION_RETRY_AFTER', 1))
+        self.exempt = set(exempt if exempt is not None
+                          else os.getenv('ADMISSION_EXEMPT', '/api/health,/api/metrics').split(','))
+        self.enabled = os.getenv('ADMISSION_CONTROL', '1') == '1'
+
+        self.in_flight = 0
+        self.gates = {}
+        self.counters = {'admitted': 0, 'shed': 0, 'shed_db_queue': 0, 'shed_in_flight': 0}
+
+    def route_key(self, scope):
+        """"METHOD /path/{template}" of the route serving this request"""
+        for route in scope['app'].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return f"{scope['method']} {route.path}"
+        return f"{scope['method']} (unmatched)"
+
+    def gate(self, key):
+        if key not in self.gates:
+            path = key.split(' ', 1)[1]
+            limit = self.route_limits.get(key, self.route_limits.get(path, self.route_limit))
+            self.gates[key] = RouteGate(limit, self.max_queue)
+        return self.gates[key]
+
+    def db_queue_depth(self):
+        """Writes waiting on the database: queued for the writer thread or blocked on its lock"""
+        if not self.database:
+            return 0
+        write_queue = self.database.write_queue
+        return (write_queue.pending() if write_queue else 0) + self.database.lock_waiters()
+
+    async def admit(self, scope):
+        """Wait for a slot and return the route's gate, or raise Overloaded"""
+        if self.in_flight >= self.max_in_flight:
+            self.counters['shed_in_flight'] += 1
+            raise Overloaded(f"{self.in_flight} requests in flight")
+        if scope['method'] not in READ_METHODS and self.db_queue_depth() > self.max_db_queue:
+            self.counters['shed_db_queue'] += 1
+            raise Overloaded("database write queue is full")
+
+        gate = self.gate(self.route_key(scope))
+        try:
+            await gate.acquire(self.queue_timeout)
+        except Overloaded:
+            gate.shed += 1
+            raise
+        return gate
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'db_queue_depth': self.db_queue_depth(),
+            'max_db_queue': self.max_db_queue,
+            'routes': {key: gate.stats() for key, gate in self.gates.items()},
+            **self.counters
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to HTTP requests.
+
+    The route slot is held until the response body has been sent, so
+    streaming responses count against their route for their whole duration.
+    """
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if (scope['type'] != 'http' or not controller.enabled
+                or scope['path'] in controller.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            gate = await controller.admit(scope)
+        except Overloaded as e:
+            controller.counters['shed'] += 1
+            response = JSONResponse(
+                {"detail": f"Server busy: {e}"},
+                status_code=503,
+                headers={"Retry-After": str(controller.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        controller.counters['admitted'] += 1
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
+            gate.release()
+            gate.latencies.append(time.monotonic() - started)
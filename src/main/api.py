@@ -1,11 +1,33 @@
-from fastapi import FastAPI, WebSocket, Request, HTTPException
+from fastapi import Depends, FastAPI, Query, WebSocket, WebSocketDisconnect, Request, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import logging
 import os
-from datetime import datetime
+import re
+import numpy as np
+from datetime import datetime, timezone
 from src.database import db
-from pydantic import BaseModel
+from src.database.archiver import Archiver
+from src.database.backup import BackupManager, SnapshotScheduler
+from src.database.locking import FileLock, LeaderElection
+from src.database.maintenance import MaintenanceScheduler
+from src.jobs.cache import ResultCache
+from src.jobs.controller import ExecutionController, QueueFullError
+from src.jobs.pipeline import PipelineExecutor
+from src.jobs.runner import JobError, get_job_path, resolve_job
+from src.jobs.scheduler import TaskScheduler
+from src.jobs.utils.job_utils import tail_lines
+from src.main.admission import AdmissionController, AdmissionMiddleware
+from src.main.calculator import Calculator
+from src.main.logs import LogFiles, follow, grep as grep_file
+from src.main.negotiation import NotAcceptable, rows_response, select_fields
+from src.main.profiling import Profiler
+from src.main.transfer import (
+    Importer, export_csv, export_ndjson, iter_lines, iterate_async, read_csv, read_ndjson
+)
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List, Dict, Any
 
 def setup_logging(log_dir):
@@ -31,6 +53,19 @@ log_dir = os.getenv('APP_LOG_DIR', os.path.expanduser('~/ReportManager/logs'))
 logger = setup_logging(log_dir)
 
 app = FastAPI()
+archiver = Archiver(db)
+maintenance = MaintenanceScheduler(db)
+backups = BackupManager(db)
+snapshots = SnapshotScheduler(db)
+result_cache = ResultCache()
+profiler = Profiler()
+controller = ExecutionController(cache=result_cache, profiler=profiler)
+scheduler = TaskScheduler(db, controller)
+pipelines = PipelineExecutor(controller)
+calculator = Calculator()
+log_files = LogFiles(log_dir, controller.log_dir)
+admission = AdmissionController(db)
+election = None
 
 # CORS configuration
 origins = [
@@ -43,6 +78,9 @@ origins = [
     "*"  # Warning: In production, you'd want to be more specific
 ]
 
+# Admission control sits inside CORS so that 503 responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -67,6 +105,14 @@ class ReportUpdate(BaseModel):
     template: Optional[str] = None
     recipients: Optional[List[str]] = None
 
+class ReportDuplicate(BaseModel):
+    report_ids: List[int]
+    include_tasks: Optional[bool] = False
+    copies: Optional[int] = Field(default=1, ge=1, le=1000)
+
+class BackupCreate(BaseModel):
+    compress: Optional[bool] = None
+
 class TaskCreate(BaseModel):
     name: str
     type: str
@@ -82,6 +128,44 @@ class TaskUpdate(BaseModel):
     is_active: Optional[int] = None
     meta: Optional[Dict[str, Any]] = None
 
+class ProfileCreate(BaseModel):
+    mode: Optional[str] = "sampling"
+    route: Optional[str] = None
+    method: Optional[str] = None
+    task_id: Optional[int] = None
+    count: Optional[int] = Field(default=1, ge=1, le=100)
+    interval_ms: Optional[float] = Field(default=5, gt=0)
+
+class Calculation(BaseModel):
+    operation: str
+    a: Any
+    b: Optional[Any] = None
+    percentiles: Optional[List[float]] = None
+    axis: Optional[int] = None
+
+def to_epoch_ms(value):
+    """Epoch milliseconds from an integer string or ISO 8601 timestamp (UTC unless it has an offset)"""
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return round(parsed.timestamp() * 1000)
+
+def time_filters(created_after: Optional[str] = None, created_before: Optional[str] = None,
+                 updated_after: Optional[str] = None, updated_before: Optional[str] = None):
+    """Time range query parameters for list endpoints, as epoch milliseconds"""
+    filters = {
+        'created_after': created_after,
+        'created_before': created_before,
+        'updated_after': updated_after,
+        'updated_before': updated_before
+    }
+    try:
+        return {name: to_epoch_ms(value) for name, value in filters.items() if value is not None}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {e}")
+
 # Middleware for logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -91,11 +175,245 @@ async def log_requests(request: Request, call_next):
     logger.debug(f"Response status: {response.status_code}")
     return response
 
+# Middleware for on-demand profiling; a single check while nothing is armed
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    claim = profiler.match(request.method, request.url.path)
+    if claim is None:
+        return await call_next(request)
+    with profiler.capture(claim):
+        return await call_next(request)
+
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
 
+# Metrics endpoint; like the health check, never shed by admission control
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "admission": admission.stats(),
+        "write_queue": db.write_queue.stats() if db.write_queue else None,
+        "jobs": controller.stats(),
+        "job_queue": await asyncio.to_thread(db.get_job_queue_stats) if db.db else None
+    }
+
+# Database endpoints
+@app.get("/api/database/info")
+async def get_database_info():
+    try:
+        return await asyncio.to_thread(db.get_database_info)
+    except Exception as e:
+        logger.error(f"Error getting database info: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/database/vacuum")
+async def vacuum_database():
+    try:
+        return await asyncio.to_thread(db.vacuum)
+    except Exception as e:
+        logger.error(f"Error vacuuming database: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/database/maintenance")
+async def run_database_maintenance():
+    try:
+        return await asyncio.to_thread(maintenance.run_once, force=True)
+    except Exception as e:
+        logger.error(f"Error running database maintenance: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/database/snapshot")
+async def take_snapshot():
+    if not db.in_memory:
+        raise HTTPException(status_code=400, detail="The database is not in memory")
+    try:
+        return await asyncio.to_thread(snapshots.run_once, True)
+    except Exception as e:
+        logger.error(f"Error taking snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Backup endpoints
+@app.post("/api/backup")
+async def create_backup(request: Optional[BackupCreate] = None):
+    try:
+        compress = request.compress if request else None
+        # Copying (and compressing) a large database takes a while; keep it off the event loop
+        return await asyncio.to_thread(backups.backup, compress)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating backup: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/backups")
+async def list_backups():
+    try:
+        return await asyncio.to_thread(backups.list_backups)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/backups/{name}/restore")
+async def restore_backup(name: str):
+    try:
+        backup = await asyncio.to_thread(backups.schedule_restore, name)
+        return {**backup, "restore": "scheduled for next startup"}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scheduling restore: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Export / import endpoints
+@app.get("/api/export")
+async def export_data(format: str = "ndjson", entity: str = "all", batch_size: int = 1000):
+    tables = ["reports", "tasks"] if entity == "all" else [entity]
+    if any(table not in ("reports", "tasks") for table in tables):
+        raise HTTPException(status_code=400, detail=f"Unknown entity: {entity}")
+
+    if format == "ndjson":
+        content = export_ndjson(db, tables, batch_size=batch_size)
+        media_type = "application/x-ndjson"
+    elif format == "csv":
+        if len(tables) != 1:
+            raise HTTPException(status_code=400, detail="CSV export needs entity=reports or entity=tasks")
+        content = export_csv(db, tables[0], batch_size=batch_size)
+        media_type = "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    filename = f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/import")
+async def import_data(request: Request, format: str = "ndjson", entity: Optional[str] = None,
+                      chunk_size: int = 1000, import_id: Optional[str] = None):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if format == "csv" and entity not in ("reports", "tasks"):
+        raise HTTPException(status_code=400, detail="CSV import needs entity=reports or entity=tasks")
+
+    importer = Importer(db, chunk_size=chunk_size, import_id=import_id)
+
+    # Parsing and inserts run in a worker thread that pulls the upload one
+    # chunk at a time, so memory stays flat regardless of the upload size
+    lines = iter_lines(iterate_async(request.stream(), asyncio.get_running_loop()))
+    if format == "csv":
+        records = read_csv(lines, entity, await asyncio.to_thread(db.get_table_columns, entity))
+    else:
+        records = read_ndjson(lines)
+
+    try:
+        return await asyncio.to_thread(importer.run, records)
+    except Exception as e:
+        logger.error(f"Error importing data: {e}")
+        raise HTTPException(status_code=400, detail=f"Import {importer.id} failed: {e}")
+
+@app.get("/api/import/{import_id}")
+async def get_import_progress(import_id: str):
+    progress = await asyncio.to_thread(db.get_import_progress, import_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
+# Profiling endpoints
+@app.post("/api/debug/profile")
+async def start_profiling(request: ProfileCreate):
+    try:
+        session = profiler.arm(
+            mode=request.mode,
+            route=request.route,
+            method=request.method,
+            task_id=request.task_id,
+            count=request.count,
+            interval=request.interval_ms / 1000
+        )
+        return session.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/debug/profile")
+async def get_profiling():
+    return {"sessions": profiler.sessions(), "captures": await asyncio.to_thread(profiler.list_captures)}
+
+@app.delete("/api/debug/profile/{session_id}")
+async def cancel_profiling(session_id: str):
+    if not profiler.cancel(session_id):
+        raise HTTPException(status_code=404, detail="Profile session not found")
+    return {"success": True}
+
+@app.get("/api/debug/profiles/{name}")
+async def download_profile(name: str):
+    try:
+        path = await asyncio.to_thread(profiler.get_capture_path, name)
+        return FileResponse(path, filename=name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# Calculation endpoint
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+@app.post("/api/calculate")
+async def calculate(request: Request, operation: Optional[str] = None, b: Optional[float] = None,
+                    percentiles: Optional[str] = None, axis: Optional[int] = None):
+    """Evaluate a batch operation or reduction over whole arrays.
+
+    JSON bodies follow the Calculation model, e.g. {"operation": "add",
+    "a": [[1, 2], [3, 4]], "b": [10, 20]}. For large inputs, send `a` as raw
+    little-endian float64 with Content-Type application/octet-stream and pass
+    the other fields as query parameters (percentiles comma-separated). With
+    Accept: application/octet-stream, array results come back in the same raw
+    format with their shape in the X-Shape header.
+    """
+    if request.headers.get("content-type", "").startswith(BINARY_MEDIA_TYPE):
+        if not operation:
+            raise HTTPException(status_code=400, detail="operation query parameter is required")
+        body = await request.body()
+        if len(body) % 8:
+            raise HTTPException(status_code=400, detail="Binary body must be a float64 array")
+        calculation = Calculation(
+            operation=operation,
+            a=calculator.to_array(body, dtype=np.dtype("<f8")),
+            b=b,
+            percentiles=[float(q) for q in percentiles.split(",")] if percentiles else None,
+            axis=axis
+        )
+    else:
+        try:
+            calculation = Calculation.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    try:
+        # Converting and reducing large arrays takes a while, so keep it off the event loop
+        result = await asyncio.to_thread(
+            calculator.evaluate,
+            calculation.operation,
+            calculation.a,
+            b=calculation.b,
+            percentiles=calculation.percentiles,
+            axis=calculation.axis
+        )
+        if isinstance(result, np.ndarray) and BINARY_MEDIA_TYPE in request.headers.get("accept", ""):
+            return Response(
+                content=np.ascontiguousarray(result, dtype="<f8").tobytes(),
+                media_type=BINARY_MEDIA_TYPE,
+                headers={"X-Shape": ",".join(str(size) for size in result.shape)}
+            )
+        result = await asyncio.to_thread(calculator.to_json, result)
+        # A JSONResponse skips FastAPI's per-item encoding of large result lists
+        return JSONResponse({"operation": calculation.operation, "result": result})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error calculating {calculation.operation}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Example task endpoints (from your original code)
 @app.get("/api/quick-task")
 async def quick_task(request: Request):
@@ -131,24 +449,99 @@ async def websocket_endpoint(websocket: WebSocket):
             except Exception as e:
                 logger.debug(f"Error while closing WebSocket: {e}")
 
+# Log endpoints
+@app.get("/api/logs/{source}")
+async def read_log(source: str, lines: int = Query(100, ge=0, le=10000), grep: Optional[str] = None,
+                   regex: bool = False, ignore_case: bool = False, start: int = Query(0, ge=0),
+                   limit: int = Query(1000, ge=1, le=10000), date: Optional[str] = None):
+    """Tail a log, or with grep= search it.
+
+    source is "api", "app" or a job run id. Searches return at most `limit`
+    matching lines; pass the returned next_offset as `start` to continue.
+    """
+    try:
+        path = log_files.resolve(source, date)
+        if grep is None:
+            tail, size = await asyncio.to_thread(tail_lines, path, lines)
+            return {"source": source, "size": size, "lines": tail}
+        result = await asyncio.to_thread(grep_file, path, grep, regex=regex,
+                                         ignore_case=ignore_case, start=start, limit=limit)
+        return {"source": source, **result}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, re.error) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.websocket("/ws/logs/{source}")
+async def follow_log(websocket: WebSocket, source: str, lines: int = 0,
+                     grep: Optional[str] = None, date: Optional[str] = None):
+    """Send the last `lines` lines of a log, then every line appended to it"""
+    await websocket.accept()
+    try:
+        path = log_files.resolve(source, date)
+    except (FileNotFoundError, ValueError) as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    async def send_lines():
+        tail, offset = await asyncio.to_thread(tail_lines, path, max(0, min(lines, 10000)))
+        for line in tail:
+            if grep is None or grep in line:
+                await websocket.send_text(line)
+        async for line in follow(path, offset):
+            if grep is None or grep in line:
+                await websocket.send_text(line)
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # Following never ends by itself, so stop it as soon as the client goes away
+    tasks = [asyncio.create_task(send_lines()), asyncio.create_task(wait_for_disconnect())]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    for task in done:
+        if task.exception() and not isinstance(task.exception(), (WebSocketDisconnect, RuntimeError)):
+            logger.error(f"Error following log {source}: {task.exception()}")
+
 async def long_running_task(task_id: str):
     for i in range(5):
         await asyncio.sleep(1)
         yield {"task_id": task_id, "progress": (i + 1) * 20}
 
 # Report endpoints
+def list_response(request, table, fields, list_rows):
+    """Rows from list_rows(columns) in the representation the client asked for.
+
+    See src/main/negotiation.py for the supported formats and compression.
+    """
+    try:
+        columns = select_fields(fields, db.get_table_columns(table, include_generated=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return rows_response(request, list_rows(columns), columns)
+    except NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
 @app.get("/api/reports")
-async def list_reports():
+async def list_reports(request: Request, fields: Optional[str] = None,
+                       filters: dict = Depends(time_filters)):
     try:
-        reports = db.list_reports()
-        return reports
+        return await asyncio.to_thread(list_response, request, "reports", fields,
+                                       lambda columns: db.list_reports(columns=columns, **filters))
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
 
+# Writes run in the threadpool so that, with the write queue enabled,
+# concurrent requests are committed together instead of one at a time
 @app.post("/api/reports")
 async def create_report(report: ReportCreate):
     try:
-        report_id = db.create_report(**report.model_dump())
+        report_id = await asyncio.to_thread(db.create_report, **report.model_dump())
         return {"id": report_id}
     except Exception as e:
         logger.error(f"Error creating report: {e}")
@@ -157,7 +550,7 @@ async def create_report(report: ReportCreate):
 @app.get("/api/reports/{report_id}")
 async def get_report(report_id: int):
     try:
-        report = db.get_report(report_id)
+        report = await asyncio.to_thread(db.get_report, report_id)
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         return report
@@ -171,7 +564,7 @@ async def get_report(report_id: int):
 async def update_report(report_id: int, report: ReportUpdate):
     try:
         updates = report.model_dump(exclude_unset=True)
-        success = db.update_report(report_id, updates)
+        success = await asyncio.to_thread(db.update_report, report_id, updates)
         if not success:
             raise HTTPException(status_code=404, detail="Report not found")
         return {"success": True}
@@ -182,7 +575,7 @@ async def update_report(report_id: int, report: ReportUpdate):
 @app.delete("/api/reports/{report_id}")
 async def delete_report(report_id: int):
     try:
-        success = db.delete_report(report_id)
+        success = await asyncio.to_thread(db.delete_report, report_id)
         if not success:
             raise HTTPException(status_code=404, detail="Report not found")
         return {"success": True}
@@ -191,27 +584,39 @@ async def delete_report(report_id: int):
 
 # Task endpoints
 @app.get("/api/tasks")
-async def list_tasks():
+async def list_tasks(request: Request, fields: Optional[str] = None,
+                     filters: dict = Depends(time_filters)):
     try:
-        tasks = db.get_tasks_for_scheduling()
-        return tasks
+        return await asyncio.to_thread(list_response, request, "tasks", fields,
+                                       lambda columns: db.list_tasks(columns=columns, **filters))
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/tasks")
 async def create_task(task: TaskCreate):
     try:
         task_data = task.model_dump()
-        task_id = db.create_task(**task_data)
+        task_id = await asyncio.to_thread(db.create_task, **task_data)
         return {"id": task_id}
     except Exception as e:
         logger.error(f"Error creating task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/tasks/archive")
+async def archive_tasks():
+    try:
+        # Batches sleep between transactions, so keep the pass off the event loop
+        return await asyncio.to_thread(archiver.run_once)
+    except Exception as e:
+        logger.error(f"Error archiving tasks: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/tasks/{task_id}")
-async def get_task(task_id: int):
+async def get_task(task_id: int, include_archived: bool = False):
     try:
-        task = db.get_task(task_id)
+        task = await asyncio.to_thread(db.get_task, task_id, include_archived=include_archived)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         return task
@@ -225,7 +630,7 @@ async def get_task(task_id: int):
 async def update_task(task_id: int, task: TaskUpdate):
     try:
         updates = task.model_dump(exclude_unset=True)
-        success = db.update_task(task_id, updates)
+        success = await asyncio.to_thread(db.update_task, task_id, updates)
         if not success:
             raise HTTPException(status_code=404, detail="Task not found")
         return {"success": True}
@@ -236,18 +641,177 @@ async def update_task(task_id: int, task: TaskUpdate):
 @app.delete("/api/tasks/{task_id}")
 async def delete_task(task_id: int):
     try:
-        success = db.deactivate_task(task_id)
+        success = await asyncio.to_thread(db.deactivate_task, task_id)
         if not success:
             raise HTTPException(status_code=404, detail="Task not found")
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Job execution endpoints
+@app.post("/api/tasks/{task_id}/run")
+async def run_task(task_id: int, priority: int = 0):
+    try:
+        task = await asyncio.to_thread(db.get_task, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        # A cache hit reads the result from disk; keep it off the event loop
+        run = await asyncio.to_thread(controller.submit, task, priority=priority)
+        return run.to_dict()
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error running task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class TaskDependencies(BaseModel):
+    depends_on: List[int]
+
+class PipelineCreate(BaseModel):
+    task_ids: List[int] = Field(min_length=1)
+    max_parallel: Optional[int] = Field(default=None, ge=1)
+    priority: int = 0
+
+@app.get("/api/tasks/{task_id}/dependencies")
+async def get_task_dependencies(task_id: int):
+    if not await asyncio.to_thread(db.get_task, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return await asyncio.to_thread(db.get_task_dependencies, task_id)
+
+@app.put("/api/tasks/{task_id}/dependencies")
+async def set_task_dependencies(task_id: int, request: TaskDependencies):
+    try:
+        if not await asyncio.to_thread(db.get_task, task_id):
+            raise HTTPException(status_code=404, detail="Task not found")
+        await asyncio.to_thread(db.set_task_dependencies, task_id, request.depends_on)
+        return await asyncio.to_thread(db.get_task_dependencies, task_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error setting task dependencies: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/pipelines")
+async def run_pipeline(request: PipelineCreate):
+    """Run the given tasks together with every task they depend on"""
+    try:
+        tasks, edges = await asyncio.to_thread(db.get_task_graph, request.task_ids)
+        missing = [id for id in request.task_ids if id not in tasks]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Tasks not found: {missing}")
+        pipeline = await asyncio.to_thread(pipelines.start, tasks, edges,
+                                           max_parallel=request.max_parallel,
+                                           priority=request.priority)
+        return pipeline.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error running pipeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/pipelines/{pipeline_id}")
+async def get_pipeline(pipeline_id: str):
+    pipeline = pipelines.get(pipeline_id)
+    if not pipeline:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    return pipeline
+
+class QueuedJobCreate(BaseModel):
+    job: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = 0
+    max_attempts: int = Field(default=3, ge=1)
+    delay: float = Field(default=0, ge=0)
+
+@app.post("/api/queue")
+async def enqueue_job(request: QueuedJobCreate):
+    try:
+        get_job_path(request.job)
+        job_id = await asyncio.to_thread(db.enqueue_job, request.job, request.params,
+                                         priority=request.priority,
+                                         max_attempts=request.max_attempts, delay=request.delay)
+        return await asyncio.to_thread(db.get_queued_job, job_id)
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error enqueueing job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/tasks/{task_id}/enqueue")
+async def enqueue_task(task_id: int, priority: int = 0, max_attempts: int = Query(3, ge=1)):
+    try:
+        task = await asyncio.to_thread(db.get_task, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        job, params = resolve_job(task)
+        get_job_path(job)
+        job_id = await asyncio.to_thread(db.enqueue_job, job, params, task_id=task_id,
+                                         priority=priority, max_attempts=max_attempts)
+        return await asyncio.to_thread(db.get_queued_job, job_id)
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error enqueueing task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/queue")
+async def list_queued_jobs(status: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    try:
+        return {"stats": await asyncio.to_thread(db.get_job_queue_stats),
+                "jobs": await asyncio.to_thread(db.list_queued_jobs, status, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing queued jobs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/queue/{job_id}")
+async def get_queued_job(job_id: int):
+    job = await asyncio.to_thread(db.get_queued_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Queued job not found")
+    return job
+
+@app.post("/api/queue/{job_id}/retry")
+async def retry_queued_job(job_id: int):
+    if not await asyncio.to_thread(db.retry_dead_job, job_id):
+        raise HTTPException(status_code=404, detail="No dead job with that id")
+    return await asyncio.to_thread(db.get_queued_job, job_id)
+
+@app.get("/api/jobs/stats")
+async def get_job_stats():
+    return controller.stats()
+
+@app.get("/api/jobs/cache")
+async def get_result_cache_stats():
+    return await asyncio.to_thread(result_cache.stats)
+
+@app.delete("/api/jobs/cache")
+async def clear_result_cache():
+    await asyncio.to_thread(result_cache.clear)
+    return {"success": True}
+
+@app.get("/api/jobs/runs/{run_id}")
+async def get_job_run(run_id: str):
+    run = controller.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
 # Additional endpoints
 @app.get("/api/reports/{report_id}/tasks")
-async def get_report_tasks(report_id: int):
+async def get_report_tasks(report_id: int, include_archived: bool = False):
     try:
-        tasks = db.get_tasks_by_report_id(report_id)
+        tasks = await asyncio.to_thread(db.get_tasks_by_report_id, report_id,
+                                        include_archived=include_archived)
         if not tasks:
             return []  # Return empty list if no tasks found
         return tasks
@@ -255,31 +819,77 @@ async def get_report_tasks(report_id: int):
         logger.error(f"Error getting report tasks: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/reports/duplicate")
+async def duplicate_reports(request: ReportDuplicate):
+    try:
+        new_ids = await asyncio.to_thread(
+            db.duplicate_reports,
+            request.report_ids,
+            include_tasks=request.include_tasks,
+            copies=request.copies
+        )
+        if request.report_ids and not new_ids:
+            raise HTTPException(status_code=404, detail="Reports not found")
+        return {"ids": new_ids}
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error duplicating reports: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/reports/{report_id}/duplicate")
-async def duplicate_report(report_id: int):
+async def duplicate_report(report_id: int, include_tasks: bool = False):
     try:
-        new_id = db.duplicate_report(report_id)
+        new_id = await asyncio.to_thread(db.duplicate_report, report_id, include_tasks=include_tasks)
         if not new_id:
             raise HTTPException(status_code=404, detail="Report not found")
         return {"id": new_id}
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/tasks/scheduled")
 async def get_scheduled_tasks():
     try:
-        tasks = db.get_tasks_for_scheduling()
+        tasks = await asyncio.to_thread(db.get_tasks_for_scheduling)
         return tasks
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def start_background_jobs():
+    """Start the schedulers that must only run in one process"""
+    logger.info(f"Process {os.getpid()} is the leader; starting background jobs")
+    archiver.start()
+    controller.prune_logs()
+    maintenance.start()
+    backups.start()
+    snapshots.start()
+    scheduler.start()
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection on startup"""
+    global election
     try:
         logger.info("Initializing database connection...")
-        db.initialize()
+        db_path = db.resolve_path()
+        election = LeaderElection(f"{db_path}.leader.lock", start_background_jobs)
+
+        # Workers start one at a time; the first becomes leader and prepares
+        # the schema before the others connect
+        with FileLock(f"{db_path}.init.lock"):
+            is_leader = election.try_acquire()
+            if os.getenv('DB_IN_MEMORY') == '1' and not is_leader:
+                raise RuntimeError("DB_IN_MEMORY=1 keeps the database inside one process; "
+                                   "run a single API worker")
+            db.initialize(primary=is_leader)
         logger.info(f"Database initialized at: {db.db_path}")
+
+        if is_leader:
+            start_background_jobs()
+        else:
+            election.start()
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
@@ -288,12 +898,30 @@ async def startup_event():
 async def shutdown_event():
     """Close database connection on shutdown"""
     try:
+        scheduler.stop()
+        archiver.stop()
+        maintenance.stop()
+        backups.stop()
+        snapshots.stop()
+        if election:
+            election.stop()
         if db.db:
             logger.info("Closing database connection...")
-            db.db.close()
+            db.close()
     except Exception as e:
         logger.error(f"Error closing database connection: {e}")
 
 if __name__ == "__main__":
+    import multiprocessing
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="debug")
\ No newline at end of file
+    multiprocessing.freeze_support()
+
+    workers = int(os.getenv('API_WORKERS', 1))
+    if workers > 1 and os.getenv('DB_IN_MEMORY') == '1':
+        raise SystemExit("DB_IN_MEMORY=1 cannot be combined with API_WORKERS > 1")
+    if workers > 1:
+        # Each worker is a separate process that imports the app on its own
+        uvicorn.run("src.main.api:app", host="127.0.0.1", port=8000,
+                    workers=workers, log_level="debug")
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=8000, log_level="debug")
@@ -1,6 +1,104 @@
+import numpy as np
+
+
 class Calculator:
+    OPERATIONS = ('add', 'multiply')
+    REDUCTIONS = ('sum', 'mean', 'min', 'max', 'std', 'percentile', 'summary')
+
     def add(self, a, b):
         return a + b
         
     def multiply(self, a, b):
         return a * b
+
+    @staticmethod
+    def to_array(values, dtype=np.float64):
+        """Convert a scalar, (nested) sequence, array or raw buffer to an ndarray.
+
+        Buffers (bytes, memoryview, ...) are wrapped without copying and read
+        as native-endian values of `dtype`.
+        """
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            return np.frombuffer(values, dtype=dtype)
+        return np.asarray(values, dtype=dtype)
+
+    @staticmethod
+    def to_json(result):
+        """Convert a result to JSON-ready values, with NaN and +/-inf as None.
+
+        JSON has no encoding for non-finite floats, so an overflow or 0/0 in
+        one element would otherwise make the whole response fail.
+        """
+        if isinstance(result, dict):
+            return {key: Calculator.to_json(value) for key, value in result.items()}
+        if isinstance(result, (np.ndarray, np.generic)):
+            array = np.asarray(result)
+            if array.dtype.kind == 'f' and not np.isfinite(array).all():
+                array = np.where(np.isfinite(array), array, None)
+            return array.tolist()
+        if isinstance(result, float) and not np.isfinite(result):
+            return None
+        return result
+
+    def evaluate(self, operation, a, b=None, percentiles=None, axis=None):
+        """Run one of OPERATIONS (on a and b) or REDUCTIONS (on a) by name"""
+        if operation in self.OPERATIONS:
+            if b is None:
+                raise ValueError(f"Operation {operation} needs a second operand")
+            return getattr(self, f'{operation}_batch')(a, b)
+        if operation == 'percentile':
+            return self.percentile(a, percentiles if percentiles is not None else 50, axis=axis)
+        if operation == 'summary':
+            return self.summary(a, percentiles if percentiles is not None else (50, 90, 99))
+        if operation in self.REDUCTIONS:
+            return getattr(self, operation)(a, axis=axis)
+        raise ValueError(f"Unknown operation: {operation}")
+
+    def add_batch(self, a, b):
+        """Element-wise a + b with NumPy broadcasting"""
+        return np.add(self.to_array(a), self.to_array(b))
+
+    def multiply_batch(self, a, b):
+        """Element-wise a * b with NumPy broadcasting"""
+        return np.multiply(self.to_array(a), self.to_array(b))
+
+    def sum(self, values, axis=None):
+        return np.sum(self.to_array(values), axis=axis)
+
+    def mean(self, values, axis=None):
+        return np.mean(self._non_empty(values), axis=axis)
+
+    def min(self, values, axis=None):
+        return np.min(self._non_empty(values), axis=axis)
+
+    def max(self, values, axis=None):
+        return np.max(self._non_empty(values), axis=axis)
+
+    def std(self, values, axis=None):
+        return np.std(self._non_empty(values), axis=axis)
+
+    def percentile(self, values, q, axis=None):
+        """Percentile(s) q (0-100) of the values, linearly interpolated"""
+        return np.percentile(self._non_empty(values), q, axis=axis)
+
+    def summary(self, values, percentiles=(50, 90, 99)):
+        """count, sum, mean, min, max, std and the given percentiles of all values"""
+        array = self._non_empty(values)
+        result = {
+            'count': int(array.size),
+            'sum': float(array.sum()),
+            'mean': float(array.mean()),
+            'min': float(array.min()),
+            'max': float(array.max()),
+            'std': float(array.std())
+        }
+        if percentiles:
+            points = np.percentile(array, percentiles)
+            result['percentiles'] = {f'{q:g}': float(v) for q, v in zip(percentiles, points)}
+        return result
+
+    def _non_empty(self, values):
+        array = self.to_array(values)
+        if array.size == 0:
+            raise ValueError("No values to reduce")
+        return array
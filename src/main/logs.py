@@ -0,0 +1,100 @@
+# src/main/logs.py
+import asyncio
+import mmap
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from src.jobs.controller import QUEUE_LOG_PATTERN, RUN_ID_PATTERN
+
+
+def grep(path, pattern, regex=False, ignore_case=False, start=0, limit=1000):
+    """Find lines matching pattern in a memory-mapped file.
+
+    The search runs over the mapping, so the OS pages the file in as needed
+    and nothing close to the file size is held in memory. Returns
+    {"matches": [{"offset", "line"}], "next_offset"}; next_offset is set when
+    `limit` was reached and the search can resume from there.
+    """
+    needle = pattern.encode('utf-8')
+    if regex or ignore_case:
+        # MULTILINE so ^ and $ anchor to lines, as in grep
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        expression = re.compile(needle if regex else re.escape(needle), flags)
+    matches = []
+    if os.path.getsize(path) == 0:
+        return {'matches': matches, 'next_offset': None}
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = start
+        while position < len(mapped):
+            if regex or ignore_case:
+                found = expression.search(mapped, position)
+                index = found.start() if found else -1
+            else:
+                index = mapped.find(needle, position)
+            if index < 0:
+                break
+
+            line_start = mapped.rfind(b'\n', 0, index) + 1
+            line_end = mapped.find(b'\n', index)
+            line_end = len(mapped) if line_end < 0 else line_end
+            if len(matches) >= limit:
+                return {'matches': matches, 'next_offset': line_start}
+            matches.append({
+                'offset': line_start,
+                'line': mapped[line_start:line_end].rstrip(b'\r').decode('utf-8', 'replace')
+            })
+            position = line_end + 1
+    return {'matches': matches, 'next_offset': None}
+
+
+async def follow(path, offset, interval=0.5):
+    """Yield lines appended to path after byte `offset`, polling every `interval` seconds.
+
+    Starts over from the beginning if the file shrinks (truncated or rotated).
+    """
+    partial = b''
+    while True:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < offset:
+            offset, partial = 0, b''
+        if size > offset:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            offset = size
+            *lines, partial = (partial + data).split(b'\n')
+            for line in lines:
+                yield line.rstrip(b'\r').decode('utf-8', 'replace')
+        await asyncio.sleep(interval)
+
+
+class LogFiles:
+    """Resolves log sources to files.
+
+    Sources are "api" (the API log for `date`, today by default), "app" (the
+    Electron main process log), job run ids (per-run job output) and
+    "queue-<job id>" (output of a durable queue job).
+    """
+
+    def __init__(self, log_dir, job_log_dir):
+        self.log_dir = Path(log_dir)
+        self.job_log_dir = Path(job_log_dir)
+
+    def resolve(self, source, date=None):
+        if source == 'api':
+            if date is not None and not re.fullmatch(r'\d{8}', date):
+                raise ValueError("date must be YYYYMMDD")
+            path = self.log_dir / f"api_{date or datetime.now().strftime('%Y%m%d')}.log"
+        elif source == 'app':
+            path = self.log_dir / 'app.log'
+        elif RUN_ID_PATTERN.fullmatch(source) or QUEUE_LOG_PATTERN.fullmatch(source):
+            path = self.job_log_dir / f'{source}.log'
+        else:
+            raise ValueError(f"Unknown log source: {source}")
+
+        if not path.exists():
+            raise FileNotFoundError(f"No log for {source}")
+        return path
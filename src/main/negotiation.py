@@ -0,0 +1,155 @@
+# src/main/negotiation.py
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack responses are offered only when installed
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional: brotli encoding is offered only when installed
+    brotli = None
+
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+MEDIA_TYPE_FORMATS = {
+    JSON_MEDIA_TYPE: 'json',
+    'application/*': 'json',
+    '*/*': 'json',
+    COLUMNAR_MEDIA_TYPE: 'columnar',
+    MSGPACK_MEDIA_TYPE: 'msgpack',
+    'application/x-msgpack': 'msgpack'
+}
+
+COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+
+
+class NotAcceptable(Exception):
+    """Raised when none of the media types a client accepts can be produced."""
+
+
+def parse_accept(header):
+    """Values of an Accept or Accept-Encoding header, most preferred first"""
+    values = []
+    for index, part in enumerate((header or '').split(',')):
+        value, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0
+        if value and quality > 0:
+            values.append((-quality, index, value.lower()))
+    return [value for _, _, value in sorted(values)]
+
+
+def select_fields(fields, available):
+    """Columns for a fields= projection like "id,name" or "-template".
+
+    Names prefixed with '-' are excluded; if any name is given without a
+    prefix only the named columns are kept. Columns stay in table order.
+    A projection that leaves no columns is rejected.
+    """
+    if not fields:
+        return list(available)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name.lstrip('-') for name in names if name.lstrip('-') not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    included = {name for name in names if not name.startswith('-')}
+    excluded = {name[1:] for name in names if name.startswith('-')}
+    columns = [column for column in available
+               if (not included or column in included) and column not in excluded]
+    if not columns:
+        raise ValueError(f"No fields left to return for fields={fields}")
+    return columns
+
+
+def choose_format(accept):
+    if not accept:
+        return 'json'
+    for media_type in parse_accept(accept):
+        format = MEDIA_TYPE_FORMATS.get(media_type)
+        if format == 'msgpack' and msgpack is None:
+            continue
+        if format:
+            return format
+    raise NotAcceptable(f"Supported media types: {', '.join(supported_media_types())}")
+
+
+def choose_encoding(accept_encoding):
+    for encoding in parse_accept(accept_encoding):
+        if encoding == 'br' and brotli is not None:
+            return 'br'
+        if encoding in ('gzip', '*'):
+            return 'gzip'
+        if encoding == 'identity':
+            return None
+    return None
+
+
+def supported_media_types():
+    media_types = [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE]
+    if msgpack is not None:
+        media_types.append(MSGPACK_MEDIA_TYPE)
+    return media_types
+
+
+def to_columnar(rows, columns):
+    """{"count": n, "columns": {name: [values...]}} with each name sent once"""
+    return {
+        'count': len(rows),
+        'columns': {column: [row.get(column) for row in rows] for column in columns}
+    }
+
+
+def encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_rows(rows, columns, format):
+    """Serialize rows and return (body, media type)"""
+    if format == 'msgpack':
+        return msgpack.packb(rows, default=encode_value, use_bin_type=True), MSGPACK_MEDIA_TYPE
+
+    content = to_columnar(rows, columns) if format == 'columnar' else rows
+    body = json.dumps(content, default=encode_value, ensure_ascii=False,
+                      allow_nan=False, separators=(',', ':')).encode('utf-8')
+    return body, COLUMNAR_MEDIA_TYPE if format == 'columnar' else JSON_MEDIA_TYPE
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def rows_response(request, rows, columns):
+    """Encode a list of row dicts in the format and encoding the client accepts.
+
+    JSON (an array of objects) stays the default. Bodies of at least
+    COMPRESSION_MIN_SIZE bytes are compressed with brotli or gzip when the
+    client's Accept-Encoding allows it.
+    """
+    format = choose_format(request.headers.get('accept'))
+    body, media_type = encode_rows(rows, columns, format)
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+
+    encoding = choose_encoding(request.headers.get('accept-encoding'))
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
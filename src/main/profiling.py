@@ -0,0 +1,270 @@
+# src/main/profiling.py
+import cProfile
+import fnmatch
+import os
+import re
+import runpy
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_MODES = ('sampling', 'cprofile')
+PROFILE_EXTENSIONS = {'sampling': '.collapsed', 'cprofile': '.pstats'}
+
+# Leaf frames of threads that are blocked waiting for work rather than running
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker')
+}
+
+
+class StackSampler:
+    """Samples the Python stacks of every thread every `interval` seconds.
+
+    Counts are kept per collapsed stack ("thread;outer;...;inner"), the format
+    flamegraph.pl and speedscope read. Idle threads are skipped so the graph
+    only shows code that was running.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = self._collapse(frame)
+                if stack:
+                    self.counts[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            self.samples += 1
+
+    def _collapse(self, frame):
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)})".replace(';', ':'))
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
+
+
+@contextmanager
+def capture(mode, path, interval=0.005):
+    """Profile the enclosed block and write the result to path.
+
+    cProfile traces only the calling thread (for a request, the event loop
+    thread), while sampling also covers work handed off to other threads.
+    """
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    else:
+        sampler = StackSampler(interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write_collapsed(path)
+
+
+class ProfileSession:
+    """Profiling armed for the next `count` matching requests or runs of a task."""
+
+    def __init__(self, mode='sampling', route=None, method=None, task_id=None,
+                 count=1, interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode: {mode}")
+        if (route is None) == (task_id is None):
+            raise ValueError("Profile either a route pattern or a task")
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.route = route
+        self.method = method.upper() if method else None
+        self.task_id = task_id
+        self.remaining = count
+        self.interval = interval
+        self.captures = []
+        self.created_at = time.time()
+
+    def matches_request(self, method, path):
+        return (self.route is not None
+                and (self.method is None or self.method == method)
+                and fnmatch.fnmatchcase(path, self.route))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'route': self.route,
+            'method': self.method,
+            'task_id': self.task_id,
+            'remaining': self.remaining,
+            'interval': self.interval,
+            'captures': self.captures
+        }
+
+
+class Profiler:
+    """Registry of armed profile sessions and the captures they produced.
+
+    Requests check `match` on every call, which returns immediately while no
+    session is armed. Only one capture runs at a time; matching requests that
+    arrive during a capture are not profiled and do not use up the count.
+
+    Sessions live in the process: with several API workers each has its own
+    Profiler, so a session armed through one worker only profiles requests
+    and task runs that land on that worker. Captures share the directory and
+    are listed by every worker.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or os.getenv(
+            'PROFILE_DIR', os.path.expanduser('~/ReportManager/profiles')
+        ))
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._capturing = False
+
+    def arm(self, **options):
+        session = ProfileSession(**options)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def cancel(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def sessions(self):
+        with self._lock:
+            return [session.to_dict() for session in self._sessions.values()]
+
+    def match(self, method, path):
+        """Claim a capture for this request, or return None"""
+        if not self._sessions:
+            return None
+        with self._lock:
+            if self._capturing:
+                return None
+            for session in self._sessions.values():
+                if session.matches_request(method, path):
+                    return self._claim(session, f"{method} {path}")
+        return None
+
+    def is_task_armed(self, task_id):
+        """Whether a session is waiting for a run of this task, without claiming it"""
+        if not self._sessions:
+            return False
+        with self._lock:
+            return any(session.task_id is not None and session.task_id == task_id
+                       for session in self._sessions.values())
+
+    def claim_task(self, task_id):
+        """Claim a capture for a run of this task: (mode, path) or None"""
+        if not self._sessions:
+            return None
+        with self._lock:
+            for session in self._sessions.values():
+                if session.task_id is not None and session.task_id == task_id:
+                    session, path = self._claim(session, f"task {task_id}")
+                    return session.mode, path
+        return None
+
+    @contextmanager
+    def capture(self, claim):
+        """Profile the enclosed block for a claim returned by match"""
+        session, path = claim
+        try:
+            with capture(session.mode, path, session.interval):
+                yield
+        finally:
+            with self._lock:
+                self._capturing = False
+
+    def list_captures(self):
+        if not self.directory.exists():
+            return []
+        captures = []
+        for path in self.directory.iterdir():
+            if path.suffix in PROFILE_EXTENSIONS.values():
+                stats = path.stat()
+                captures.append({'name': path.name, 'size': stats.st_size,
+                                 'created_at': stats.st_mtime})
+        return sorted(captures, key=lambda capture: capture['created_at'], reverse=True)
+
+    def get_capture_path(self, name):
+        path = self.directory / name
+        if path.name != name or path.suffix not in PROFILE_EXTENSIONS.values() or not path.exists():
+            raise FileNotFoundError(f"Profile not found: {name}")
+        return path
+
+    def _claim(self, session, label):
+        """Take one capture from the session; caller holds the lock"""
+        session.remaining -= 1
+        if session.remaining <= 0:
+            del self._sessions[session.id]
+        if session.task_id is None:
+            self._capturing = True
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:60]
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{session.id}_{len(session.captures) + 1}_{slug}"
+        path = self.directory / f"{name}{PROFILE_EXTENSIONS[session.mode]}"
+        session.captures.append(path.name)
+        return session, path
+
+
+def main(argv):
+    """python -m src.main.profiling MODE OUTPUT MODULE [ARGS...]
+
+    Runs MODULE as __main__ under the profiler; used to profile job runs.
+    """
+    mode, output, module, *args = argv
+    sys.argv = [module, *args]
+    with capture(mode, output):
+        try:
+            runpy.run_module(module, run_name='__main__', alter_sys=True)
+        except SystemExit as exit:
+            return exit.code
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
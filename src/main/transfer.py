@@ -0,0 +1,147 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+
+from src.database.database import TRANSFER_TABLES
+
+# NDJSON records name their table in this field ("type" is a task column)
+TABLE_FIELD = '_table'
+
+
+def export_ndjson(database, tables, batch_size=1000):
+    """Yield NDJSON lines for every row of the given tables"""
+    for table in tables:
+        json_columns = TRANSFER_TABLES[table]
+        for row in database.iter_rows(table, batch_size=batch_size):
+            for column in json_columns:
+                if row.get(column):
+                    row[column] = json.loads(row[column])
+            yield json.dumps({TABLE_FIELD: table, **row}, default=str) + '\n'
+
+
+def export_csv(database, table, batch_size=1000):
+    """Yield CSV text for one table, a batch of rows per chunk"""
+    columns = list(database.get_table_columns(table))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(database.iter_rows(table, batch_size=batch_size), 1):
+        writer.writerow([row[column] for column in columns])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iterate_async(async_iterable, loop):
+    """Consume an async iterable from a worker thread, one item at a time.
+
+    Each item is only requested once the previous one has been processed, so a
+    slow consumer applies backpressure to the upload instead of buffering it.
+    """
+    iterator = async_iterable.__aiter__()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def iter_lines(chunks):
+    """Split a stream of byte chunks into text lines, keeping line endings"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def read_ndjson(lines):
+    """Yield (table, row) pairs from NDJSON lines"""
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        table = record.pop(TABLE_FIELD, None)
+        if table not in TRANSFER_TABLES:
+            raise ValueError(f"Unknown table in record: {table}")
+        yield table, record
+
+
+def read_csv(lines, table, columns):
+    """Yield (table, row) pairs from CSV lines with a header row.
+
+    CSV has no nulls, so empty cells in non-text columns are read as NULL.
+    """
+    for row in csv.DictReader(lines):
+        yield table, {
+            key: None if value == '' and columns.get(key) != 'TEXT' else value
+            for key, value in row.items()
+        }
+
+
+class Importer:
+    """Loads a stream of records in chunked transactions.
+
+    Progress is saved to the database after every chunk, so it can be read
+    from any API worker while the import is running.
+    """
+
+    def __init__(self, database, chunk_size=1000, import_id=None):
+        self.database = database
+        self.chunk_size = chunk_size
+        self.id = import_id or uuid.uuid4().hex
+        self.status = 'pending'
+        self.imported = {table: 0 for table in TRANSFER_TABLES}
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def run(self, records):
+        self.status = 'running'
+        self.started_at = datetime.now()
+        self.database.save_import_progress(self.to_dict())
+        pending = {table: [] for table in TRANSFER_TABLES}
+        try:
+            for table, row in records:
+                pending[table].append(row)
+                if len(pending[table]) >= self.chunk_size:
+                    self._flush(table, pending)
+            for table in pending:
+                self._flush(table, pending)
+            self.status = 'completed'
+        except Exception as error:
+            self.status = 'failed'
+            self.error = str(error)
+            raise
+        finally:
+            self.finished_at = datetime.now()
+            self.database.save_import_progress(self.to_dict())
+        return self.to_dict()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'imported': dict(self.imported),
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    def _flush(self, table, pending):
+        if pending[table]:
+            self.imported[table] += self.database.import_rows(table, pending[table])
+            pending[table] = []
+            self.database.save_import_progress(self.to_dict())
@@ -1,9 +1,18 @@
 import pytest
 from fastapi.testclient import TestClient
-from src.main.api import app
+from src.main.api import app, backups, log_files, profiler
 from src.database import db
+import asyncio
+import httpx
+import json
 import os
+import threading
+import time
+from fastapi import FastAPI
 from pathlib import Path
+from src.main.admission import AdmissionController, AdmissionMiddleware
+from src.main.logs import grep
+from src.jobs.utils.job_utils import tail_lines
 
 client = TestClient(app)
 
@@ -18,10 +27,11 @@ def test_db():
     # Cleanup
     if db.db:
         db.db.close()
-        try:
-            os.remove(test_db_path)
-        except FileNotFoundError:
-            pass
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(test_db_path + suffix)
+            except FileNotFoundError:
+                pass
 
 @pytest.fixture(autouse=True)
 def clear_tables(test_db):
@@ -29,6 +39,11 @@ def clear_tables(test_db):
     with test_db.db:  # Use context manager for transactions
         test_db.db.executescript("""
             DELETE FROM tasks;
+            DELETE FROM tasks_archive;
+            DELETE FROM maintenance_runs;
+            DELETE FROM import_runs;
+            DELETE FROM job_queue;
+            DELETE FROM task_dependencies;
             DELETE FROM reports;
         """)
 
@@ -66,6 +81,28 @@ class TestHealthCheck:
         assert response.status_code == 200
         assert response.json() == {"status": "ok"}
 
+class TestBackupEndpoints:
+    def test_backup_and_schedule_restore(self, sample_report, tmp_path, monkeypatch):
+        monkeypatch.setattr(backups, "backup_dir", str(tmp_path))
+        response = client.post("/api/backup", json={"compress": True})
+        assert response.status_code == 200
+        name = response.json()["name"]
+        assert name.endswith(".sqlite.gz")
+
+        response = client.get("/api/backups")
+        assert [b["name"] for b in response.json()] == [name]
+
+        response = client.post(f"/api/backups/{name}/restore")
+        assert response.status_code == 200
+        marker = f"{db.db_path}.restore"
+        assert os.path.exists(marker)
+        os.remove(marker)
+
+    def test_restore_unknown_backup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(backups, "backup_dir", str(tmp_path))
+        response = client.post("/api/backups/missing.sqlite/restore")
+        assert response.status_code == 404
+
 class TestReportEndpoints:
     def test_create_report(self):
         report_data = {
@@ -92,6 +129,19 @@ class TestReportEndpoints:
         assert len(reports) == 1
         assert reports[0]["id"] == sample_report
 
+    def test_list_reports_time_range(self, sample_report):
+        with db.db:
+            db.db.execute("UPDATE reports SET created_at = '2024-01-02 00:00:00' WHERE id = ?", [sample_report])
+
+        report = client.get("/api/reports").json()[0]
+        assert report["created_at"] == "2024-01-02T00:00:00"
+        assert report["created_at_ms"] == 1704153600000
+
+        assert len(client.get("/api/reports?created_after=2024-01-01T00:00:00Z").json()) == 1
+        assert len(client.get("/api/reports?created_after=1704153600001").json()) == 0
+        assert len(client.get("/api/reports?created_before=2024-01-02T01:00:00%2B01:00").json()) == 0
+        assert client.get("/api/reports?updated_after=yesterday").status_code == 400
+
     def test_update_report(self, sample_report):
         update_data = {
             "name": "Updated Report",
@@ -125,6 +175,76 @@ class TestReportEndpoints:
         data = response.json()
         assert data["name"] == "Test Report (Copy)"
 
+    def test_duplicate_reports_bulk(self, sample_report, sample_task):
+        response = client.post("/api/reports/duplicate", json={
+            "report_ids": [sample_report],
+            "include_tasks": True,
+            "copies": 2
+        })
+        assert response.status_code == 200
+        new_ids = response.json()["ids"]
+        assert len(new_ids) == 2
+
+        response = client.get(f"/api/reports/{new_ids[0]}/tasks")
+        assert len(response.json()) == 1
+
+    def test_duplicate_reports_not_found(self):
+        response = client.post("/api/reports/duplicate", json={"report_ids": [999]})
+        assert response.status_code == 404
+
+class TestListRepresentations:
+    def test_fields_projection(self, sample_report):
+        reports = client.get("/api/reports?fields=id,name").json()
+        assert reports == [{"id": sample_report, "name": "Test Report"}]
+
+        report = client.get("/api/reports?fields=-template,-recipients").json()[0]
+        assert "template" not in report and "recipients" not in report
+        assert report["created_by"] == "test_user"
+
+        assert client.get("/api/reports?fields=id,secret").status_code == 400
+
+        columns = ",".join(f"-{name}" for name in db.get_table_columns("reports", include_generated=True))
+        response = client.get(f"/api/reports?fields={columns}")
+        assert response.status_code == 400
+        assert "No fields" in response.json()["detail"]
+
+    def test_columnar_json(self, sample_report):
+        response = client.get("/api/reports?fields=id,name", headers={"Accept": "application/vnd.columnar+json"})
+        assert response.headers["content-type"] == "application/vnd.columnar+json"
+        assert response.json() == {"count": 1, "columns": {"id": [sample_report], "name": ["Test Report"]}}
+
+    def test_msgpack(self, sample_report):
+        msgpack = pytest.importorskip("msgpack")
+        response = client.get("/api/tasks", headers={"Accept": "application/msgpack"})
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == []
+
+        response = client.get("/api/reports", headers={"Accept": "application/msgpack;q=0.9, application/json;q=0.5"})
+        report = msgpack.unpackb(response.content)[0]
+        assert report["id"] == sample_report
+        assert report["created_at"] == client.get("/api/reports").json()[0]["created_at"]
+
+    def test_not_acceptable(self):
+        assert client.get("/api/reports", headers={"Accept": "text/html"}).status_code == 406
+
+    def test_compression_above_threshold(self, sample_report):
+        response = client.get("/api/reports", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+        for i in range(20):
+            client.post("/api/reports", json={"name": f"Report {i}", "created_by": "test_user", "template": "<p>x</p>" * 50})
+        response = client.get("/api/reports", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()) == 21
+
+    def test_brotli_preferred_when_installed(self):
+        pytest.importorskip("brotli")
+        for i in range(20):
+            client.post("/api/reports", json={"name": f"Report {i}", "created_by": "test_user", "template": "<p>x</p>" * 50})
+        response = client.get("/api/reports", headers={"Accept-Encoding": "br;q=1, gzip;q=0.5"})
+        assert response.headers["content-encoding"] == "br"
+        assert len(response.json()) == 20
+
 class TestTaskEndpoints:
     def test_create_task(self, sample_report):
         task_data = {
@@ -178,6 +298,390 @@ class TestTaskEndpoints:
         assert task is not None
         assert task["id"] == sample_task
 
+    def test_archived_task_is_opt_in(self, sample_report, sample_task):
+        client.delete(f"/api/tasks/{sample_task}")
+        db.archive_tasks(grace_seconds=0)
+
+        response = client.get(f"/api/tasks/{sample_task}")
+        assert response.status_code == 404
+
+        response = client.get(f"/api/tasks/{sample_task}?include_archived=true")
+        assert response.status_code == 200
+        assert response.json()["archived_at"] is not None
+
+        response = client.get(f"/api/reports/{sample_report}/tasks?include_archived=true")
+        assert [t["id"] for t in response.json()] == [sample_task]
+
+class TestTransferEndpoints:
+    def test_export_ndjson(self, sample_report, sample_task):
+        response = client.get("/api/export?format=ndjson")
+        assert response.status_code == 200
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [(r["_table"], r["id"]) for r in records] == [
+            ("reports", sample_report), ("tasks", sample_task)
+        ]
+        assert records[0]["recipients"] == ["test@example.com"]
+
+    def test_export_csv_requires_single_entity(self):
+        response = client.get("/api/export?format=csv")
+        assert response.status_code == 400
+
+    def test_ndjson_round_trip(self, sample_report, sample_task):
+        exported = client.get("/api/export", params={"batch_size": 1}).content
+        client.delete(f"/api/reports/{sample_report}")
+
+        response = client.post(
+            "/api/import?chunk_size=1&import_id=round-trip",
+            content=iter([exported[:10], exported[10:]])
+        )
+        assert response.status_code == 200
+        assert response.json()["imported"] == {"reports": 1, "tasks": 1}
+
+        report = client.get(f"/api/reports/{sample_report}").json()
+        assert report["recipients"] == ["test@example.com"]
+        assert client.get(f"/api/tasks/{sample_task}").json()["is_active"] == 1
+
+        progress = client.get("/api/import/round-trip").json()
+        assert progress["status"] == "completed"
+
+    def test_csv_round_trip(self, sample_report):
+        client.put(f"/api/reports/{sample_report}", json={"template": "line 1\nline 2"})
+        exported = client.get("/api/export?format=csv&entity=reports").content
+        client.delete(f"/api/reports/{sample_report}")
+
+        response = client.post("/api/import?format=csv&entity=reports", content=exported)
+        assert response.status_code == 200
+        assert response.json()["imported"]["reports"] == 1
+        assert client.get(f"/api/reports/{sample_report}").json()["template"] == "line 1\nline 2"
+
+    def test_import_invalid_record(self):
+        response = client.post("/api/import", content=b'{"_table": "unknown"}\n')
+        assert response.status_code == 400
+
+class TestJobEndpoints:
+    def test_run_unknown_task(self):
+        response = client.post("/api/tasks/999/run")
+        assert response.status_code == 404
+
+    def test_job_stats(self):
+        response = client.get("/api/jobs/stats")
+        assert response.status_code == 200
+        assert {"queue_depth", "running", "wait_time"} <= set(response.json())
+
+    def test_unknown_run(self):
+        response = client.get("/api/jobs/runs/missing")
+        assert response.status_code == 404
+
+    def test_job_queue_endpoints(self, sample_task):
+        # sample_task has type "report", which has no job module
+        assert client.post(f"/api/tasks/{sample_task}/enqueue").status_code == 400
+        task_id = db.create_task(name="Sample", type="sample_job")
+
+        response = client.post("/api/queue", json={"job": "missing_job"})
+        assert response.status_code == 400
+
+        response = client.post("/api/queue", json={"job": "sample_job", "params": {"n": 1}, "max_attempts": 1})
+        assert response.status_code == 200
+        job = response.json()
+        assert job["status"] == "queued" and job["params"] == {"n": 1}
+
+        response = client.post(f"/api/tasks/{task_id}/enqueue", params={"priority": 3})
+        assert response.status_code == 200
+        assert response.json()["task_id"] == task_id
+
+        listing = client.get("/api/queue", params={"status": "queued"}).json()
+        assert listing["stats"]["queued"] == 2 and len(listing["jobs"]) == 2
+        assert client.get("/api/queue", params={"status": "bogus"}).status_code == 400
+
+        # Only dead jobs can be retried
+        assert client.post(f"/api/queue/{job['id']}/retry").status_code == 404
+        claimed = db.claim_jobs("worker", limit=2)
+        db.fail_job(job["id"], next(j for j in claimed if j["id"] == job["id"])["lease_token"], "boom")
+        assert client.get(f"/api/queue/{job['id']}").json()["status"] == "dead"
+        assert client.post(f"/api/queue/{job['id']}/retry").json()["status"] == "queued"
+        assert client.get("/api/queue/999999").status_code == 404
+
+    def test_dependencies_and_pipelines(self):
+        first = db.create_task(name="First", type="sample_job")
+        second = db.create_task(name="Second", type="sample_job")
+
+        response = client.put(f"/api/tasks/{second}/dependencies", json={"depends_on": [first]})
+        assert response.status_code == 200
+        assert response.json() == {"depends_on": [first], "dependents": []}
+        assert client.get(f"/api/tasks/{first}/dependencies").json()["dependents"] == [second]
+        response = client.put(f"/api/tasks/{first}/dependencies", json={"depends_on": [second]})
+        assert response.status_code == 400
+        assert client.get("/api/tasks/999999/dependencies").status_code == 404
+
+        assert client.post("/api/pipelines", json={"task_ids": [999999]}).status_code == 404
+        response = client.post("/api/pipelines", json={"task_ids": [second]})
+        assert response.status_code == 200
+        pipeline = response.json()
+        assert [task["task_id"] for task in pipeline["tasks"]] == [first, second]
+        assert client.get(f"/api/pipelines/{pipeline['id']}").status_code == 200
+        assert client.get("/api/pipelines/missing").status_code == 404
+
+class TestCalculateEndpoint:
+    def test_broadcast_add(self):
+        response = client.post("/api/calculate", json={
+            "operation": "add", "a": [[1, 2], [3, 4]], "b": [10, 20]
+        })
+        assert response.status_code == 200
+        assert response.json()["result"] == [[11, 22], [13, 24]]
+
+    def test_reductions(self):
+        values = list(range(1, 101))
+        assert client.post("/api/calculate", json={"operation": "sum", "a": values}).json()["result"] == 5050
+        assert client.post("/api/calculate", json={"operation": "mean", "a": [[1, 2], [3, 4]], "axis": 0}).json()["result"] == [2, 3]
+
+        response = client.post("/api/calculate", json={"operation": "summary", "a": values, "percentiles": [50, 90]})
+        summary = response.json()["result"]
+        assert summary["count"] == 100
+        assert summary["max"] == 100
+        assert summary["percentiles"]["50"] == 50.5
+        assert summary["percentiles"]["90"] == pytest.approx(90.1)
+
+    def test_non_finite_results_are_null(self):
+        response = client.post("/api/calculate", json={"operation": "multiply", "a": [1e308, 1], "b": 2})
+        assert response.status_code == 200
+        assert response.json()["result"] == [None, 2]
+
+        response = client.post("/api/calculate", json={"operation": "multiply", "a": 1e308, "b": -2})
+        assert response.status_code == 200
+        assert response.json()["result"] is None
+
+    def test_binary_round_trip(self):
+        import numpy as np
+        values = np.arange(1_000_000, dtype="<f8")
+        response = client.post(
+            "/api/calculate?operation=multiply&b=2",
+            content=values.tobytes(),
+            headers={"Content-Type": "application/octet-stream", "Accept": "application/octet-stream"}
+        )
+        assert response.status_code == 200
+        assert response.headers["x-shape"] == "1000000"
+        assert np.array_equal(np.frombuffer(response.content, dtype="<f8"), values * 2)
+
+        response = client.post(
+            "/api/calculate?operation=percentile&percentiles=50,100",
+            content=values.tobytes(),
+            headers={"Content-Type": "application/octet-stream"}
+        )
+        assert response.json()["result"] == [499999.5, 999999]
+
+    def test_invalid_calculations(self):
+        assert client.post("/api/calculate", json={"operation": "add", "a": [1, 2]}).status_code == 400
+        assert client.post("/api/calculate", json={"operation": "add", "a": [1, 2], "b": [1, 2, 3]}).status_code == 400
+        assert client.post("/api/calculate", json={"operation": "mean", "a": []}).status_code == 400
+        assert client.post("/api/calculate", json={"operation": "unknown", "a": [1]}).status_code == 400
+        assert client.post("/api/calculate", json={"a": [1]}).status_code == 422
+
+class TestProfilingEndpoints:
+    @pytest.fixture(autouse=True)
+    def profile_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiler, "directory", tmp_path)
+        yield
+        for session in profiler.sessions():
+            profiler.cancel(session["id"])
+
+    def test_profiles_next_matching_request(self):
+        response = client.post("/api/debug/profile", json={"mode": "cprofile", "route": "/api/health", "count": 1})
+        assert response.status_code == 200
+        session = response.json()
+
+        client.get("/api/health")
+        client.get("/api/health")
+
+        state = client.get("/api/debug/profile").json()
+        assert state["sessions"] == []
+        assert len(state["captures"]) == 1
+        name = state["captures"][0]["name"]
+        assert session["id"] in name and name.endswith(".pstats")
+
+        response = client.get(f"/api/debug/profiles/{name}")
+        assert response.status_code == 200
+        assert len(response.content) > 0
+
+    def test_sampling_writes_collapsed_stacks(self):
+        client.post("/api/debug/profile", json={"route": "/api/calculate", "method": "post", "interval_ms": 1})
+        client.get("/api/calculate")
+        assert client.get("/api/debug/profile").json()["captures"] == []
+
+        client.post("/api/calculate", json={"operation": "sum", "a": list(range(200000))})
+        captures = client.get("/api/debug/profile").json()["captures"]
+        assert [c["name"].endswith(".collapsed") for c in captures] == [True]
+
+    def test_cancel_session(self):
+        session = client.post("/api/debug/profile", json={"route": "/api/*", "count": 5}).json()
+        assert client.delete(f"/api/debug/profile/{session['id']}").status_code == 200
+        assert client.delete(f"/api/debug/profile/{session['id']}").status_code == 404
+
+    def test_invalid_profile_requests(self):
+        assert client.post("/api/debug/profile", json={"mode": "trace", "route": "/api/health"}).status_code == 400
+        assert client.post("/api/debug/profile", json={"route": "/api/health", "task_id": 1}).status_code == 400
+        assert client.post("/api/debug/profile", json={}).status_code == 400
+        assert client.get("/api/debug/profiles/../test.sqlite").status_code == 404
+
+class TestAdmissionControl:
+    def make_app(self, **options):
+        release = asyncio.Event()
+        test_app = FastAPI()
+        controller = AdmissionController(**{"route_limit": 1, "max_queue": 1, "queue_timeout": 5, **options})
+        test_app.add_middleware(AdmissionMiddleware, controller=controller)
+
+        @test_app.get("/api/slow/{id}")
+        async def slow(id: int):
+            await release.wait()
+            return {"id": id}
+
+        @test_app.post("/api/write")
+        async def write():
+            return {"ok": True}
+
+        @test_app.get("/api/health")
+        async def health():
+            return {"status": "ok"}
+
+        return test_app, controller, release
+
+    def test_sheds_when_route_queue_is_full(self):
+        async def scenario():
+            test_app, controller, release = self.make_app()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=test_app), base_url="http://test") as http:
+                first = asyncio.create_task(http.get("/api/slow/1"))
+                second = asyncio.create_task(http.get("/api/slow/2"))
+                await asyncio.sleep(0.05)
+
+                shed = await http.get("/api/slow/3")
+                assert shed.status_code == 503
+                assert shed.headers["retry-after"] == "1"
+                assert (await http.get("/api/health")).status_code == 200
+
+                release.set()
+                assert [(await r).json()["id"] for r in (first, second)] == [1, 2]
+
+            stats = controller.stats()["routes"]["GET /api/slow/{id}"]
+            assert (stats["admitted"], stats["shed"], stats["active"]) == (2, 1, 0)
+        asyncio.run(scenario())
+
+    def test_queued_requests_time_out(self):
+        async def scenario():
+            test_app, controller, release = self.make_app(queue_timeout=0.1)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=test_app), base_url="http://test") as http:
+                first = asyncio.create_task(http.get("/api/slow/1"))
+                await asyncio.sleep(0.05)
+                assert (await http.get("/api/slow/2")).status_code == 503
+                release.set()
+                assert (await first).status_code == 200
+                assert (await http.get("/api/slow/3")).status_code == 200
+        asyncio.run(scenario())
+
+    def test_sheds_writes_when_database_queue_is_deep(self):
+        class Backlog:
+            def pending(self):
+                return 1000
+
+        class Database:
+            write_queue = Backlog()
+
+            def lock_waiters(self):
+                return 0
+
+        async def scenario():
+            test_app, controller, release = self.make_app(database=Database(), max_db_queue=10)
+            release.set()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=test_app), base_url="http://test") as http:
+                assert (await http.post("/api/write")).status_code == 503
+                assert (await http.get("/api/slow/1")).status_code == 200
+            assert controller.counters["shed_db_queue"] == 1
+        asyncio.run(scenario())
+
+    def test_database_queue_counts_lock_waiters(self, test_db):
+        def read():
+            with db.get_connection() as conn:
+                conn.execute("SELECT 1")
+
+        controller = AdmissionController(database=db)
+        with db.get_connection():
+            waiter = threading.Thread(target=read)
+            waiter.start()
+            deadline = time.monotonic() + 5
+            while controller.db_queue_depth() == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert controller.db_queue_depth() == 1
+        waiter.join()
+        assert controller.db_queue_depth() == 0
+
+    def test_metrics(self):
+        client.get("/api/reports")
+        response = client.get("/api/metrics")
+        assert response.status_code == 200
+        metrics = response.json()
+        assert "GET /api/reports" in metrics["admission"]["routes"]
+        assert "queue_depth" in metrics["jobs"]
+
+class TestLogs:
+    @pytest.fixture
+    def log_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(log_files, "log_dir", tmp_path)
+        monkeypatch.setattr(log_files, "job_log_dir", tmp_path / "jobs")
+        return tmp_path
+
+    def test_tail_lines_reads_backwards(self, tmp_path):
+        path = tmp_path / "big.log"
+        path.write_text("".join(f"line {i}\n" for i in range(1000)))
+        lines, size = tail_lines(path, 3, block_size=16)
+        assert lines == ["line 997", "line 998", "line 999"]
+        assert size == path.stat().st_size
+        assert tail_lines(path, 2000)[0][0] == "line 0"
+
+        (tmp_path / "empty.log").write_text("")
+        assert tail_lines(tmp_path / "empty.log", 5) == ([], 0)
+
+    def test_grep(self, tmp_path):
+        path = tmp_path / "app.log"
+        path.write_text("INFO start\nERROR disk full\nINFO ok\nerror: retry\nERROR again")
+
+        assert [m["line"] for m in grep(path, "ERROR")["matches"]] == ["ERROR disk full", "ERROR again"]
+        assert len(grep(path, "error", ignore_case=True)["matches"]) == 3
+        assert [m["line"] for m in grep(path, r"^INFO \w+$", regex=True)["matches"]] == ["INFO start", "INFO ok"]
+
+        first = grep(path, "ERROR", limit=1)
+        assert len(first["matches"]) == 1
+        rest = grep(path, "ERROR", start=first["next_offset"])
+        assert [m["line"] for m in rest["matches"]] == ["ERROR again"]
+        assert rest["next_offset"] is None
+
+    def test_read_log_endpoint(self, log_dir):
+        (log_dir / "app.log").write_text("one\ntwo\nthree\n")
+        response = client.get("/api/logs/app?lines=2")
+        assert response.status_code == 200
+        assert response.json()["lines"] == ["two", "three"]
+
+        response = client.get("/api/logs/app?grep=t")
+        assert [m["line"] for m in response.json()["matches"]] == ["two", "three"]
+
+        run_id = "a" * 32
+        (log_dir / "jobs").mkdir()
+        (log_dir / "jobs" / f"{run_id}.log").write_text("job output\n")
+        assert client.get(f"/api/logs/{run_id}").json()["lines"] == ["job output"]
+        (log_dir / "jobs" / "queue-7.log").write_text("queued job output\n")
+        assert client.get("/api/logs/queue-7").json()["lines"] == ["queued job output"]
+
+        assert client.get("/api/logs/app?grep=(&regex=true").status_code == 400
+        assert client.get("/api/logs/../secrets").status_code == 404
+        assert client.get("/api/logs/unknown").status_code == 400
+        assert client.get("/api/logs/api?date=19990101").status_code == 404
+
+    def test_follow_log(self, log_dir):
+        path = log_dir / "app.log"
+        path.write_text("old\nlast\n")
+        with client.websocket_connect("/ws/logs/app?lines=1") as websocket:
+            assert websocket.receive_text() == "last"
+            with open(path, "a") as f:
+                f.write("new line\n")
+            assert websocket.receive_text() == "new line"
+
 class TestErrorHandling:
     def test_invalid_report_id(self):
         response = client.get("/api/reports/999")
@@ -2,6 +2,7 @@ import os
 import pytest
 from pathlib import Path
 from src.database import db
+from src.database.database import Database
 
 @pytest.fixture(scope="session")
 def test_db_path():
@@ -12,28 +13,43 @@ def setup_test_db(test_db_path):
     # Set test database path
     os.environ['TEST_DB_PATH'] = test_db_path
     
-    # Initialize database
-    db.initialize()
+    # Initialize database; in memory, since every test starts from empty tables anyway
+    db.initialize(in_memory=True)
     
     yield db
     
     # Cleanup after all tests
     if db.db:
         db.db.close()
-        try:
-            os.remove(test_db_path)
-        except FileNotFoundError:
-            pass
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(test_db_path + suffix)
+            except FileNotFoundError:
+                pass
 
 @pytest.fixture(autouse=True)
 def clear_tables():
     # Clear tables before each test - delete tasks first due to foreign key constraint
     db.db.executescript("""
         DELETE FROM tasks;
+        DELETE FROM tasks_archive;
+        DELETE FROM maintenance_runs;
+        DELETE FROM import_runs;
+        DELETE FROM job_queue;
+        DELETE FROM task_dependencies;
         DELETE FROM reports;
     """)
     db.db.commit()
 
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    """A separate file-backed database, for tests of file-level behaviour"""
+    monkeypatch.setenv('TEST_DB_PATH', str(tmp_path / "file.sqlite"))
+    database = Database()
+    database.initialize(in_memory=False)
+    yield database
+    database.close()
+
 @pytest.fixture
 def sample_report():
     report_id = db.create_report(
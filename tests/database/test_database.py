@@ -1,7 +1,19 @@
 import pytest
 import json
 from src.database import db
+from src.database.database import MIGRATIONS, Database
+from src.database.locking import FileLock, LeaderElection
+from src.database.maintenance import MaintenanceScheduler
+from src.jobs.scheduler import TaskScheduler
+from src.jobs.worker import Worker
+from src.database.backup import BackupManager, SnapshotScheduler, restore_pending_backup
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
 import time
+from pathlib import Path
 
 class TestReports:
     def test_create_report(self):
@@ -40,6 +52,25 @@ class TestReports:
         assert copy['created_by'] == 'test_user'
         assert copy['recipients'] == ['test@example.com']
 
+    def test_duplicate_report_with_tasks(self, sample_report):
+        db.create_task(name="Active Task", type="report", report_id=sample_report)
+        inactive_id = db.create_task(name="Inactive Task", type="report", report_id=sample_report)
+        db.delete_task(inactive_id)
+
+        new_id = db.duplicate_report(sample_report, include_tasks=True)
+
+        tasks = db.get_tasks_by_report_id(new_id)
+        assert [t['name'] for t in tasks] == ['Active Task']
+
+    def test_duplicate_reports_bulk(self, sample_report):
+        db.create_task(name="Task", type="report", report_id=sample_report)
+
+        new_ids = db.duplicate_reports([sample_report, 999], include_tasks=True, copies=3)
+        assert len(new_ids) == 3
+        for new_id in new_ids:
+            assert db.get_report(new_id)['name'] == 'Test Report (Copy)'
+            assert len(db.get_tasks_by_report_id(new_id)) == 1
+
     def test_delete_report(self, sample_report):
         success = db.delete_report(sample_report)
         assert success is True
@@ -89,6 +120,38 @@ class TestReports:
         duplicate_result = db.duplicate_report(999)
         assert duplicate_result is None
 
+    def test_lists_skip_uncommitted_writes_of_other_threads(self, sample_report):
+        writing, abort = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with db.get_connection() as conn:
+                    conn.execute("INSERT INTO reports (name, created_by) VALUES ('Rolled back', 'x')")
+                    writing.set()
+                    abort.wait(5)
+                    raise RuntimeError("abort")
+            except RuntimeError:
+                pass
+
+        listed = {}
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        readers = [
+            threading.Thread(target=lambda: listed.update(reports=db.list_reports())),
+            threading.Thread(target=lambda: listed.update(tasks=db.list_tasks()))
+        ]
+        for reader in readers:
+            reader.start()
+        time.sleep(0.1)
+        abort.set()
+        writer.join()
+        for reader in readers:
+            reader.join()
+
+        assert [report['name'] for report in listed['reports']] == ['Test Report']
+        assert listed['tasks'] == []
+
 class TestTasks:
     def test_create_task(self, sample_report):
         task_id = db.create_task(
@@ -128,3 +191,620 @@ class TestTasks:
         task = db.get_task(task_id)
         assert task['name'] == 'Updated Task'
         assert task['is_active'] == 0
+
+class TestArchival:
+    def test_archive_inactive_tasks(self, sample_report):
+        active_id = db.create_task(name="Active", type="report", report_id=sample_report)
+        inactive_id = db.create_task(name="Inactive", type="report", report_id=sample_report)
+        db.delete_task(inactive_id)
+
+        archived = db.archive_tasks(grace_seconds=0)
+        assert archived == 1
+
+        assert db.get_task(inactive_id) is None
+        archived_task = db.get_task(inactive_id, include_archived=True)
+        assert archived_task['name'] == 'Inactive'
+        assert archived_task['archived_at'] is not None
+        assert db.get_task(active_id)['name'] == 'Active'
+
+        tasks = db.get_tasks_by_report_id(sample_report, include_archived=True)
+        assert {t['id'] for t in tasks} == {active_id, inactive_id}
+
+    def test_archive_respects_grace_period(self, sample_report):
+        task_id = db.create_task(name="Inactive", type="report", report_id=sample_report)
+        db.delete_task(task_id)
+
+        assert db.archive_tasks(grace_seconds=3600) == 0
+        assert db.get_task(task_id) is not None
+
+    def test_archive_orphaned_tasks_in_batches(self, sample_report):
+        for i in range(5):
+            db.create_task(name=f"Task {i}", type="report", report_id=sample_report)
+        db.delete_report(sample_report)
+
+        assert db.archive_tasks(grace_seconds=3600, batch_size=2) == 5
+        assert db.get_tasks_by_report_id(sample_report, include_archived=True) != []
+
+    def test_active_task_with_unknown_report_is_kept(self):
+        task_id = db.create_task(name="Dangling", type="report", report_id=999999)
+        assert db.archive_tasks(grace_seconds=3600) == 0
+        assert db.get_task(task_id) is not None
+
+    def test_purge_archive(self, sample_report):
+        task_id = db.create_task(name="Inactive", type="report", report_id=sample_report)
+        db.delete_task(task_id)
+        db.archive_tasks(grace_seconds=0)
+
+        assert db.purge_archive(retention_days=1) == 0
+        assert db.purge_archive(retention_days=0) == 1
+        assert db.get_task(task_id, include_archived=True) is None
+
+class TestMaintenance:
+    def test_database_info(self, file_db):
+        info = file_db.get_database_info()
+        assert info['journal_mode'] == 'wal'
+        assert info['page_count'] > 0
+        assert info['freelist_count'] >= 0
+        assert 'wal_size' in info
+
+        info = db.get_database_info()
+        assert info['in_memory'] and info['journal_mode'] == 'memory'
+        assert info['size'] == info['page_size'] * info['page_count']
+
+    def test_incremental_vacuum_reclaims_pages(self):
+        report_ids = [
+            db.create_report(name=f"Report {i}", created_by="test_user", template="x" * 4096)
+            for i in range(50)
+        ]
+        for report_id in report_ids:
+            db.delete_report(report_id)
+        assert db.get_database_info()['freelist_count'] > 0
+
+        reclaimed = db.incremental_vacuum(time_budget=5)
+        assert reclaimed > 0
+        assert db.get_database_info()['freelist_count'] == 0
+
+    def test_scheduler_records_runs(self):
+        scheduler = MaintenanceScheduler(db)
+        results = scheduler.run_once(force=True)
+        assert set(results) == {'optimize', 'analyze', 'incremental_vacuum', 'checkpoint'}
+
+        last_maintenance = db.get_database_info()['last_maintenance']
+        assert set(last_maintenance) == set(results)
+
+    def test_scheduler_waits_for_idle(self):
+        scheduler = MaintenanceScheduler(db, idle_seconds=3600)
+        db.create_report(name="Busy", created_by="test_user")
+        assert scheduler.run_once() == {}
+
+    def test_reads_count_as_activity(self):
+        scheduler = MaintenanceScheduler(db, idle_seconds=3600)
+        db.last_activity = time.monotonic() - 7200
+        assert scheduler.is_idle()
+        db.list_reports()
+        assert not scheduler.is_idle()
+
+        # Its own statements do not hold maintenance back
+        db.last_activity = time.monotonic() - 7200
+        scheduler.run_once()
+        assert scheduler.is_idle()
+
+    def test_existing_file_converted_on_request(self, tmp_path, monkeypatch):
+        path = tmp_path / "legacy.sqlite"
+        legacy = sqlite3.connect(path)
+        legacy.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        legacy.commit()
+        legacy.close()
+
+        monkeypatch.setenv('TEST_DB_PATH', str(path))
+        database = Database()
+        database.initialize(in_memory=False)
+        try:
+            assert database.get_database_info()['auto_vacuum'] == 'none'
+            assert database.vacuum() == {'auto_vacuum': 'incremental'}
+            assert database.get_database_info()['auto_vacuum'] == 'incremental'
+        finally:
+            database.close()
+
+class TestBackups:
+    def test_backup_and_rotate(self, sample_report, tmp_path):
+        manager = BackupManager(db, backup_dir=str(tmp_path), keep=2)
+        for compress in (False, True, True):
+            backup = manager.backup(compress=compress)
+            assert backup['compressed'] is compress
+
+        backups = manager.list_backups()
+        assert len(backups) == 2
+        assert all(b['compressed'] for b in backups)
+
+    def test_restore_pending_backup(self, sample_report, tmp_path):
+        manager = BackupManager(db, backup_dir=str(tmp_path / 'backups'))
+        backup = manager.backup(compress=True)
+
+        restored_path = str(tmp_path / 'restored.sqlite')
+        assert restore_pending_backup(restored_path) is None
+        with open(f"{restored_path}.restore", 'w') as f:
+            f.write(backup['path'])
+
+        assert restore_pending_backup(restored_path) == backup['path']
+        connection = sqlite3.connect(restored_path)
+        names = [row[0] for row in connection.execute('SELECT name FROM reports')]
+        connection.close()
+        assert names == ['Test Report']
+
+    def test_failed_restore_keeps_current_database(self, tmp_path):
+        current = tmp_path / 'current.sqlite'
+        with sqlite3.connect(current) as connection:
+            connection.execute('CREATE TABLE kept (id INTEGER)')
+        corrupt = tmp_path / 'corrupt.sqlite'
+        corrupt.write_bytes(b'not a database' * 100)
+
+        for source in (corrupt, tmp_path / 'missing.sqlite'):
+            Path(f"{current}.restore").write_text(str(source))
+            assert restore_pending_backup(str(current)) is None
+            assert not os.path.exists(f"{current}.restore")
+            assert Path(f"{current}.restore.failed").read_text() == str(source)
+            assert not os.path.exists(f"{current}.restoring")
+        with sqlite3.connect(current) as connection:
+            assert connection.execute("SELECT name FROM sqlite_master").fetchall() == [('kept',)]
+
+    def test_backup_during_writes(self, file_db, tmp_path):
+        for i in range(200):
+            file_db.create_report(name=f"Report {i}", created_by="test_user", template="x" * 1024)
+        stop = threading.Event()
+
+        def write():
+            while not stop.is_set():
+                file_db.create_report(name="Concurrent", created_by="test_user")
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            backup = BackupManager(file_db, backup_dir=str(tmp_path / 'backups')).backup(compress=False)
+        finally:
+            stop.set()
+            writer.join()
+
+        connection = sqlite3.connect(backup['path'])
+        try:
+            assert connection.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+            count = connection.execute("SELECT COUNT(*) FROM reports WHERE name != 'Concurrent'").fetchone()[0]
+        finally:
+            connection.close()
+        assert count == 200
+
+class TestWriteQueue:
+    @pytest.fixture(autouse=True)
+    def write_queue(self):
+        write_queue = db.enable_write_queue(window=0.05, max_batch=100)
+        yield write_queue
+        db.disable_write_queue()
+
+    def test_concurrent_writes_share_commits(self, write_queue):
+        batches = write_queue.batches
+        ids = []
+        def create(i):
+            ids.append(db.create_report(name=f"Report {i}", created_by="test_user"))
+
+        threads = [threading.Thread(target=create, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(ids)) == 20
+        assert len(db.list_reports()) == 20
+        assert write_queue.batches - batches < 20
+
+    def test_failed_write_does_not_affect_batch(self, write_queue, sample_report):
+        with pytest.raises(sqlite3.OperationalError):
+            db.update_report(sample_report, {'missing_column': 'x'})
+
+        assert db.update_report(sample_report, {'name': 'Renamed'}) is True
+        assert db.get_report(sample_report)['name'] == 'Renamed'
+
+    def test_disable_flushes_pending_writes(self):
+        task_id = db.create_task(name="Task", type="report")
+        db.disable_write_queue()
+        assert db.write_queue is None
+        assert db.get_task(task_id)['name'] == 'Task'
+
+class TestLocking:
+    def test_file_lock_is_exclusive(self, tmp_path):
+        path = str(tmp_path / 'test.lock')
+        first, second = FileLock(path), FileLock(path)
+
+        assert first.acquire(blocking=False) is True
+        assert second.acquire(blocking=False) is False
+        first.release()
+        assert second.acquire(blocking=False) is True
+        second.release()
+
+    def test_follower_takes_over_leadership(self, tmp_path):
+        path = str(tmp_path / 'leader.lock')
+        elected = threading.Event()
+        leader = LeaderElection(path, on_elected=lambda: None)
+        follower = LeaderElection(path, on_elected=elected.set, interval=0.01)
+
+        assert leader.try_acquire() is True
+        assert follower.try_acquire() is False
+        follower.start()
+
+        leader.stop()
+        assert elected.wait(timeout=5)
+        assert follower.is_leader
+        follower.stop()
+
+class TestScheduling:
+    class RecordingController:
+        def __init__(self):
+            self.submitted = []
+
+        def submit(self, task, priority=0):
+            self.submitted.append(task['id'])
+            return task['id']
+
+    def test_scheduler_submits_due_tasks(self, sample_report):
+        task_id = db.create_task(name="Task", type="report", report_id=sample_report,
+                                 schedule="*/5 * * * *")
+        controller = self.RecordingController()
+        scheduler = TaskScheduler(db, controller)
+
+        # The first pass only computes the next run time
+        assert scheduler.run_once() == []
+        assert db.get_task(task_id)['next_run_at'] is not None
+        assert db.get_due_tasks() == []
+
+        db.set_task_next_run(task_id, '2000-01-01 00:00:00')
+        assert scheduler.run_once() == [task_id]
+        assert db.get_due_tasks() == []
+
+class TestTimestamps:
+    def set_created_at(self, table, id, value):
+        db.db.execute(f"UPDATE {table} SET created_at = ?, updated_at = ? WHERE id = ?", [value, value, id])
+        db.db.commit()
+
+    def test_epoch_ms_columns_follow_text_columns(self, sample_report):
+        self.set_created_at("reports", sample_report, "2024-01-01 00:00:00")
+        report = db.get_report(sample_report)
+        assert report["created_at_ms"] == 1704067200000
+        assert report["updated_at_ms"] == 1704067200000
+
+        db.update_report(sample_report, {"name": "Renamed"})
+        assert db.get_report(sample_report)["updated_at_ms"] > time.time() * 1000 - 60000
+
+        task_id = db.create_task(name="T", type="sample_job", schedule="* * * * *")
+        db.set_task_next_run(task_id, "2024-01-01 00:01:00")
+        assert db.get_task(task_id)["next_run_at_ms"] == 1704067260000
+
+    def test_list_time_ranges(self):
+        ids = [db.create_report(name=f"R{i}", created_by="test_user") for i in range(3)]
+        for id, day in zip(ids, ("2024-01-01", "2024-01-02", "2024-01-03")):
+            self.set_created_at("reports", id, f"{day} 12:00:00")
+
+        jan_2 = 1704153600000
+        assert [r["id"] for r in db.list_reports(created_after=jan_2)] == [ids[2], ids[1]]
+        assert [r["id"] for r in db.list_reports(created_before=jan_2)] == [ids[0]]
+        assert [r["id"] for r in db.list_reports(updated_after=jan_2, updated_before=jan_2 + 86400000)] == [ids[1]]
+
+        task_id = db.create_task(name="T", type="sample_job")
+        self.set_created_at("tasks", task_id, "2024-01-02 12:00:00")
+        assert [t["id"] for t in db.list_tasks(created_after=jan_2)] == [task_id]
+        assert db.list_tasks(created_before=jan_2) == []
+
+    def test_archived_tasks_keep_epoch_ms(self):
+        task_id = db.create_task(name="T", type="sample_job")
+        db.delete_task(task_id)
+        assert db.archive_tasks(grace_seconds=0) == 1
+        task = db.get_task(task_id, include_archived=True)
+        assert task["created_at_ms"] is not None
+
+    def test_migrates_existing_database(self, tmp_path, monkeypatch):
+        path = tmp_path / "old.sqlite"
+        old = sqlite3.connect(path)
+        old.executescript("""
+            CREATE TABLE reports (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                created_by TEXT NOT NULL, meta TEXT, template TEXT, recipients TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT NOT NULL,
+                report_id INTEGER, schedule TEXT, is_active INTEGER DEFAULT 1, meta TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                next_run_at TIMESTAMP);
+            CREATE INDEX idx_tasks_inactive ON tasks(updated_at) WHERE is_active = 0;
+            INSERT INTO reports (name, created_by, created_at) VALUES ('Old', 'someone', '2024-01-01 00:00:00');
+        """)
+        old.close()
+
+        monkeypatch.setenv("TEST_DB_PATH", str(path))
+        database = Database()
+        database.initialize()
+        try:
+            assert database.get_database_info()["schema_version"] == len(MIGRATIONS)
+            assert database.list_reports()[0]["created_at_ms"] == 1704067200000
+            index = database.db.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'idx_tasks_inactive'"
+            ).fetchone()[0]
+            assert "updated_at_ms" in index
+
+            # Running initialization again leaves the schema alone
+            database._migrate()
+            assert database.get_database_info()["schema_version"] == len(MIGRATIONS)
+        finally:
+            database.close()
+
+class TestJobQueue:
+    def expire_leases(self):
+        db.db.execute("UPDATE job_queue SET lease_expires_at_ms = 0 WHERE status = 'running'")
+        db.db.commit()
+
+    def test_claim_orders_by_priority_and_leases(self):
+        low = db.enqueue_job("sample_job", {"n": 1})
+        high = db.enqueue_job("sample_job", {"n": 2}, priority=5)
+        db.enqueue_job("sample_job", delay=60)
+
+        jobs = db.claim_jobs("worker-a", limit=5)
+        assert [job["id"] for job in jobs] == [high, low]
+        assert jobs[0]["params"] == {"n": 2}
+        assert all(job["status"] == "running" and job["attempts"] == 1 for job in jobs)
+        assert db.claim_jobs("worker-b", limit=5) == []
+        assert db.get_job_queue_stats()["workers"] == {"worker-a": 2}
+
+    def test_completion_is_fenced_by_lease_token(self):
+        job_id = db.enqueue_job("sample_job")
+        stale = db.claim_jobs("worker-a")[0]
+        self.expire_leases()
+        current = db.claim_jobs("worker-b", retry_delay=0)[0]
+        assert current["id"] == job_id and current["attempts"] == 2
+
+        assert not db.heartbeat_job(job_id, stale["lease_token"])
+        assert not db.complete_job(job_id, stale["lease_token"], {"from": "a"})
+        assert db.heartbeat_job(job_id, current["lease_token"])
+        assert db.complete_job(job_id, current["lease_token"], {"from": "b"})
+
+        job = db.get_queued_job(job_id)
+        assert job["status"] == "succeeded"
+        assert job["result"] == {"from": "b"}
+
+    def test_failures_retry_then_dead_letter(self):
+        job_id = db.enqueue_job("sample_job", max_attempts=2)
+        job = db.claim_jobs("worker")[0]
+        assert db.fail_job(job_id, job["lease_token"], "boom", retry_delay=60)
+        assert db.get_queued_job(job_id)["status"] == "queued"
+        assert db.claim_jobs("worker") == []  # still backing off
+
+        db.db.execute("UPDATE job_queue SET available_at_ms = 0")
+        db.db.commit()
+        job = db.claim_jobs("worker")[0]
+        assert db.fail_job(job_id, job["lease_token"], "boom again", retry_delay=0)
+        job = db.get_queued_job(job_id)
+        assert job["status"] == "dead" and job["error"] == "boom again"
+
+        assert db.retry_dead_job(job_id)
+        assert db.claim_jobs("worker")[0]["attempts"] == 1
+
+    def test_expired_lease_of_last_attempt_is_dead(self):
+        job_id = db.enqueue_job("sample_job", max_attempts=1)
+        db.claim_jobs("worker")
+        self.expire_leases()
+        assert db.claim_jobs("worker") == []
+        job = db.get_queued_job(job_id)
+        assert job["status"] == "dead"
+        assert "Lease expired" in job["error"]
+
+    def test_expired_leases_back_off_like_failures(self):
+        job_id = db.enqueue_job("sample_job", max_attempts=5)
+        for attempts, delay in ((1, 2000), (2, 4000), (3, 5000)):
+            db.db.execute("UPDATE job_queue SET available_at_ms = 0")
+            db.db.commit()
+            assert db.claim_jobs("worker")[0]["attempts"] == attempts
+            self.expire_leases()
+            db.claim_jobs("worker", retry_delay=2, retry_delay_max=5)
+            job = db.get_queued_job(job_id)
+            assert job["status"] == "queued"
+            assert job["available_at_ms"] - job["updated_at_ms"] == delay
+
+    def test_purge_finished_jobs(self, tmp_path):
+        done = db.enqueue_job("sample_job")
+        dead = db.enqueue_job("sample_job", max_attempts=1)
+        waiting = db.enqueue_job("sample_job")
+        recent = db.enqueue_job("sample_job")
+        db.db.execute(
+            "UPDATE job_queue SET status = CASE id WHEN ? THEN 'succeeded' WHEN ? THEN 'dead' "
+            "ELSE status END, finished_at_ms = 0 WHERE id IN (?, ?)",
+            [done, dead, done, dead]
+        )
+        db.db.execute("UPDATE job_queue SET status = 'succeeded', finished_at_ms = ? WHERE id = ?",
+                      [int(time.time() * 1000), recent])
+        db.db.commit()
+
+        logs = {job_id: tmp_path / f"queue-{job_id}.log" for job_id in (done, dead, recent)}
+        for path in logs.values():
+            path.write_text("output")
+
+        assert db.purge_job_queue(retention_days=1, batch_size=1, log_dir=tmp_path) == 2
+        remaining = {job["id"] for job in db.list_queued_jobs(limit=10)}
+        assert remaining == {waiting, recent}
+        assert [job_id for job_id, path in logs.items() if path.exists()] == [recent]
+
+    def test_processes_never_claim_the_same_job(self, file_db):
+        ids = {file_db.enqueue_job("sample_job") for _ in range(60)}
+        script = (
+            "from src.database import db; db.initialize(primary=False)\n"
+            "while jobs := db.claim_jobs('proc', limit=3):\n"
+            "    print('claimed', *[job['id'] for job in jobs])\n"
+        )
+        processes = [
+            subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True,
+                             cwd=Path(__file__).parents[2], env={**os.environ, "TEST_DB_PATH": file_db.db_path})
+            for _ in range(3)
+        ]
+        output = [process.communicate()[0] for process in processes]
+        claimed = [int(id) for lines in output for line in lines.splitlines()
+                   if line.startswith("claimed ") for id in line.split()[1:]]
+        assert sorted(claimed) == sorted(ids)
+
+    def test_worker_runs_and_retries_jobs(self):
+        ok = db.enqueue_job("sample_job", {"value": 1})
+        failing = db.enqueue_job("sample_job", {"fail": True}, max_attempts=2)
+
+        def execute(job):
+            if job["params"].get("fail"):
+                raise RuntimeError("job failed")
+            return {"status": "success", "value": job["params"]["value"]}
+
+        worker = Worker(db, concurrency=4, retry_backoff=0, execute=execute)
+        assert {job["id"] for job in worker.run_once()} == {ok, failing}
+        assert db.get_queued_job(ok)["result"] == {"status": "success", "value": 1}
+        assert db.get_queued_job(failing)["status"] == "queued"
+
+        worker.run_once()
+        assert db.get_queued_job(failing)["status"] == "dead"
+        assert worker.stats()["succeeded"] == 1 and worker.stats()["failed"] == 2
+
+    def test_scheduler_can_enqueue_due_tasks(self, sample_report):
+        task_id = db.create_task(name="Task", type="sample_job", report_id=sample_report,
+                                 schedule="*/5 * * * *")
+        db.set_task_next_run(task_id, "2000-01-01 00:00:00")
+        scheduler = TaskScheduler(db, controller=None, use_queue=True)
+
+        [job_id] = scheduler.run_once()
+        job = db.get_queued_job(job_id)
+        assert job["task_id"] == task_id and job["job"] == "sample_job"
+        assert db.get_due_tasks() == []
+
+class TestTaskDependencies:
+    def test_set_dependencies_and_graph(self):
+        extract = [db.create_task(name=f"Extract {i}", type="sample_job") for i in range(2)]
+        aggregate = db.create_task(name="Aggregate", type="sample_job")
+        deliver = db.create_task(name="Deliver", type="sample_job")
+        unrelated = db.create_task(name="Other", type="sample_job")
+
+        assert db.set_task_dependencies(aggregate, extract) == sorted(extract)
+        db.set_task_dependencies(deliver, [aggregate])
+        assert db.get_task_dependencies(aggregate) == {"depends_on": sorted(extract), "dependents": [deliver]}
+
+        tasks, edges = db.get_task_graph([deliver])
+        assert set(tasks) == {*extract, aggregate, deliver}
+        assert unrelated not in tasks
+        assert sorted(edges) == sorted([(aggregate, extract[0]), (aggregate, extract[1]), (deliver, aggregate)])
+
+    def test_rejects_cycles_and_unknown_tasks(self):
+        a, b, c = (db.create_task(name=name, type="sample_job") for name in "abc")
+        db.set_task_dependencies(b, [a])
+        db.set_task_dependencies(c, [b])
+
+        with pytest.raises(ValueError, match="cycle"):
+            db.set_task_dependencies(a, [c])
+        with pytest.raises(ValueError, match="itself"):
+            db.set_task_dependencies(a, [a])
+        with pytest.raises(ValueError, match="Unknown"):
+            db.set_task_dependencies(a, [999999])
+        assert db.get_task_dependencies(a)["depends_on"] == []
+
+    def test_deleted_dependency_rejects_graph(self):
+        a = db.create_task(name="a", type="sample_job")
+        b = db.create_task(name="b", type="sample_job")
+        db.set_task_dependencies(b, [a])
+        db.delete_task(a)
+        with pytest.raises(ValueError, match=f"deleted tasks: {a}"):
+            db.get_task_graph([b])
+
+        # Archiving keeps the edge into the archived task
+        db.archive_tasks(grace_seconds=0)
+        with pytest.raises(ValueError, match="deleted tasks"):
+            db.get_task_graph([b])
+
+        db.set_task_dependencies(b, [])
+        assert set(db.get_task_graph([b])[0]) == {b}
+
+    def test_archiving_removes_outgoing_edges(self):
+        a = db.create_task(name="a", type="sample_job")
+        b = db.create_task(name="b", type="sample_job")
+        db.set_task_dependencies(b, [a])
+        db.delete_task(b)
+        db.archive_tasks(grace_seconds=0)
+        assert db.get_task_dependencies(a)["dependents"] == []
+
+class TestInMemory:
+    def test_loads_file_and_snapshots_back(self, file_db, monkeypatch):
+        file_db.create_report(name="On disk", created_by="test_user")
+        file_db.close()
+
+        memory = Database()
+        memory.initialize(in_memory=True)
+        try:
+            assert [r["name"] for r in memory.list_reports()] == ["On disk"]
+            memory.create_report(name="In memory", created_by="test_user")
+            # Nothing reaches the file until a snapshot
+            with sqlite3.connect(file_db.db_path) as check:
+                assert check.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 1
+
+            snapshots = SnapshotScheduler(memory)
+            snapshot = snapshots.run_once()
+            assert snapshot["path"] == file_db.db_path
+            assert snapshots.run_once() is None  # unchanged since
+            with sqlite3.connect(file_db.db_path) as check:
+                assert check.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 2
+
+            memory.create_report(name="At shutdown", created_by="test_user")
+        finally:
+            memory.close()
+        with sqlite3.connect(file_db.db_path) as check:
+            assert check.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 3
+
+    def test_snapshot_replaces_file_and_drops_stale_wal(self, tmp_path):
+        path = str(tmp_path / "snapshot.sqlite")
+        Path(path + "-wal").write_bytes(b"stale")
+        db.create_report(name="Snapshotted", created_by="test_user")
+        db.snapshot(path)
+        assert not os.path.exists(path + "-wal")
+        assert not os.path.exists(path + ".partial")
+        with sqlite3.connect(path) as check:
+            assert check.execute("SELECT name FROM reports").fetchall() == [("Snapshotted",)]
+
+    def test_exports_do_not_block_writes(self, sample_report):
+        for i in range(3):
+            db.create_report(name=f"Report {i}", created_by="test_user")
+        rows = db.iter_rows("reports", batch_size=1)
+        assert next(rows)["id"] == sample_report
+        # A write while the export is under way must not fail on table locks
+        db.create_report(name="Concurrent", created_by="test_user")
+        assert [row["name"] for row in rows][-1] == "Concurrent"
+
+    def test_exports_and_backups_skip_uncommitted_writes(self, sample_report, tmp_path):
+        writing, abort = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with db.get_connection() as conn:
+                    conn.execute("INSERT INTO reports (name, created_by) VALUES ('Rolled back', 'x')")
+                    writing.set()
+                    abort.wait(5)
+                    raise RuntimeError("abort")
+            except RuntimeError:
+                pass
+
+        names, backup = [], {}
+        backups = BackupManager(db, backup_dir=str(tmp_path), compress=False)
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        readers = [
+            threading.Thread(target=lambda: names.extend(row["name"] for row in db.iter_rows("reports"))),
+            threading.Thread(target=lambda: backup.update(backups.backup()))
+        ]
+        for reader in readers:
+            reader.start()
+        time.sleep(0.1)
+        abort.set()
+        writer.join()
+        for reader in readers:
+            reader.join()
+
+        with sqlite3.connect(backup["path"]) as check:
+            names += [row[0] for row in check.execute("SELECT name FROM reports")]
+        assert names == ["Test Report", "Test Report"]
+
+    def test_cannot_be_shared_with_other_processes(self):
+        with pytest.raises(RuntimeError):
+            Database().initialize(primary=False, in_memory=True)
@@ -0,0 +1,482 @@
+import os
+import threading
+import time
+import pytest
+from src.jobs.cache import ResultCache, get_cache_options
+from src.jobs.controller import ExecutionController, QueueFullError, parse_type_limits
+from src.jobs.pipeline import PipelineExecutor
+from src.jobs.runner import JobError, parse_result, resolve_job, run_job
+from src.jobs.scheduler import next_fire_time
+from src.main.profiling import Profiler, capture
+from src.jobs.utils.job_utils import batched, mmap_lines, parallel_map, read_chunks, split_file, track_progress
+from datetime import datetime, timezone
+
+class BlockingExecutor:
+    """Executes runs only once released, recording the order they started in"""
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+
+    def __call__(self, run):
+        self.started.append(run.task_id)
+        self.release.wait(timeout=5)
+        return {"status": "success", "task_id": run.task_id}
+
+def square(value):
+    return value * value
+
+def slow_if_first(value):
+    if value == 0:
+        time.sleep(0.5)
+    return value
+
+def count_lines(file_range):
+    return sum(1 for _ in mmap_lines(*file_range, progress=False))
+
+def make_task(task_id, type="report"):
+    return {"id": task_id, "type": type, "meta": {}}
+
+class TestExecutionController:
+    def test_runs_complete_with_results(self):
+        controller = ExecutionController(execute=lambda run: {"task_id": run.task_id})
+        run = controller.submit(make_task(1))
+        assert run.wait(timeout=5)
+        assert run.status == "succeeded"
+        assert run.result == {"task_id": 1}
+        assert controller.stats()["succeeded"] == 1
+
+    def test_failed_run_records_error(self):
+        def fail(run):
+            raise RuntimeError("boom")
+        controller = ExecutionController(execute=fail)
+        run = controller.submit(make_task(1))
+        run.wait(timeout=5)
+        assert run.status == "failed"
+        assert run.error == "boom"
+
+    def test_type_and_global_limits(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(
+            execute=executor, max_concurrency=3, type_limits={"heavy": 1}
+        )
+        runs = [controller.submit(make_task(i, "heavy")) for i in range(3)]
+        runs += [controller.submit(make_task(i, "light")) for i in range(3, 6)]
+
+        stats = controller.stats()
+        assert stats["running_by_type"] == {"heavy": 1, "light": 2}
+        assert stats["queue_depth"] == 3
+
+        executor.release.set()
+        for run in runs:
+            assert run.wait(timeout=5)
+        assert controller.stats()["running"] == 0
+
+    def test_priority_order(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(execute=executor, max_concurrency=1)
+        first = controller.submit(make_task(1))
+        controller.submit(make_task(2), priority=0)
+        controller.submit(make_task(3), priority=10)
+
+        executor.release.set()
+        first.wait(timeout=5)
+        for run_id in list(controller._runs):
+            controller._runs[run_id].wait(timeout=5)
+        assert executor.started == [1, 3, 2]
+
+    def test_reject_when_full(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(execute=executor, max_concurrency=1, max_queue=1)
+        controller.submit(make_task(1))
+        controller.submit(make_task(2))
+        with pytest.raises(QueueFullError):
+            controller.submit(make_task(3))
+        assert controller.stats()["rejected"] == 1
+        executor.release.set()
+
+    def test_coalesce_duplicate_runs(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(
+            execute=executor, max_concurrency=1, max_queue=1, overflow_policy="coalesce"
+        )
+        controller.submit(make_task(1))
+        queued = controller.submit(make_task(2))
+        assert controller.submit(make_task(2)) is queued
+        with pytest.raises(QueueFullError):
+            controller.submit(make_task(3))
+        executor.release.set()
+
+    def test_defer_until_capacity(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(
+            execute=executor, max_concurrency=1, max_queue=1, overflow_policy="defer"
+        )
+        controller.submit(make_task(1))
+        controller.submit(make_task(2))
+        deferred = controller.submit(make_task(3))
+        assert deferred.status == "deferred"
+
+        executor.release.set()
+        assert deferred.wait(timeout=5)
+        assert deferred.status == "succeeded"
+
+    def test_deferred_runs_capped_and_promoted_by_priority(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(
+            execute=executor, max_concurrency=1, max_queue=1, max_deferred=2, overflow_policy="defer"
+        )
+        controller.submit(make_task(1))
+        controller.submit(make_task(2))
+        low = controller.submit(make_task(3), priority=0)
+        high = controller.submit(make_task(4), priority=5)
+        with pytest.raises(QueueFullError):
+            controller.submit(make_task(5))
+        assert controller.stats()["deferred"] == 2
+
+        executor.release.set()
+        assert low.wait(timeout=5) and high.wait(timeout=5)
+        assert executor.started == [1, 2, 4, 3]
+
+    def test_run_logs_removed_with_history(self, tmp_path):
+        def execute(run):
+            run.log_path.write_text("output\n")
+            return {"status": "success"}
+
+        controller = ExecutionController(execute=execute, history=1, log_dir=tmp_path)
+        first = controller.submit(make_task(1))
+        assert first.wait(timeout=5)
+        assert first.log_path.exists()
+        second = controller.submit(make_task(2))
+        assert second.wait(timeout=5)
+        assert not first.log_path.exists()
+        assert second.log_path.exists()
+
+    def test_prune_logs_keeps_recent_and_tracked(self, tmp_path):
+        controller = ExecutionController(execute=lambda run: None, log_dir=tmp_path,
+                                         log_retention_days=1)
+        old, recent, other = tmp_path / f"{'a' * 32}.log", tmp_path / f"{'b' * 32}.log", tmp_path / "api.log"
+        queued = tmp_path / "queue-3.log"
+        for path in (old, recent, other, queued):
+            path.write_text("x")
+        for path in (old, other, queued):
+            os.utime(path, (0, 0))
+
+        assert controller.prune_logs() == 2
+        assert not old.exists() and not queued.exists() and recent.exists() and other.exists()
+
+    def test_history_keeps_unfinished_runs(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(execute=executor, max_concurrency=1, history=2)
+        runs = [controller.submit(make_task(i)) for i in range(4)]
+        assert all(controller.get_run(run.id) for run in runs)
+
+        executor.release.set()
+        assert all(run.wait(timeout=5) for run in runs)
+        controller.submit(make_task(5)).wait(timeout=5)
+        assert sum(controller.get_run(run.id) is not None for run in runs) <= 1
+
+    def test_parse_type_limits(self):
+        assert parse_type_limits("report=2, export=1") == {"report": 2, "export": 1}
+        assert parse_type_limits(None) == {}
+
+class TestRunner:
+    def test_resolve_job(self):
+        task = {"type": "report", "meta": {"job": "sample_job", "params": {"a": 1}}}
+        assert resolve_job(task) == ("sample_job", {"a": 1})
+        assert resolve_job({"type": "sample_job", "meta": {}}) == ("sample_job", {})
+
+    def test_parse_result_skips_progress_and_text(self):
+        output = 'Starting job\n{"status": "success"}\n{"type": "progress", "percentage": 100}\n'
+        assert parse_result(output) == {"status": "success"}
+
+    def test_unknown_job(self):
+        with pytest.raises(JobError):
+            run_job("../api")
+        for job in ("worker", "controller", "__init__"):
+            with pytest.raises(JobError, match="Unknown job"):
+                run_job(job)
+
+    def test_job_timeout(self, tmp_path):
+        with pytest.raises(JobError, match="timed out"):
+            run_job("sample_job", timeout=0.5, log_path=tmp_path / "run.log")
+
+class TestScheduler:
+    def test_next_fire_time(self):
+        now = datetime(2024, 1, 1, 12, 1, tzinfo=timezone.utc)
+        assert next_fire_time("*/5 * * * *", now) == "2024-01-01 12:05:00"
+
+class TestResultCache:
+    def test_key_is_canonical(self, tmp_path):
+        cache = ResultCache(directory=tmp_path)
+        assert cache.make_key("sample_job", {"a": 1, "b": 2}) == cache.make_key("sample_job", {"b": 2, "a": 1})
+        assert cache.make_key("sample_job", {"a": 1}) != cache.make_key("sample_job", {"a": 2})
+
+    def test_key_tracks_inputs(self, tmp_path):
+        cache = ResultCache(directory=tmp_path / "cache")
+        source = tmp_path / "input.csv"
+        source.write_text("a,b\n")
+        key = cache.make_key("sample_job", {}, inputs=[str(source)])
+
+        source.write_text("a,b\n1,2\n")
+        assert cache.make_key("sample_job", {}, inputs=[str(source)]) != key
+
+    def test_get_put_and_ttl(self, tmp_path):
+        cache = ResultCache(directory=tmp_path)
+        cache.put("ab" * 32, {"status": "success"})
+        assert cache.get("ab" * 32) == {"status": "success"}
+
+        cache.put("cd" * 32, {"status": "success"}, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("cd" * 32) is None
+
+    def test_size_tracks_overwrites_and_expiry(self, tmp_path):
+        cache = ResultCache(directory=tmp_path)
+        for _ in range(5):
+            cache.put("ab" * 32, {"data": "x" * 50})
+        entry_size = cache._path("ab" * 32).stat().st_size
+        assert cache.stats()["size"] == entry_size
+
+        cache.put("cd" * 32, {"data": "y"}, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("cd" * 32) is None
+        assert cache.stats()["size"] == entry_size
+
+    def test_lru_eviction(self, tmp_path):
+        cache = ResultCache(directory=tmp_path, max_bytes=420)
+        keys = [f"{i:02d}" * 32 for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, {"data": "x" * 50})
+            os.utime(cache._path(key), (i, i))
+
+        cache.get(keys[0])
+        cache.put("99" * 32, {"data": "x" * 50})
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.evictions >= 1
+
+    def test_cache_options(self):
+        assert get_cache_options({"meta": {}}) is None
+        assert get_cache_options({"meta": {"cache": True}}) == {}
+        assert get_cache_options({"meta": {"cache": {"ttl": 60}}}) == {"ttl": 60}
+
+    def test_controller_serves_cached_runs(self, tmp_path):
+        calls = []
+        def execute(run):
+            calls.append(run.task_id)
+            return {"status": "success", "value": 42}
+
+        controller = ExecutionController(execute=execute, cache=ResultCache(directory=tmp_path))
+        task = {"id": 1, "type": "sample_job", "meta": {"cache": True, "params": {"a": 1}}}
+
+        first = controller.submit(task)
+        first.wait(timeout=5)
+        second = controller.submit(task)
+
+        assert second.status == "succeeded"
+        assert second.cached is True
+        assert second.result == {"status": "success", "value": 42}
+        assert calls == [1]
+
+    def test_cache_store_failure_keeps_run_successful(self, tmp_path, monkeypatch):
+        cache = ResultCache(directory=tmp_path)
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+        monkeypatch.setattr(cache, "put", fail)
+
+        controller = ExecutionController(execute=lambda run: {"status": "success"}, cache=cache)
+        run = controller.submit({"id": 1, "type": "sample_job", "meta": {"cache": True}})
+        assert run.wait(timeout=5)
+        assert run.status == "succeeded"
+        assert run.result == {"status": "success"}
+
+class TestJobUtils:
+    def test_batched(self):
+        assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(batched([], 3)) == []
+
+    def test_read_chunks(self, tmp_path):
+        path = tmp_path / "data.bin"
+        path.write_bytes(b"x" * 10)
+        assert [len(chunk) for chunk in read_chunks(str(path), chunk_size=4, progress=False)] == [4, 4, 2]
+
+    def test_mmap_lines(self, tmp_path):
+        path = tmp_path / "data.txt"
+        path.write_bytes(b"a\r\nb\n\nc")
+        assert list(mmap_lines(str(path), progress=False)) == [b"a", b"b", b"", b"c"]
+
+        empty = tmp_path / "empty.txt"
+        empty.write_bytes(b"")
+        assert list(mmap_lines(str(empty))) == []
+
+    def test_split_file_covers_every_line_once(self, tmp_path):
+        path = tmp_path / "data.txt"
+        path.write_text("".join(f"line {i}\n" for i in range(1000)))
+        ranges = split_file(str(path), parts=4)
+
+        assert len(ranges) == 4
+        assert ranges[0][1] == 0 and ranges[-1][2] == path.stat().st_size
+        assert all(a[2] == b[1] for a, b in zip(ranges, ranges[1:]))
+        assert sum(count_lines(r) for r in ranges) == 1000
+
+    def test_parallel_map_ordered(self):
+        assert list(parallel_map(square, range(20), workers=2, progress=False)) == [i * i for i in range(20)]
+
+    def test_parallel_map_unordered(self):
+        results = list(parallel_map(slow_if_first, range(4), workers=2, ordered=False, progress=False))
+        assert sorted(results) == [0, 1, 2, 3]
+        assert results[-1] == 0
+
+    def test_parallel_map_consumes_input_lazily(self):
+        consumed = []
+        def source():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = parallel_map(square, source(), workers=1, max_pending=2, progress=False)
+        assert next(results) == 0
+        assert len(consumed) <= 3
+        results.close()
+
+    def test_track_progress_logs(self, capsys):
+        assert list(track_progress([1, 2, 3], interval=0)) == [1, 2, 3]
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 3
+        assert '"percentage": 100' in lines[-1]
+
+class TestProfiling:
+    def test_sampler_collapses_stacks(self, tmp_path):
+        path = tmp_path / "busy.collapsed"
+        with capture("sampling", path, interval=0.001):
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                sum(range(1000))
+
+        lines = path.read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert any("test_sampler_collapses_stacks" in line for line in lines)
+
+    def test_profiled_task_runs_bypass_cache(self, tmp_path):
+        profiles = []
+        def execute(run):
+            profiles.append(run.profile)
+            return {"status": "success"}
+
+        profiler = Profiler(directory=tmp_path / "profiles")
+        controller = ExecutionController(execute=execute, cache=ResultCache(directory=tmp_path / "cache"),
+                                         profiler=profiler)
+        task = {"id": 7, "type": "sample_job", "meta": {"cache": True}}
+        controller.submit(task).wait(timeout=5)
+
+        profiler.arm(mode="cprofile", task_id=7)
+        run = controller.submit(task)
+        run.wait(timeout=5)
+        controller.submit(task).wait(timeout=5)
+
+        assert run.cached is False
+        assert profiles[0] is None
+        mode, path = profiles[1]
+        assert mode == "cprofile" and path.suffix == ".pstats"
+        assert run.to_dict()["profile"] == path.name
+        assert len(profiles) == 2
+
+    def test_rejected_run_keeps_profile_session(self, tmp_path):
+        executor = BlockingExecutor()
+        profiler = Profiler(directory=tmp_path / "profiles")
+        controller = ExecutionController(execute=executor, max_concurrency=1, max_queue=1,
+                                         profiler=profiler)
+        controller.submit(make_task(1))
+        controller.submit(make_task(2))
+
+        session = profiler.arm(mode="cprofile", task_id=3)
+        with pytest.raises(QueueFullError):
+            controller.submit(make_task(3))
+        assert session.remaining == 1 and session.captures == []
+        executor.release.set()
+
+class TestPipeline:
+    def graph(self, edges, count):
+        return {i: {**make_task(i), "name": f"task {i}"} for i in range(1, count + 1)}, edges
+
+    def test_runs_tasks_as_inputs_finish_and_passes_outputs(self):
+        # 1, 2 and 3 in parallel, 4 aggregates them, 5 delivers
+        tasks, edges = self.graph([(4, 1), (4, 2), (4, 3), (5, 4)], 5)
+
+        def execute(run):
+            time.sleep(0.2)
+            upstream = run.params["upstream"]
+            return {"total": sum(parent["total"] for parent in upstream.values()) or run.task_id}
+
+        controller = ExecutionController(execute=execute, max_concurrency=4)
+        pipeline = PipelineExecutor(controller).start(tasks, edges)
+        assert pipeline.wait(timeout=5)
+
+        result = pipeline.to_dict()
+        assert result["status"] == "succeeded"
+        nodes = {task["task_id"]: task for task in result["tasks"]}
+        assert nodes[4]["result"] == {"total": 6}
+        assert nodes[5]["result"] == {"total": 6}
+        # Three levels of 0.2s each, not five steps one after another
+        assert result["elapsed"] < 0.9
+        assert result["critical_path"] >= 0.6
+
+    def test_max_parallel_and_longest_chain_first(self):
+        # Task 2 heads the longer chain (2 -> 3), so it goes before task 1
+        tasks, edges = self.graph([(3, 2)], 3)
+        executor = BlockingExecutor()
+        controller = ExecutionController(execute=executor, max_concurrency=4)
+        pipeline = PipelineExecutor(controller).start(tasks, edges, max_parallel=1)
+
+        time.sleep(0.1)
+        assert executor.started == [2]
+        executor.release.set()
+        assert pipeline.wait(timeout=5)
+        assert executor.started == [2, 1, 3]
+
+    def test_failure_skips_downstream_only(self):
+        tasks, edges = self.graph([(2, 1), (3, 2)], 4)
+
+        def execute(run):
+            if run.task_id == 1:
+                raise JobError("extract failed")
+            return {"status": "success"}
+
+        pipeline = PipelineExecutor(ExecutionController(execute=execute)).start(tasks, edges)
+        assert pipeline.wait(timeout=5)
+        statuses = {task["task_id"]: task["status"] for task in pipeline.to_dict()["tasks"]}
+        assert statuses == {1: "failed", 2: "skipped", 3: "skipped", 4: "succeeded"}
+        assert pipeline.status == "failed"
+
+    def test_pipeline_runs_are_not_coalesced(self):
+        executor = BlockingExecutor()
+        controller = ExecutionController(execute=executor, max_concurrency=1, max_queue=1,
+                                         overflow_policy="coalesce")
+        controller.submit(make_task(9))
+        queued = controller.submit(make_task(1))
+
+        tasks, edges = self.graph([], 1)
+        pipeline = PipelineExecutor(controller).start(tasks, edges)
+        node = pipeline.to_dict()["tasks"][0]
+        assert node["status"] == "failed" and node["run_id"] != queued.id
+        executor.release.set()
+
+    def test_history_evicts_only_finished_pipelines(self):
+        executor = BlockingExecutor()
+        pipelines = PipelineExecutor(ExecutionController(execute=executor, max_concurrency=4), history=1)
+        first = pipelines.start(*self.graph([], 1))
+        second = pipelines.start(*self.graph([], 1))
+        assert pipelines.get(first.id) and pipelines.get(second.id)
+
+        executor.release.set()
+        assert first.wait(timeout=5) and second.wait(timeout=5)
+        third = pipelines.start(*self.graph([], 1))
+        assert pipelines.get(first.id) is None and pipelines.get(second.id) is None
+        assert pipelines.get(third.id)
+
+    def test_rejects_cycles(self):
+        tasks, edges = self.graph([(1, 2), (2, 1)], 2)
+        with pytest.raises(ValueError):
+            PipelineExecutor(ExecutionController(execute=lambda run: None)).start(tasks, edges)